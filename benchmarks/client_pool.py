@@ -0,0 +1,47 @@
+"""
+Per-call overhead of building clients vs drawing them from the pool.
+
+Usage:
+    $ python benchmarks/client_pool.py --project my-project --credential key.json
+"""
+import argparse
+import time
+from typing import Callable
+
+from google.cloud.storage import Client
+from google.oauth2.service_account import Credentials
+
+from gcloud import pool
+from gcloud.cloud_storage import _get_client
+
+
+def _unpooled(project: str, credential: str) -> Client:
+    # the behaviour before the pool: parse the key and open a session on every call.
+    return Client(project=project,
+                  credentials=Credentials.from_service_account_file(filename=credential))
+
+
+def _measure(name: str, fn: Callable[[], object], calls: int) -> float:
+    start = time.perf_counter()
+    for _ in range(calls):
+        fn()
+    per_call = (time.perf_counter() - start) / calls
+    print('{:<10} {:>10.1f} us/call'.format(name, per_call * 1e6))
+    return per_call
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--project', required=True)
+    parser.add_argument('--credential', required=True)
+    parser.add_argument('--calls', type=int, default=1000)
+    args = parser.parse_args()
+
+    before = _measure('unpooled', lambda: _unpooled(args.project, args.credential), args.calls)
+    after = _measure('pooled', lambda: _get_client(args.project, args.credential), args.calls)
+    print('speedup    {:>10.1f}x'.format(before / after))
+    pool.close()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,92 @@
+"""
+CPU cost of parsing an AnnotateTextResponse through MessageToJson + `CloudLanguage.parse`
+vs `CloudLanguage.parse_message`. No API call is made; the response is synthetic.
+
+Usage:
+    $ python benchmarks/language_parse.py --tokens 20000
+"""
+import argparse
+import json
+import math
+import time
+from typing import Any
+
+from google.cloud.language import enums, types
+from google.protobuf.json_format import MessageToJson
+
+from gcloud.cloud_language import CloudLanguage
+
+
+def _response(num_tokens: int) -> types.AnnotateTextResponse:
+    response = types.AnnotateTextResponse(language='en')
+    response.document_sentiment.magnitude = 0.8
+    response.document_sentiment.score = 0.3
+    for i in range(num_tokens):
+        token = response.tokens.add()
+        token.text.content = 'word{}'.format(i)
+        token.text.begin_offset = i * 6
+        token.part_of_speech.tag = enums.PartOfSpeech.Tag.NOUN
+        token.part_of_speech.number = enums.PartOfSpeech.Number.SINGULAR
+        # a zero index is dropped by MessageToJson, which `parse` does not handle.
+        token.dependency_edge.head_token_index = i + 1 if i + 1 < num_tokens else i
+        token.dependency_edge.label = enums.DependencyEdge.Label.NSUBJ
+        token.lemma = 'word'
+        if i % 20 == 0:
+            sentence = response.sentences.add()
+            sentence.text.content = 'word{} ...'.format(i)
+            sentence.text.begin_offset = i * 6
+            sentence.sentiment.magnitude = 0.5
+            sentence.sentiment.score = 0.1
+        if i % 50 == 0:
+            entity = response.entities.add(name='word{}'.format(i), type=enums.Entity.Type.OTHER, salience=0.01)
+            mention = entity.mentions.add(type=enums.EntityMention.Type.COMMON)
+            mention.text.content = 'word{}'.format(i)
+            mention.text.begin_offset = i * 6
+            mention.sentiment.magnitude = 0.2
+            mention.sentiment.score = 0.1
+    response.categories.add(name='/Science', confidence=0.9)
+    return response
+
+
+def _same(a: Any, b: Any, rel_tol: float = 1e-6) -> bool:
+    """
+    Equal values, where floats only need to agree to `rel_tol` since older protobuf
+    releases print single precision fields with their full double expansion.
+    """
+    if isinstance(a, dict) and isinstance(b, dict):
+        return list(a) == list(b) and all(_same(a[k], b[k], rel_tol) for k in a)
+    if isinstance(a, list) and isinstance(b, list):
+        return len(a) == len(b) and all(_same(x, y, rel_tol) for x, y in zip(a, b))
+    if isinstance(a, float) or isinstance(b, float):
+        return (isinstance(a, (int, float)) and isinstance(b, (int, float))
+                and math.isclose(a, b, rel_tol=rel_tol))
+    return a == b
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--tokens', type=int, default=20000)
+    parser.add_argument('--repeat', type=int, default=5)
+    args = parser.parse_args()
+
+    response = _response(args.tokens)
+
+    start = time.perf_counter()
+    for _ in range(args.repeat):
+        json_result = CloudLanguage.parse(json.loads(MessageToJson(response)))
+    json_time = (time.perf_counter() - start) / args.repeat
+
+    start = time.perf_counter()
+    for _ in range(args.repeat):
+        message_result = CloudLanguage.parse_message(response)
+    message_time = (time.perf_counter() - start) / args.repeat
+
+    mismatched = [k for k in json_result if not _same(json_result[k], message_result.get(k))]
+    assert list(json_result) == list(message_result) and not mismatched, mismatched
+    print('json     {:>10.1f} ms'.format(json_time * 1e3))
+    print('protobuf {:>10.1f} ms'.format(message_time * 1e3))
+    print('speedup  {:>10.1f}x'.format(json_time / message_time))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,52 @@
+"""
+Bytes sent and end-to-end latency of `SpeechToText.recognize_from_file`
+with and without audio preprocessing.
+
+Usage:
+    $ python benchmarks/speech_preprocess.py --file sample.wav --credential key.json
+"""
+import argparse
+import os
+import time
+
+from google.cloud.speech import enums
+
+from gcloud.audio import sniff
+from gcloud.speech_to_text import SpeechToText, prepare_audio
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--file', required=True, help='mono WAV/FLAC file shorter than one minute')
+    parser.add_argument('--credential', default=None)
+    parser.add_argument('--language', default='en-US')
+    args = parser.parse_args()
+
+    info = sniff(args.file)
+    if info is None:
+        parser.error('{} is not a PCM or mu-law WAV, FLAC or Ogg Opus file'.format(args.file))
+    if info.encoding == enums.RecognitionConfig.AudioEncoding.ENCODING_UNSPECIFIED:
+        parser.error('{} can only be sent after conversion, use 16 bit PCM'.format(args.file))
+
+    stt = SpeechToText(credential=args.credential)
+    raw_bytes = os.path.getsize(args.file)
+    _, _, chunks = prepare_audio(args.file, info.encoding, info.sample_rate, chunk_size=1024 * 1024)
+    prepared_bytes = sum(len(c) for c in chunks)
+
+    results = []
+    for preprocess in (False, True):
+        start = time.perf_counter()
+        stt.recognize_from_file(args.file,
+                                encoding=info.encoding,
+                                language_code=args.language,
+                                sampling_rate_hertz=info.sample_rate,
+                                preprocess=preprocess)
+        results.append(time.perf_counter() - start)
+
+    print('raw          {:>12,d} bytes {:>8.2f} s'.format(raw_bytes, results[0]))
+    print('preprocessed {:>12,d} bytes {:>8.2f} s'.format(prepared_bytes, results[1]))
+    print('reduction    {:>12.1f}x       {:>8.1f}x'.format(raw_bytes / prepared_bytes, results[0] / results[1]))
+
+
+if __name__ == '__main__':
+    main()
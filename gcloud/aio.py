@@ -0,0 +1,407 @@
+import asyncio
+import threading
+from concurrent.futures import Executor, Future, ThreadPoolExecutor
+from functools import partial
+from pathlib import Path
+from typing import Any, AsyncIterator, Callable, Dict, Iterator, Optional, Tuple, Union
+
+from gcloud.bigquery import BigQuery
+from gcloud.cloud_language import CloudLanguage
+from gcloud.cloud_storage import CloudStorage, TransferSummary
+from gcloud.speech_to_text import SpeechToText
+from gcloud.text_to_speech import TextToSpeech
+
+# worker threads of the shared executor. blocking calls beyond this wait in the event loop.
+DEFAULT_MAX_WORKERS = 32
+
+_executor = None  # type: Optional[ThreadPoolExecutor]
+_executor_lock = threading.Lock()
+_DONE = object()
+
+
+def get_executor() -> ThreadPoolExecutor:
+    """
+    Returns:
+        ThreadPoolExecutor : the bounded executor shared by every Async* wrapper
+    """
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(max_workers=DEFAULT_MAX_WORKERS, thread_name_prefix='gcloud-aio')
+        return _executor
+
+
+def shutdown(wait: bool = True) -> None:
+    """
+    Stop the shared executor. It is created again on the next call.
+
+    Args:
+        wait (bool) : wait for running calls to finish
+    """
+    global _executor
+    with _executor_lock:
+        executor, _executor = _executor, None
+    if executor is not None:
+        executor.shutdown(wait=wait)
+
+
+class _Pump:
+    def __init__(self, iterator: Iterator[Any]) -> None:
+        """
+        Step a blocking iterator from worker threads and close it once it is
+        abandoned. A generator can not be closed while another thread runs it, so
+        whichever of `step` and `stop` finishes last closes it.
+
+        Args:
+            iterator (Iterator) :
+        """
+        self.iterator = iterator
+        self._lock = threading.Lock()
+        self._running = False
+        self._stopped = False
+
+    def step(self) -> Any:
+        """
+        Returns:
+            Any : the next item, `_DONE` when exhausted or stopped
+        """
+        with self._lock:
+            if self._stopped:
+                return _DONE
+            self._running = True
+        try:
+            return next(self.iterator, _DONE)
+        finally:
+            with self._lock:
+                self._running = False
+                close = self._stopped
+            if close:
+                self._close()
+
+    def stop(self, executor: Executor) -> None:
+        """
+        Close the iterator in `executor` now, or after the step which is running.
+
+        Args:
+            executor (Executor) :
+        """
+        with self._lock:
+            self._stopped = True
+            close = not self._running
+        if close:
+            # closing runs the generator's cleanup, which may block.
+            executor.submit(self._close)
+
+    def _close(self) -> None:
+        if hasattr(self.iterator, 'close'):
+            self.iterator.close()
+
+
+def _release(loop: asyncio.AbstractEventLoop, semaphore: asyncio.Semaphore, future: Any) -> None:
+    # runs in the worker thread once the call has finished or was cancelled before starting.
+    try:
+        loop.call_soon_threadsafe(semaphore.release)
+    except RuntimeError:
+        # the loop is closed and its semaphore with it.
+        pass
+
+
+class AsyncWrapper:
+    def __init__(self,
+                 wrapped: Any,
+                 max_concurrency: int = DEFAULT_MAX_WORKERS,
+                 executor: Optional[Executor] = None,
+                 deadline: Optional[float] = None) -> None:
+        """
+        Run the blocking methods of `wrapped` on a bounded executor. At most
+        `max_concurrency` calls of this wrapper occupy worker threads; any number
+        of further calls wait as coroutines, so thousands can be awaited at once.
+        The pinned google-cloud clients have no asyncio transport, so every call
+        goes through the executor.
+
+        A cancelled or timed out call returns control at once and a call which has
+        not started never runs. A call already running in a thread finishes in the
+        background and keeps its slot until then, so methods taking a gRPC `timeout`
+        also get `deadline` as one.
+
+        Args:
+            wrapped (Any) : blocking wrapper, e.g. CloudStorage
+            max_concurrency (int) : calls running in threads at once
+            executor (Executor, None) : defaults to `get_executor()`
+            deadline (float, None) : default seconds each call may take
+        """
+        self.wrapped = wrapped
+        self.max_concurrency = max_concurrency
+        self.deadline = deadline
+        self._executor = executor
+        self._semaphores = {}  # type: Dict[asyncio.AbstractEventLoop, asyncio.Semaphore]
+
+    def _semaphore(self, loop: asyncio.AbstractEventLoop) -> asyncio.Semaphore:
+        # asyncio primitives belong to the loop they are created in.
+        semaphore = self._semaphores.get(loop)
+        if semaphore is None:
+            for closed in [l for l in self._semaphores if l.is_closed()]:
+                del self._semaphores[closed]
+            semaphore = self._semaphores[loop] = asyncio.Semaphore(self.max_concurrency)
+        return semaphore
+
+    async def _run(self, func: Callable, *args: Any, deadline: Optional[float] = None, **kwargs: Any) -> Any:
+        """
+        Args:
+            func (Callable) : blocking callable
+            *args :
+            deadline (float, None) : seconds before asyncio.TimeoutError. defaults to `self.deadline`.
+            **kwargs :
+
+        Returns:
+            Any : result of `func`
+        """
+        loop = asyncio.get_running_loop()
+        executor = self._executor or get_executor()
+        if deadline is None:
+            deadline = self.deadline
+        semaphore = self._semaphore(loop)
+        await semaphore.acquire()
+        try:
+            future = executor.submit(partial(func, *args, **kwargs))
+        except BaseException:
+            semaphore.release()
+            raise
+        # the slot is released with the thread, not when the caller stops waiting.
+        future.add_done_callback(partial(_release, loop, semaphore))
+        return await asyncio.wait_for(asyncio.wrap_future(future, loop=loop), deadline)
+
+    async def _iterate(self, func: Callable, *args: Any,
+                       deadline: Optional[float] = None, **kwargs: Any) -> AsyncIterator[Any]:
+        """
+        Drive a blocking iterator from the executor one item at a time.
+        `deadline` applies to each item. Closing the async iterator closes the
+        blocking one in a worker thread, once an item still being produced after
+        a timeout or cancellation is done.
+
+        Returns:
+            AsyncIterator[Any] : items of `func(*args, **kwargs)`
+        """
+        pump = _Pump(await self._run(lambda: iter(func(*args, **kwargs)), deadline=deadline))
+        try:
+            while True:
+                item = await self._run(pump.step, deadline=deadline)
+                if item is _DONE:
+                    return
+                yield item
+        finally:
+            pump.stop(self._executor or get_executor())
+
+
+class AsyncCloudStorage(AsyncWrapper):
+    def __init__(self, project: str, bucket: str,
+                 credential: Optional[Union[str, Path]] = None,
+                 **kwargs: Any) -> None:
+        """
+        Args:
+            project (str) :
+            bucket (str) :
+            credential (str, os.PathLike, None) :
+            **kwargs : AsyncWrapper arguments
+        """
+        super().__init__(CloudStorage(project, bucket, credential=credential), **kwargs)
+
+    def get_blob_url(self, blob: str) -> str:
+        return self.wrapped.get_blob_url(blob)
+
+    async def bucket_exist(self, deadline: Optional[float] = None) -> bool:
+        return await self._run(self.wrapped.bucket_exist, deadline=deadline)
+
+    async def get_blob_list(self, deadline: Optional[float] = None) -> list:
+        return await self._run(self.wrapped.get_blob_list, deadline=deadline)
+
+    def iter_blobs(self, *args: Any, deadline: Optional[float] = None, **kwargs: Any) -> AsyncIterator[Any]:
+        """
+        See `CloudStorage.iter_blobs`. `deadline` applies to each blob.
+        """
+        return self._iterate(self.wrapped.iter_blobs, *args, deadline=deadline, **kwargs)
+
+    async def upload_from_filename(self, *args: Any, deadline: Optional[float] = None, **kwargs: Any) -> str:
+        return await self._run(self.wrapped.upload_from_filename, *args, deadline=deadline, **kwargs)
+
+    async def upload_from_string(self, *args: Any, deadline: Optional[float] = None, **kwargs: Any) -> str:
+        return await self._run(self.wrapped.upload_from_string, *args, deadline=deadline, **kwargs)
+
+    async def download_from_blob(self, *args: Any, deadline: Optional[float] = None, **kwargs: Any) -> None:
+        return await self._run(self.wrapped.download_from_blob, *args, deadline=deadline, **kwargs)
+
+    async def upload_composite(self, *args: Any, deadline: Optional[float] = None, **kwargs: Any) -> str:
+        return await self._run(self.wrapped.upload_composite, *args, deadline=deadline, **kwargs)
+
+    async def download_sliced(self, *args: Any, deadline: Optional[float] = None, **kwargs: Any) -> Any:
+        return await self._run(self.wrapped.download_sliced, *args, deadline=deadline, **kwargs)
+
+    async def upload_many(self, *args: Any, deadline: Optional[float] = None, **kwargs: Any) -> TransferSummary:
+        return await self._run(self.wrapped.upload_many, *args, deadline=deadline, **kwargs)
+
+    async def download_many(self, *args: Any, deadline: Optional[float] = None, **kwargs: Any) -> TransferSummary:
+        return await self._run(self.wrapped.download_many, *args, deadline=deadline, **kwargs)
+
+    async def upload_directory(self, *args: Any, deadline: Optional[float] = None, **kwargs: Any) -> TransferSummary:
+        return await self._run(self.wrapped.upload_directory, *args, deadline=deadline, **kwargs)
+
+    async def download_prefix(self, *args: Any, deadline: Optional[float] = None, **kwargs: Any) -> TransferSummary:
+        return await self._run(self.wrapped.download_prefix, *args, deadline=deadline, **kwargs)
+
+    async def sync(self, *args: Any, deadline: Optional[float] = None, **kwargs: Any) -> Any:
+        return await self._run(self.wrapped.sync, *args, deadline=deadline, **kwargs)
+
+
+class AsyncBigQuery(AsyncWrapper):
+    def __init__(self, project: str, dataset: str,
+                 credential: Optional[Union[str, Path]] = None,
+                 **kwargs: Any) -> None:
+        """
+        `writer` and `load_scheduler` objects are thread-safe and can be used
+        through `wrapped` directly.
+
+        Args:
+            project (str) :
+            dataset (str) :
+            credential (str, os.PathLike, None) :
+            **kwargs : AsyncWrapper arguments
+        """
+        super().__init__(BigQuery(project, dataset, credential=credential), **kwargs)
+
+    def enable_query_cache(self, *args: Any, **kwargs: Any) -> Any:
+        return self.wrapped.enable_query_cache(*args, **kwargs)
+
+    async def create_table_from_gcs_uri(self, *args: Any, deadline: Optional[float] = None, **kwargs: Any) -> Any:
+        return await self._run(self.wrapped.create_table_from_gcs_uri, *args, deadline=deadline, **kwargs)
+
+    def create_tables_from_gcs_uris(self, *args: Any, deadline: Optional[float] = None, **kwargs: Any) -> AsyncIterator[Future]:
+        """
+        See `BigQuery.create_tables_from_gcs_uris`. `deadline` applies to each future.
+        """
+        return self._iterate(self.wrapped.create_tables_from_gcs_uris, *args, deadline=deadline, **kwargs)
+
+    async def query(self, *args: Any, deadline: Optional[float] = None, **kwargs: Any) -> Any:
+        return await self._run(self.wrapped.query, *args, deadline=deadline, **kwargs)
+
+    def query_batches(self, *args: Any, deadline: Optional[float] = None, **kwargs: Any) -> AsyncIterator[Any]:
+        """
+        See `BigQuery.query_batches`. `deadline` applies to each batch.
+        """
+        return self._iterate(self.wrapped.query_batches, *args, deadline=deadline, **kwargs)
+
+    async def load_from_file(self, *args: Any, deadline: Optional[float] = None, **kwargs: Any) -> Any:
+        return await self._run(self.wrapped.load_from_file, *args, deadline=deadline, **kwargs)
+
+    async def load_from_records(self, *args: Any, deadline: Optional[float] = None, **kwargs: Any) -> Any:
+        return await self._run(self.wrapped.load_from_records, *args, deadline=deadline, **kwargs)
+
+    def export_table(self, *args: Any, deadline: Optional[float] = None, **kwargs: Any) -> AsyncIterator[Path]:
+        """
+        See `BigQuery.export_table`. `deadline` applies to each local path.
+        """
+        return self._iterate(self.wrapped.export_table, *args, deadline=deadline, **kwargs)
+
+
+class AsyncCloudLanguage(AsyncWrapper):
+    def __init__(self,
+                 credentials: Optional[Union[str, Path]] = None,
+                 cache: Optional[Any] = None,
+                 **kwargs: Any) -> None:
+        """
+        Args:
+            credentials (str, os.PathLike, None) :
+            cache (Cache, None) : see `CloudLanguage`
+            **kwargs : AsyncWrapper arguments
+        """
+        super().__init__(CloudLanguage(credentials, cache=cache), **kwargs)
+
+    def _timeout(self, deadline: Optional[float], kwargs: Dict[str, Any]) -> None:
+        # the gRPC deadline frees the worker thread when the caller stops waiting.
+        deadline = deadline if deadline is not None else self.deadline
+        if deadline is not None:
+            kwargs.setdefault('timeout', deadline)
+
+    async def annotate_text(self, content: str, deadline: Optional[float] = None, **kwargs: Any) -> Any:
+        self._timeout(deadline, kwargs)
+        return await self._run(self.wrapped.annotate_text, content, deadline=deadline, **kwargs)
+
+    async def annotate_text_from_string(self, content: str, deadline: Optional[float] = None, **kwargs: Any) -> str:
+        self._timeout(deadline, kwargs)
+        return await self._run(self.wrapped.annotate_text_from_string, content, deadline=deadline, **kwargs)
+
+    async def annotate_long_text(self, content: str, deadline: Optional[float] = None, **kwargs: Any) -> Any:
+        return await self._run(self.wrapped.annotate_long_text, content, deadline=deadline, **kwargs)
+
+    def annotate_many(self, *args: Any, deadline: Optional[float] = None,
+                      **kwargs: Any) -> AsyncIterator[Tuple[int, Any]]:
+        """
+        See `CloudLanguage.annotate_many`. `deadline` applies to each result.
+        """
+        return self._iterate(self.wrapped.annotate_many, *args, deadline=deadline, **kwargs)
+
+
+class AsyncSpeechToText(AsyncWrapper):
+    def __init__(self, credential: Optional[Union[str, Path]] = None, **kwargs: Any) -> None:
+        """
+        Args:
+            credential (str, os.PathLike, None) :
+            **kwargs : AsyncWrapper arguments
+        """
+        super().__init__(SpeechToText(credential=credential), **kwargs)
+
+    async def recognize_from_uri(self, *args: Any, deadline: Optional[float] = None, **kwargs: Any) -> Any:
+        return await self._run(self.wrapped.recognize_from_uri, *args, deadline=deadline, **kwargs)
+
+    async def recognize_from_file(self, *args: Any, deadline: Optional[float] = None, **kwargs: Any) -> Any:
+        return await self._run(self.wrapped.recognize_from_file, *args, deadline=deadline, **kwargs)
+
+    def stream_file(self, *args: Any, deadline: Optional[float] = None, **kwargs: Any) -> AsyncIterator[Any]:
+        """
+        See `SpeechToText.stream_file`. `deadline` applies to each result.
+        """
+        return self._iterate(self.wrapped.stream_file, *args, deadline=deadline, **kwargs)
+
+    def recognize_many(self, *args: Any, deadline: Optional[float] = None,
+                       **kwargs: Any) -> AsyncIterator[Tuple[str, Any]]:
+        """
+        See `SpeechToText.recognize_many`. `deadline` applies to each result.
+        """
+        return self._iterate(self.wrapped.recognize_many, *args, deadline=deadline, **kwargs)
+
+
+class AsyncTextToSpeech(AsyncWrapper):
+    def __init__(self,
+                 credential: Optional[Union[str, Path]] = None,
+                 cache: Optional[Any] = None,
+                 **kwargs: Any) -> None:
+        """
+        Args:
+            credential (str, os.PathLike, None) :
+            cache (Cache, None) : see `TextToSpeech`
+            **kwargs : AsyncWrapper arguments
+        """
+        super().__init__(TextToSpeech(credential=credential, cache=cache), **kwargs)
+
+    async def synthesize(self, *args: Any, deadline: Optional[float] = None, **kwargs: Any) -> Any:
+        return await self._run(self.wrapped.synthesize, *args, deadline=deadline, **kwargs)
+
+    async def synthesize_to_file(self, *args: Any, deadline: Optional[float] = None, **kwargs: Any) -> None:
+        return await self._run(self.wrapped.synthesize_to_file, *args, deadline=deadline, **kwargs)
+
+    def synthesize_long(self, *args: Any, deadline: Optional[float] = None, **kwargs: Any) -> AsyncIterator[bytes]:
+        """
+        See `TextToSpeech.synthesize_long`. `deadline` applies to each piece of audio.
+        """
+        return self._iterate(self.wrapped.synthesize_long, *args, deadline=deadline, **kwargs)
+
+    async def synthesize_long_to_file(self, *args: Any, deadline: Optional[float] = None, **kwargs: Any) -> int:
+        return await self._run(self.wrapped.synthesize_long_to_file, *args, deadline=deadline, **kwargs)
+
+    async def synthesize_many(self, *args: Any, deadline: Optional[float] = None,
+                              **kwargs: Any) -> TransferSummary:
+        return await self._run(self.wrapped.synthesize_many, *args, deadline=deadline, **kwargs)
+
+    async def save(self, response: Any, filename: Union[str, Path], deadline: Optional[float] = None,
+                   **kwargs: Any) -> None:
+        return await self._run(self.wrapped.save, response, filename, deadline=deadline, **kwargs)
+
@@ -0,0 +1,251 @@
+import io
+import os
+import struct
+import wave
+from typing import Iterator, NamedTuple, Optional, Union
+
+from google.cloud.speech import enums
+
+try:
+    import numpy as np
+except ImportError:
+    np = None  # type: ignore
+
+try:
+    import soundfile
+except ImportError:
+    soundfile = None
+
+# recognition models gain nothing above this rate.
+TARGET_SAMPLE_RATE = 16000
+_FIR_TAPS = 63
+# WAVE format tags. extensible files carry the real tag in their sub-format.
+_WAVE_FORMAT_PCM = 1
+_WAVE_FORMAT_MULAW = 7
+_WAVE_FORMAT_EXTENSIBLE = 0xFFFE
+
+
+class AudioInfo(NamedTuple):
+    container: str
+    # ENCODING_UNSPECIFIED when the audio has to be converted before it can be sent.
+    encoding: int
+    sample_rate: int
+    channels: int
+    sample_width: Optional[int] = None
+
+
+def sniff(file: Union[str, os.PathLike]) -> Optional[AudioInfo]:
+    """
+    Read encoding, sample rate and channels from the container header.
+    WAV with PCM or mu-law samples, FLAC and Ogg Opus are recognized. The API
+    reads only 16 bit PCM as LINEAR16, so other sample widths are reported with
+    ENCODING_UNSPECIFIED and have to go through `to_linear16`.
+
+    Args:
+        file (str, os.PathLike) :
+
+    Returns:
+        AudioInfo, None : None for unknown containers and other WAV formats, e.g. float or ADPCM
+    """
+    with io.open(file, 'rb') as f:
+        head = f.read(4096)
+
+    if head[:4] == b'RIFF' and head[8:12] == b'WAVE':
+        offset = 12
+        while offset + 8 <= len(head):
+            chunk_id, size = struct.unpack('<4sI', head[offset:offset + 8])
+            if chunk_id == b'fmt ':
+                tag, channels, rate, _, _, bits = struct.unpack('<HHIIHH', head[offset + 8:offset + 24])
+                if tag == _WAVE_FORMAT_EXTENSIBLE and size >= 26:
+                    tag = struct.unpack('<H', head[offset + 32:offset + 34])[0]
+                if tag == _WAVE_FORMAT_PCM:
+                    encoding = enums.RecognitionConfig.AudioEncoding.LINEAR16
+                    if bits != 16:
+                        encoding = enums.RecognitionConfig.AudioEncoding.ENCODING_UNSPECIFIED
+                    return AudioInfo('wav', encoding, rate, channels, bits // 8)
+                if tag == _WAVE_FORMAT_MULAW:
+                    return AudioInfo('wav', enums.RecognitionConfig.AudioEncoding.MULAW, rate, channels)
+                return None
+            offset += 8 + size + (size & 1)
+        return None
+
+    if head[:4] == b'fLaC':
+        # STREAMINFO: 20 bits rate, 3 bits channels - 1, 5 bits bits per sample - 1.
+        packed = int.from_bytes(head[18:22], 'big')
+        rate = packed >> 12
+        channels = ((packed >> 9) & 0x7) + 1
+        bits = ((packed >> 4) & 0x1f) + 1
+        return AudioInfo('flac', enums.RecognitionConfig.AudioEncoding.FLAC, rate, channels, bits // 8)
+
+    if head[:4] == b'OggS':
+        start = head.find(b'OpusHead')
+        if start >= 0:
+            channels = head[start + 9]
+            rate = struct.unpack('<I', head[start + 12:start + 16])[0] or 48000
+            return AudioInfo('ogg', enums.RecognitionConfig.AudioEncoding.OGG_OPUS, rate, channels)
+
+    return None
+
+
+def header_duration(head: bytes, size: int) -> Optional[float]:
+    """
+    Read the duration of a WAV or FLAC file from the start of its content.
+
+    Args:
+        head (bytes) : first bytes of the file, 4096 are enough for common headers
+        size (int) : total size of the file
+
+    Returns:
+        float, None : seconds. None for other formats and for headers without a frame count.
+    """
+    if head[:4] == b'RIFF' and head[8:12] == b'WAVE':
+        offset = 12
+        block_align = rate = 0
+        while offset + 8 <= len(head):
+            chunk_id, chunk_size = struct.unpack('<4sI', head[offset:offset + 8])
+            if chunk_id == b'fmt ':
+                rate, _, block_align = struct.unpack('<IIH', head[offset + 12:offset + 22])
+            elif chunk_id == b'data':
+                if not (block_align and rate):
+                    return None
+                # streamed files leave the size at its maximum.
+                frames = min(chunk_size, size - offset - 8) // block_align
+                return frames / rate
+            offset += 8 + chunk_size + (chunk_size & 1)
+        return None
+
+    if head[:4] == b'fLaC' and len(head) >= 26:
+        # STREAMINFO: 20 bits rate, 3 bits channels - 1, 5 bits bits per sample - 1, 36 bits samples.
+        packed = int.from_bytes(head[18:26], 'big')
+        rate = packed >> 44
+        samples = packed & (2 ** 36 - 1)
+        if rate and samples:
+            return samples / rate
+    return None
+
+
+def _pcm_width(info: AudioInfo) -> Optional[int]:
+    """
+    Returns:
+        int, None : bytes per sample of a PCM WAV file which is decoded without
+            soundfile, None for anything else
+    """
+    if info.container == 'wav' and info.encoding != enums.RecognitionConfig.AudioEncoding.MULAW:
+        if info.sample_width in (1, 2, 4):
+            return info.sample_width
+    return None
+
+
+def _pcm_blocks(file: Union[str, os.PathLike], info: AudioInfo, block_frames: int) -> Iterator['np.ndarray']:
+    """
+    Yield float32 blocks of shape (frames, channels).
+    """
+    width = _pcm_width(info)
+    if width is not None:
+        dtype = {1: np.uint8, 2: np.int16, 4: np.int32}[width]
+        scale = float(2 ** (8 * width - 1))
+        with wave.open(str(file), 'rb') as w:
+            while True:
+                frames = w.readframes(block_frames)
+                if not frames:
+                    return
+                block = np.frombuffer(frames, dtype=dtype).astype(np.float32)
+                if width == 1:
+                    block -= 128.0
+                yield block.reshape(-1, info.channels) / scale
+    elif soundfile is not None:
+        for block in soundfile.blocks(str(file), blocksize=block_frames, dtype='float32', always_2d=True):
+            yield block
+    else:
+        raise ValueError('decoding {} requires the soundfile package'.format(info.container))
+
+
+def can_convert(info: Optional[AudioInfo]) -> bool:
+    """
+    Args:
+        info (AudioInfo, None) : result of `sniff`
+
+    Returns:
+        bool : whether `to_linear16` can decode the file in this environment
+    """
+    if info is None or np is None:
+        return False
+    return _pcm_width(info) is not None or soundfile is not None
+
+
+def is_compact(info: AudioInfo, sample_rate: int = TARGET_SAMPLE_RATE) -> bool:
+    """
+    Args:
+        info (AudioInfo) : result of `sniff`
+        sample_rate (int) : rate `to_linear16` would convert to
+
+    Returns:
+        bool : the file is mono FLAC or Ogg Opus at or below `sample_rate`, so
+            converting it to LINEAR16 would only make it larger
+    """
+    if info.channels != 1 or info.sample_rate > sample_rate:
+        return False
+    if info.encoding == enums.RecognitionConfig.AudioEncoding.OGG_OPUS:
+        # the rates the API accepts for Opus.
+        return info.sample_rate in (8000, 12000, 16000)
+    return info.encoding == enums.RecognitionConfig.AudioEncoding.FLAC
+
+
+def to_linear16(file: Union[str, os.PathLike],
+                info: AudioInfo,
+                sample_rate: int = TARGET_SAMPLE_RATE,
+                block_frames: int = 65536) -> Iterator[bytes]:
+    """
+    Stream a file as mono LINEAR16 at `sample_rate`. Channels are averaged, a
+    windowed-sinc low-pass filter removes content above the new Nyquist rate, and
+    samples are linearly interpolated. Filter and interpolation state carry over
+    block boundaries, so only one block is in memory at a time.
+
+    Args:
+        file (str, os.PathLike) :
+        info (AudioInfo) : result of `sniff`
+        sample_rate (int) : output rate. never above the input rate.
+        block_frames (int) : input frames per block
+
+    Returns:
+        Iterator[bytes] : raw little-endian 16 bit samples without a header
+    """
+    if np is None:
+        raise ImportError('numpy is required for audio preprocessing')
+
+    sample_rate = min(sample_rate, info.sample_rate)
+    step = info.sample_rate / sample_rate
+    if step > 1:
+        cutoff = 0.5 / step
+        n = np.arange(_FIR_TAPS) - (_FIR_TAPS - 1) / 2
+        taps = (2 * cutoff * np.sinc(2 * cutoff * n) * np.hamming(_FIR_TAPS)).astype(np.float32)
+        history = np.zeros(_FIR_TAPS - 1, dtype=np.float32)
+    else:
+        taps = None
+
+    position = 0.0  # input index of the next output sample
+    consumed = 0  # input samples before the current block
+    last = None  # last filtered sample of the previous block
+    for block in _pcm_blocks(file, info, block_frames):
+        mono = block.mean(axis=1)
+        if taps is not None:
+            extended = np.concatenate([history, mono])
+            mono = np.convolve(extended, taps, mode='valid')
+            history = extended[-(_FIR_TAPS - 1):]
+
+        if last is not None:
+            mono = np.concatenate([[last], mono])
+            base = consumed - 1
+        else:
+            base = consumed
+        end = base + len(mono) - 1
+        consumed += len(block)
+        if len(mono):
+            last = mono[-1]
+
+        if position > end:
+            continue
+        times = np.arange(position, end + 1e-9, step)
+        position = times[-1] + step
+        out = np.interp(times - base, np.arange(len(mono)), mono)
+        yield (np.clip(out, -1.0, 1.0) * 32767).astype('<i2').tobytes()
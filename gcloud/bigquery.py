@@ -1,8 +1,216 @@
+import gzip
+import heapq
+import io
+import itertools
+import json
+import os
+import queue
+import threading
+import time
+import uuid
+import zlib
+from concurrent.futures import Future, ThreadPoolExecutor, FIRST_COMPLETED, as_completed, wait
 from pathlib import Path
-from typing import Union, Optional
+from typing import Any, Union, Optional, Dict, Iterable, Iterator, List, Mapping, Sequence, Set, Tuple
 
+from google.api_core import exceptions
 from google.cloud import bigquery
-from google.oauth2.service_account import Credentials
+
+from gcloud.cloud_storage import CloudStorage, _FileRange
+from gcloud.concurrency import Backoff, TRANSIENT_ERRORS
+from gcloud.pool import get_client, get_credentials
+from gcloud.query_cache import QueryCache, cache_key
+
+try:
+    import numpy as np
+except ImportError:
+    np = None  # type: ignore
+
+try:
+    import pyarrow
+except ImportError:
+    pyarrow = None  # type: ignore
+
+# inputs larger than this are split into parallel load jobs.
+LOAD_CHUNK_BYTES = 256 * 1024 * 1024
+
+# file extensions of extract job destination formats.
+EXPORT_EXTENSIONS = {'CSV': 'csv', 'NEWLINE_DELIMITED_JSON': 'json', 'AVRO': 'avro'}
+
+# job error reasons which are retried by LoadJobScheduler.
+TRANSIENT_JOB_REASONS = ('backendError', 'internalError', 'rateLimitExceeded')
+# streaming insert error reasons which are retried by TableWriter.
+# "stopped" marks valid rows rejected because another row of the request was invalid.
+TRANSIENT_INSERT_REASONS = ('stopped', 'timeout') + TRANSIENT_JOB_REASONS
+
+
+def _get_client(project: str,
+                credential: Optional[Union[str, Path]] = None) -> bigquery.Client:
+    """
+
+    Args:
+        project (str) : project_id on google cloud platform
+        credential (str, os.PathLike, None) : access key location
+
+    Returns:
+        bigquery.Client : pooled client
+    """
+    def factory() -> bigquery.Client:
+        if credential is None:
+            return bigquery.Client(project=project)
+        return bigquery.Client(project=project, credentials=get_credentials(credential))
+
+    return get_client('bigquery', project, credential, factory)
+
+
+def _get_storage_client(project: str, credential: Optional[Union[str, Path]] = None) -> Any:
+    """
+
+    Args:
+        project (str) : project_id on google cloud platform
+        credential (str, os.PathLike, None) : access key location
+
+    Returns:
+        BigQueryStorageClient : pooled client of the BigQuery Storage API
+    """
+    from google.cloud import bigquery_storage_v1beta1
+
+    def factory() -> Any:
+        if credential is None:
+            return bigquery_storage_v1beta1.BigQueryStorageClient()
+        return bigquery_storage_v1beta1.BigQueryStorageClient(credentials=get_credentials(credential))
+
+    return get_client('bigquery_storage', project, credential, factory)
+
+
+def _to_numpy(field: bigquery.SchemaField, values: List[Any]) -> Any:
+    """
+    Convert one column of `tabledata.list` values to a NumPy array. The dtype only
+    depends on the schema, so every page of a column has the same type. NULLs
+    become NaN / NaT in float and timestamp columns, nullable INTEGER and BOOLEAN
+    columns are masked arrays, and other types are object arrays.
+
+    Args:
+        field (bigquery.SchemaField) :
+        values (list) : raw json values
+
+    Returns:
+        numpy.ndarray, numpy.ma.MaskedArray
+    """
+    if field.mode == 'REPEATED' or field.field_type in ('RECORD', 'STRUCT'):
+        return np.array(values, dtype=object)
+
+    nulls = [v is None for v in values]
+    if field.field_type in ('FLOAT', 'FLOAT64'):
+        return np.array(['nan' if v is None else v for v in values]).astype(np.float64)
+    if field.field_type == 'TIMESTAMP':
+        seconds = np.array([0 if v is None else v for v in values]).astype(np.float64)
+        # the product is a hair off whole microseconds, which a plain cast would truncate.
+        micros = np.rint(seconds * 1e6).astype(np.int64)
+        column = micros.astype('datetime64[us]')
+        column[nulls] = np.datetime64('NaT')
+        return column
+    if field.field_type in ('INTEGER', 'INT64'):
+        column = np.array([0 if v is None else v for v in values]).astype(np.int64)
+    elif field.field_type in ('BOOLEAN', 'BOOL'):
+        column = np.array([v == 'true' for v in values], dtype=bool)
+    else:
+        return np.array(values, dtype=object)
+    if field.mode == 'REQUIRED':
+        return column
+    return np.ma.MaskedArray(column, mask=np.array(nulls, dtype=bool))
+
+
+def _arrow_type(field: bigquery.SchemaField) -> Any:
+    """
+    Args:
+        field (bigquery.SchemaField) :
+
+    Returns:
+        pyarrow.DataType
+    """
+    if pyarrow is None:
+        raise ImportError('pyarrow is required for arrow batches')
+    if field.mode == 'REPEATED' or field.field_type in ('RECORD', 'STRUCT'):
+        # the raw json of nested values, see `_arrow_values`.
+        return pyarrow.string()
+    if field.field_type in ('INTEGER', 'INT64'):
+        return pyarrow.int64()
+    if field.field_type in ('FLOAT', 'FLOAT64'):
+        return pyarrow.float64()
+    if field.field_type in ('BOOLEAN', 'BOOL'):
+        return pyarrow.bool_()
+    if field.field_type == 'TIMESTAMP':
+        return pyarrow.timestamp('us', tz='UTC')
+    # the json api returns every other type as a string, e.g. base64 for BYTES.
+    return pyarrow.string()
+
+
+def _arrow_schema(fields: Sequence[bigquery.SchemaField]) -> Any:
+    """
+    Args:
+        fields (Sequence[bigquery.SchemaField]) :
+
+    Returns:
+        pyarrow.Schema : of the batches built from `tabledata.list` pages
+    """
+    if pyarrow is None:
+        raise ImportError('pyarrow is required for arrow batches')
+    return pyarrow.schema([pyarrow.field(field.name, _arrow_type(field)) for field in fields])
+
+
+def _arrow_values(field: bigquery.SchemaField, column: Any) -> Any:
+    """
+    Args:
+        field (bigquery.SchemaField) :
+        column (numpy.ndarray) : output of `_to_numpy`
+
+    Returns:
+        numpy.ndarray, list : values accepted by pyarrow.array with `_arrow_type(field)`
+    """
+    if field.mode == 'REPEATED' or field.field_type in ('RECORD', 'STRUCT'):
+        return [None if v is None else json.dumps(v) for v in column]
+    return column
+
+
+def _arrow_to_numpy(column: Any, nullable: bool) -> Any:
+    """
+    Convert a pyarrow column to NumPy the same way as `_to_numpy`, so integer and
+    boolean columns don't turn into floats or objects on pages with NULLs.
+
+    Args:
+        column (pyarrow.Array) :
+        nullable (bool) : mode of the column is not REQUIRED
+
+    Returns:
+        numpy.ndarray, numpy.ma.MaskedArray
+    """
+    if pyarrow is None:
+        raise ImportError('pyarrow is required for the Storage API')
+    is_bool = pyarrow.types.is_boolean(column.type)
+    if not (is_bool or pyarrow.types.is_integer(column.type)):
+        return column.to_numpy(zero_copy_only=False)
+    values = column.fill_null(False if is_bool else 0).to_numpy(zero_copy_only=False)
+    if not nullable:
+        return values
+    return np.ma.MaskedArray(values, mask=column.is_null().to_numpy(zero_copy_only=False))
+
+
+def _selected_fields(table: bigquery.Table,
+                     columns: Optional[Sequence[str]]) -> List[bigquery.SchemaField]:
+    """
+    Args:
+        table (bigquery.Table) :
+        columns (Sequence, None) : None selects all columns
+
+    Returns:
+        list : schema fields of `columns` in the requested order
+    """
+    if columns is None:
+        return list(table.schema)
+    fields = [f for f in table.schema if f.name in columns]
+    fields.sort(key=lambda f: list(columns).index(f.name))
+    return fields
 
 
 def load_from_cloud_storage_uri(source_uri: str,
@@ -30,8 +238,7 @@ def load_from_cloud_storage_uri(source_uri: str,
     """
 
     # setup credential and client.
-    credentials = Credentials.from_service_account_file(filename=credential)
-    client = bigquery.Client(project=project, credentials=credentials)
+    client = _get_client(project=project, credential=credential)
     dataset_ref = client.dataset(dataset_id=dataset)
 
     job_config = bigquery.LoadJobConfig()
@@ -47,6 +254,452 @@ def load_from_cloud_storage_uri(source_uri: str,
     return load_job.result()
 
 
+class _GzipReader(io.RawIOBase):
+    def __init__(self, source: Iterator[bytes], level: int = 6) -> None:
+        """
+        Compress a stream of byte blocks into gzip on the fly, so that uploads
+        never need a compressed copy on disk or in memory.
+
+        Args:
+            source (Iterator[bytes]) : uncompressed blocks
+            level (int) : compression level
+        """
+        super().__init__()
+        self._source = source
+        self._compressor = zlib.compressobj(level, zlib.DEFLATED, 16 + zlib.MAX_WBITS)
+        self._pending = bytearray()
+        self._eof = False
+        self._position = 0
+
+    def readable(self) -> bool:
+        return True
+
+    def tell(self) -> int:
+        # resumable uploads record the stream position, although they never seek.
+        return self._position
+
+    def readinto(self, buffer: Any) -> int:
+        view = memoryview(buffer).cast('B')
+        # resumable uploads take a short read for the end of the stream, so fill the buffer.
+        while len(self._pending) < len(view) and not self._eof:
+            block = next(self._source, None)
+            if block is None:
+                self._pending.extend(self._compressor.flush())
+                self._eof = True
+            else:
+                self._pending.extend(self._compressor.compress(block))
+
+        size = min(len(view), len(self._pending))
+        view[:size] = self._pending[:size]
+        del self._pending[:size]
+        self._position += size
+        return size
+
+
+def _read_blocks(stream: io.RawIOBase, block_size: int = 1024 * 1024) -> Iterator[bytes]:
+    return iter(lambda: stream.read(block_size), b'')
+
+
+def _splittable(job_config: bigquery.LoadJobConfig) -> bool:
+    """
+    Args:
+        job_config (bigquery.LoadJobConfig) :
+
+    Returns:
+        bool : False when a newline may be part of a quoted CSV value, so that
+            the file cannot be split at arbitrary line boundaries
+    """
+    source_format = job_config.source_format or bigquery.SourceFormat.CSV
+    return not (source_format == bigquery.SourceFormat.CSV and job_config.allow_quoted_newlines)
+
+
+def _line_ranges(fd: int, size: int, chunk_bytes: int) -> List[Tuple[int, int]]:
+    """
+    Split a file into ranges of about `chunk_bytes` which end on a newline.
+
+    Args:
+        fd (int) : file descriptor
+        size (int) : file size
+        chunk_bytes (int) : target range size
+
+    Returns:
+        list : (offset, length) pairs
+    """
+    ranges = []
+    offset = 0
+    while offset < size:
+        end = offset + chunk_bytes
+        if end >= size:
+            end = size
+        else:
+            # move the boundary just past the next newline.
+            while end < size:
+                block = os.pread(fd, 64 * 1024, end)
+                newline = block.find(b'\n')
+                if newline >= 0:
+                    end += newline + 1
+                    break
+                end += len(block)
+        ranges.append((offset, end - offset))
+        offset = end
+    return ranges
+
+
+class JobError(Exception):
+    def __init__(self, job: Any) -> None:
+        """
+        Args:
+            job (bigquery.job._AsyncJob) : finished job with `error_result`
+        """
+        super().__init__('{}: {}'.format(job.job_id, job.error_result))
+        self.job = job
+
+
+class LoadJobError(JobError):
+    pass
+
+
+class ExtractJobError(JobError):
+    pass
+
+
+class _LoadRequest:
+    def __init__(self, uri: Union[str, List[str]], destination: bigquery.TableReference,
+                 job_config: Optional[bigquery.LoadJobConfig]) -> None:
+        self.uri = uri
+        self.destination = destination
+        self.job_config = job_config
+        self.future = Future()  # type: Future
+        self.attempts = 0
+
+
+class LoadJobScheduler:
+    def __init__(self,
+                 client: bigquery.Client,
+                 max_in_flight: int = 20,
+                 poll_interval: float = 1.0,
+                 max_retries: int = 3,
+                 backoff: Optional[Backoff] = None) -> None:
+        """
+        Submit many load jobs without waiting on each of them. At most
+        `max_in_flight` jobs run at once. Running jobs are polled in one batch per
+        `poll_interval` by listing unfinished jobs, so only finished jobs are
+        fetched individually. Listing jobs needs the `bigquery.jobs.list`
+        permission; without it the scheduler falls back to reloading every running
+        job on each poll. Transient failures are resubmitted with backoff, any other
+        error fails the future of the affected job.
+
+        Args:
+            client (bigquery.Client) :
+            max_in_flight (int) : number of concurrently running jobs
+            poll_interval (float) : seconds between status polls
+            max_retries (int) : resubmissions of a transiently failed job
+            backoff (Backoff, None) : delay between resubmissions
+        """
+        self.client = client
+        self.max_in_flight = max_in_flight
+        self.poll_interval = poll_interval
+        self.max_retries = max_retries
+        self.backoff = backoff or Backoff()
+        self._queue = []  # type: List[Tuple[float, int, _LoadRequest]]
+        self._counter = itertools.count()
+        self._running = {}  # type: Dict[str, Tuple[bigquery.LoadJob, _LoadRequest]]
+        self._list_jobs = True
+        self._futures = []  # type: List[Future]
+        self._cond = threading.Condition()
+        self._closed = False
+        self._thread = threading.Thread(target=self._loop, name='LoadJobScheduler', daemon=True)
+        self._thread.start()
+
+    def __enter__(self) -> 'LoadJobScheduler':
+        return self
+
+    def __exit__(self, *args: object) -> None:
+        self.close()
+
+    def submit(self,
+               uri: Union[str, List[str]],
+               destination: bigquery.TableReference,
+               job_config: Optional[bigquery.LoadJobConfig] = None) -> Future:
+        """
+        Args:
+            uri (str, list) : cloud storage uri(s)
+            destination (bigquery.TableReference) :
+            job_config (bigquery.LoadJobConfig, None) :
+
+        Returns:
+            Future : resolves to the finished bigquery.LoadJob, or raises LoadJobError
+        """
+        request = _LoadRequest(uri, destination, job_config)
+        with self._cond:
+            if self._closed:
+                raise RuntimeError('LoadJobScheduler is already closed')
+            heapq.heappush(self._queue, (0.0, next(self._counter), request))
+            self._futures.append(request.future)
+            self._cond.notify()
+        return request.future
+
+    def as_completed(self) -> Iterator[Future]:
+        """
+        Returns:
+            Iterator[Future] : every submitted future in completion order
+        """
+        with self._cond:
+            futures = list(self._futures)
+        return as_completed(futures)
+
+    def close(self, wait: bool = True) -> None:
+        """
+        Stop accepting jobs. With `wait`, block until every submitted job finished.
+
+        Args:
+            wait (bool) :
+        """
+        with self._cond:
+            self._closed = True
+            self._cond.notify()
+        if wait:
+            self._thread.join()
+
+    def _loop(self) -> None:
+        while True:
+            with self._cond:
+                if self._closed and not self._queue and not self._running:
+                    return
+                if not self._queue and not self._running:
+                    self._cond.wait()
+                    continue
+                ready = []  # type: List[_LoadRequest]
+                now = time.monotonic()
+                while (self._queue and self._queue[0][0] <= now
+                       and len(self._running) + len(ready) < self.max_in_flight):
+                    ready.append(heapq.heappop(self._queue)[2])
+
+            for request in ready:
+                self._start(request)
+            if self._running:
+                self._poll()
+
+            with self._cond:
+                self._cond.wait(self.poll_interval)
+
+    def _start(self, request: _LoadRequest) -> None:
+        try:
+            job = self.client.load_table_from_uri(
+                source_uris=request.uri,
+                destination=request.destination,
+                job_id_prefix='load_',
+                job_config=request.job_config)
+        except TRANSIENT_ERRORS as e:
+            self._retry(request, e)
+        except Exception as e:
+            request.future.set_exception(e)
+        else:
+            self._running[job.job_id] = (job, request)
+
+    def _retry(self, request: _LoadRequest, error: Exception) -> None:
+        if request.attempts >= self.max_retries:
+            request.future.set_exception(error)
+            return
+        delay = self.backoff.delay(request.attempts)
+        request.attempts += 1
+        with self._cond:
+            heapq.heappush(self._queue, (time.monotonic() + delay, next(self._counter), request))
+
+    def _poll(self) -> None:
+        finished = list(self._running)
+        if self._list_jobs:
+            try:
+                unfinished = {job.job_id
+                              for state in ('pending', 'running')
+                              for job in self.client.list_jobs(state_filter=state)}
+            except TRANSIENT_ERRORS:
+                return
+            except Exception:
+                # most likely missing bigquery.jobs.list, reload each job instead
+                self._list_jobs = False
+            else:
+                finished = [j for j in finished if j not in unfinished]
+
+        for job_id in finished:
+            job, request = self._running[job_id]
+            try:
+                job.reload()
+            except TRANSIENT_ERRORS:
+                continue
+            except Exception as e:
+                del self._running[job_id]
+                request.future.set_exception(e)
+                continue
+            if job.state != 'DONE':
+                continue
+
+            del self._running[job_id]
+            error = job.error_result
+            if error is None:
+                request.future.set_result(job)
+            elif error.get('reason') in TRANSIENT_JOB_REASONS:
+                self._retry(request, LoadJobError(job))
+            else:
+                request.future.set_exception(LoadJobError(job))
+
+
+def _row_size(row: Mapping[str, Any]) -> int:
+    # only an estimate for batching, rows which are not serializable are rejected by the insert.
+    return len(json.dumps(row, default=str))
+
+
+class TableWriter:
+    def __init__(self,
+                 client: bigquery.Client,
+                 table: Union[bigquery.Table, bigquery.TableReference, str],
+                 max_rows: int = 500,
+                 max_bytes: int = 5 * 1024 * 1024,
+                 max_latency: float = 1.0,
+                 max_queue: int = 10000,
+                 max_retries: int = 3,
+                 backoff: Optional[Backoff] = None) -> None:
+        """
+        Thread-safe buffered writer on top of streaming inserts. Rows are sent by
+        a background thread once `max_rows`, `max_bytes` or `max_latency` is
+        reached. `write` blocks while `max_queue` rows are waiting. Only rows which
+        failed transiently are retried; permanently rejected rows, including every
+        row of a request which raised a non-transient error, are kept in `errors`.
+
+        Args:
+            client (bigquery.Client) :
+            table (bigquery.Table, bigquery.TableReference, str) :
+            max_rows (int) : rows per insert request
+            max_bytes (int) : approximate json bytes per insert request
+            max_latency (float) : seconds a row waits before its batch is sent
+            max_queue (int) : rows buffered before `write` blocks
+            max_retries (int) : retries of a failed row
+            backoff (Backoff, None) : delay between retries
+        """
+        self.client = client
+        self.table = table
+        self.max_rows = max_rows
+        self.max_bytes = max_bytes
+        self.max_latency = max_latency
+        self.max_retries = max_retries
+        self.backoff = backoff or Backoff(initial=0.5, maximum=10.0)
+        self.errors = []  # type: List[Tuple[Mapping, Any]]
+        self.inserted = 0
+        self._queue = queue.Queue(maxsize=max_queue)  # type: queue.Queue
+        self._closed = False
+        self._thread = threading.Thread(target=self._loop, name='TableWriter', daemon=True)
+        self._thread.start()
+
+    def __enter__(self) -> 'TableWriter':
+        return self
+
+    def __exit__(self, *args: object) -> None:
+        self.close()
+
+    def write(self, row: Mapping[str, Any], timeout: Optional[float] = None) -> None:
+        """
+        Args:
+            row (Mapping) : json serializable row
+            timeout (float, None) : seconds to wait for space in the queue
+
+        Raises:
+            queue.Full : the queue stayed full for `timeout` seconds
+        """
+        if self._closed:
+            raise RuntimeError('TableWriter is already closed')
+        self._queue.put((str(uuid.uuid4()), row), timeout=timeout)
+
+    def write_rows(self, rows: Iterable[Mapping[str, Any]]) -> None:
+        """
+        Args:
+            rows (Iterable) : json serializable rows
+        """
+        for row in rows:
+            self.write(row)
+
+    def flush(self) -> None:
+        """
+        Block until every row written so far has been inserted or rejected.
+        """
+        self._queue.join()
+
+    def close(self) -> None:
+        """
+        Flush and stop the background thread.
+        """
+        if self._closed:
+            return
+        self._closed = True
+        self._queue.put(None)
+        self._thread.join()
+
+    def _loop(self) -> None:
+        while True:
+            item = self._queue.get()
+            if item is None:
+                self._queue.task_done()
+                return
+
+            batch = [item]
+            size = _row_size(item[1])
+            deadline = time.monotonic() + self.max_latency
+            stop = False
+            while len(batch) < self.max_rows and size < self.max_bytes:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                try:
+                    item = self._queue.get(timeout=remaining)
+                except queue.Empty:
+                    break
+                if item is None:
+                    stop = True
+                    break
+                batch.append(item)
+                size += _row_size(item[1])
+
+            try:
+                self._insert(batch)
+            finally:
+                for _ in batch:
+                    self._queue.task_done()
+                if stop:
+                    self._queue.task_done()
+            if stop:
+                return
+
+    def _insert(self, batch: List[Tuple[str, Mapping[str, Any]]]) -> None:
+        for attempt in range(self.max_retries + 1):
+            try:
+                errors = self.client.insert_rows_json(
+                    self.table,
+                    [row for _, row in batch],
+                    row_ids=[row_id for row_id, _ in batch])  # type: List[Dict[str, Any]]
+            except TRANSIENT_ERRORS as e:
+                errors = [{'index': i, 'errors': [{'reason': 'backendError', 'message': repr(e)}]}
+                          for i in range(len(batch))]
+            except Exception as e:
+                # the request itself was rejected, e.g. a missing table or unserializable rows.
+                errors = [{'index': i, 'errors': [{'reason': 'invalid', 'message': repr(e)}]}
+                          for i in range(len(batch))]
+
+            retry = []
+            for error in errors:
+                item = batch[error['index']]
+                reasons = {e.get('reason') for e in error['errors']}
+                if reasons <= set(TRANSIENT_INSERT_REASONS) and attempt < self.max_retries:
+                    retry.append(item)
+                else:
+                    self.errors.append((item[1], error['errors']))
+
+            self.inserted += len(batch) - len(errors)
+            if not retry:
+                return
+            # row ids stay the same, so BigQuery deduplicates rows which were already stored.
+            batch = retry
+            time.sleep(self.backoff.delay(attempt))
+
+
 class BigQuery:
     def __init__(self, project: str, dataset: str,
                  credential: Optional[Union[str, Path]] = None):
@@ -57,11 +710,27 @@ class BigQuery:
             dataset (str) :
             credential (str, os.PathLike) :
         """
-        credentials = Credentials.from_service_account_file(
-            filename=credential)
-        self.client = bigquery.Client(project=project, credentials=credentials)
+        self.project = project
+        self.credential = credential
+        self.client = _get_client(project=project, credential=credential)
         self.dataset_ref = self.client.dataset(dataset_id=dataset)
         self.dataset = bigquery.Dataset(dataset_ref=self.dataset_ref)
+        self.query_cache = None  # type: Optional[QueryCache]
+
+    def enable_query_cache(self, directory: Union[str, Path], max_bytes: int = 1024 ** 3) -> QueryCache:
+        """
+        Cache results of `query` on local disk. Entries are invalidated when a
+        referenced table is modified.
+
+        Args:
+            directory (str, os.PathLike) :
+            max_bytes (int) : total size of stored results
+
+        Returns:
+            QueryCache : exposes `hits`, `misses` and `hit_rate`
+        """
+        self.query_cache = QueryCache(directory, max_bytes=max_bytes)
+        return self.query_cache
 
     def create_table_from_gcs_uri(
             self,
@@ -84,3 +753,504 @@ class BigQuery:
             source_uris=uri,
             destination=self.dataset_ref.table(table),
             job_config=conf).result()
+
+    def load_scheduler(self, **kwargs: Any) -> LoadJobScheduler:
+        """
+
+        Args:
+            **kwargs : LoadJobScheduler arguments
+
+        Returns:
+            LoadJobScheduler : scheduler on this client. close it when done.
+        """
+        return LoadJobScheduler(self.client, **kwargs)
+
+    def create_tables_from_gcs_uris(
+            self,
+            requests: Iterable[Tuple[str, Union[str, List[str]]]],
+            max_in_flight: int = 20,
+            **kwargs: Any) -> Iterator[Future]:
+        """
+        Run many load jobs concurrently. Jobs are submitted once iteration starts.
+
+        Args:
+            requests (Iterable) : pairs of (table, uri)
+            max_in_flight (int) : number of concurrently running jobs
+            **kwargs (str) : Load Job Attributes
+
+        Returns:
+            Iterator[Future] : futures of bigquery.LoadJob in completion order
+        """
+        conf = bigquery.LoadJobConfig(**kwargs)
+        with LoadJobScheduler(self.client, max_in_flight=max_in_flight) as scheduler:
+            for table, uri in requests:
+                scheduler.submit(uri, self.dataset_ref.table(table), job_config=conf)
+            yield from scheduler.as_completed()
+
+    def writer(self, table: str, **kwargs: Any) -> TableWriter:
+        """
+
+        Args:
+            table (str) : table name in this dataset
+            **kwargs : TableWriter arguments
+
+        Returns:
+            TableWriter : close it to flush the remaining rows
+        """
+        return TableWriter(self.client, self.dataset_ref.table(table), **kwargs)
+
+    def query_batches(self,
+                      sql: str,
+                      columns: Optional[Sequence[str]] = None,
+                      batch_format: str = 'numpy',
+                      page_size: int = 10000,
+                      use_storage_api: bool = False,
+                      job_config: Optional[bigquery.QueryJobConfig] = None) -> Iterator[Any]:
+        """
+        Run a query and yield its result one page at a time in column-oriented form.
+        The next page is requested while the current one is processed, and `Row`
+        objects are never built.
+
+        Args:
+            sql (str) :
+            columns (Sequence, None) : columns to read. None reads all of them.
+            batch_format (str) : "numpy" yields dicts of column name to numpy.ndarray
+                (numpy.ma.MaskedArray for nullable INTEGER and BOOLEAN columns),
+                "arrow" yields pyarrow.RecordBatch. column types follow the table schema,
+                so they are the same on every page. without the Storage API, nested and
+                repeated columns of arrow batches hold their json text.
+            page_size (int) : rows per page of tabledata.list
+            use_storage_api (bool) : read the result through the BigQuery Storage API,
+                which is faster for large results. requires google-cloud-bigquery-storage and pyarrow.
+            job_config (bigquery.QueryJobConfig, None) :
+
+        Returns:
+            Iterator : column batches
+        """
+        if batch_format not in ('numpy', 'arrow'):
+            raise ValueError('batch_format must be "numpy" or "arrow": {}'.format(batch_format))
+        if batch_format == 'arrow' or use_storage_api:
+            if pyarrow is None:
+                raise ImportError('pyarrow is required for arrow batches and the Storage API')
+        if np is None:
+            raise ImportError('numpy is required for query_batches')
+
+        job = self.client.query(sql, job_config=job_config)
+        job.result()
+        table = self.client.get_table(job.destination)
+        return self._table_batches(table, columns, batch_format, page_size, use_storage_api)
+
+    def _table_batches(self, table: bigquery.Table, columns: Optional[Sequence[str]],
+                       batch_format: str, page_size: int, use_storage_api: bool) -> Iterator[Any]:
+        if use_storage_api:
+            batches = self._read_storage_api(table, columns)
+            if batch_format == 'arrow':
+                return batches
+            return ({field.name: _arrow_to_numpy(column, field.nullable)
+                     for field, column in zip(batch.schema, batch.columns)}
+                    for batch in batches)
+
+        fields = _selected_fields(table, columns)
+        pages = self._read_pages(table, fields, page_size)
+        if batch_format == 'numpy':
+            return pages
+        if pyarrow is None:
+            raise ImportError('pyarrow is required for arrow batches')
+        types = [_arrow_type(field) for field in fields]
+        # from_pandas turns NaN and NaT into nulls, and masked arrays keep their mask.
+        return (pyarrow.RecordBatch.from_arrays(
+                    [pyarrow.array(_arrow_values(field, page[field.name]), type=t, from_pandas=True)
+                     for field, t in zip(fields, types)],
+                    [field.name for field in fields])
+                for page in pages)
+
+    def _read_pages(self, table: bigquery.Table, fields: List[bigquery.SchemaField],
+                    page_size: int) -> Iterator[Dict[str, Any]]:
+        path = '/projects/{}/datasets/{}/tables/{}/data'.format(
+            table.project, table.dataset_id, table.table_id)
+        params = {'maxResults': page_size}  # type: Dict[str, Union[str, int]]
+        if [f.name for f in fields] != [f.name for f in table.schema]:
+            params['selectedFields'] = ','.join(f.name for f in fields)
+
+        def request(token: Optional[str]) -> dict:
+            query = dict(params)
+            if token is not None:
+                query['pageToken'] = token
+            return self.client._connection.api_request(method='GET', path=path, query_params=query)
+
+        with ThreadPoolExecutor(max_workers=1) as executor:
+            future = executor.submit(request, None)  # type: Optional[Future]
+            while future is not None:
+                page = future.result()
+                token = page.get('pageToken')
+                future = executor.submit(request, token) if token else None
+
+                rows = page.get('rows', [])
+                if not rows:
+                    continue
+                yield {field.name: _to_numpy(field, [row['f'][i]['v'] for row in rows])
+                       for i, field in enumerate(fields)}
+
+    def _read_storage_api(self, table: bigquery.Table,
+                          columns: Optional[Sequence[str]]) -> Iterator[Any]:
+        from google.cloud.bigquery_storage_v1beta1 import enums, types
+
+        if pyarrow is None:
+            raise ImportError('pyarrow is required for the Storage API')
+        client = _get_storage_client(self.project, self.credential)
+        read_options = types.TableReadOptions(selected_fields=list(columns or []))
+        session = client.create_read_session(
+            types.TableReference(project_id=table.project,
+                                 dataset_id=table.dataset_id,
+                                 table_id=table.table_id),
+            'projects/{}'.format(self.project),
+            format_=enums.DataFormat.ARROW,
+            read_options=read_options,
+            requested_streams=1)
+        if not session.streams:
+            return
+
+        schema = pyarrow.ipc.read_schema(pyarrow.py_buffer(session.arrow_schema.serialized_schema))
+        # the gRPC stream already buffers the next responses while a batch is processed.
+        for response in client.read_rows(types.StreamPosition(stream=session.streams[0])):
+            yield pyarrow.ipc.read_record_batch(
+                pyarrow.py_buffer(response.arrow_record_batch.serialized_record_batch), schema)
+
+    def _table_modified(self, table_id: str) -> Optional[str]:
+        modified = self.client.get_table(table_id).modified
+        return modified.isoformat() if modified is not None else None
+
+    def _referenced_modified(self,
+                             sql: str,
+                             job_config: Optional[bigquery.QueryJobConfig]) -> Dict[str, Optional[str]]:
+        """
+        Dry run a query and read the `modified` timestamps of the tables it references.
+        Taken before the query runs, a write during the query makes the entry stale
+        at once instead of hiding behind its new timestamp.
+
+        Args:
+            sql (str) :
+            job_config (bigquery.QueryJobConfig, None) :
+
+        Returns:
+            dict : referenced table id to its `modified` timestamp
+        """
+        config = bigquery.QueryJobConfig()
+        if job_config is not None:
+            config = bigquery.QueryJobConfig.from_api_repr(job_config.to_api_repr())
+        config.dry_run = True
+        config.use_query_cache = False
+        job = self.client.query(sql, job_config=config)
+        table_ids = ['{}.{}.{}'.format(ref.project, ref.dataset_id, ref.table_id)
+                     for ref in job.referenced_tables]
+        return {table_id: self._table_modified(table_id) for table_id in table_ids}
+
+    def query(self,
+              sql: str,
+              job_config: Optional[bigquery.QueryJobConfig] = None,
+              use_cache: bool = True,
+              use_storage_api: bool = False) -> Any:
+        """
+        Run a query and return the whole result. When `enable_query_cache` was
+        called, a fresh cached result is returned without running a job. Results
+        of queries which reference no table, e.g. `SELECT CURRENT_TIMESTAMP()`,
+        are never cached. Freshness is checked with one `get_table` call per
+        referenced table on every hit. A miss also dry runs the query first to
+        record those timestamps before the result is computed.
+
+        Args:
+            sql (str) :
+            job_config (bigquery.QueryJobConfig, None) :
+            use_cache (bool) : whether the local cache is consulted and filled
+            use_storage_api (bool) : read the result through the BigQuery Storage API
+
+        Returns:
+            pyarrow.Table
+        """
+        if pyarrow is None:
+            raise ImportError('pyarrow is required for query')
+
+        cache = self.query_cache if use_cache else None
+        key = cache_key(sql, job_config)
+        modified = {}  # type: Dict[str, Optional[str]]
+        if cache is not None:
+            cached = cache.get(key, self._table_modified)
+            if cached is not None:
+                return cached
+            modified = self._referenced_modified(sql, job_config)
+
+        job = self.client.query(sql, job_config=job_config)
+        job.result()
+        table = self.client.get_table(job.destination)
+        batches = list(self._table_batches(table, None, 'arrow', 10000, use_storage_api))
+        if use_storage_api and batches:
+            schema = batches[0].schema
+        else:
+            schema = _arrow_schema(table.schema)
+        result = pyarrow.Table.from_batches(batches, schema=schema)
+
+        # without referenced tables there is nothing which could invalidate the entry.
+        if cache is not None and modified:
+            cache.put(key, result, modified)
+        return result
+
+    def _load_chunks(self,
+                     table: str,
+                     streams: Iterable[Any],
+                     job_config: bigquery.LoadJobConfig,
+                     max_workers: int) -> List[bigquery.LoadJob]:
+        """
+        Load the first stream on its own so that it creates the table and fixes the
+        schema, then append the others concurrently.
+
+        Args:
+            table (str) :
+            streams (Iterable) : readable binary streams, gzip compressed
+            job_config (bigquery.LoadJobConfig) : configuration of the first job
+            max_workers (int) : number of concurrent load jobs
+
+        Returns:
+            list : finished bigquery.LoadJob
+        """
+        destination = self.dataset_ref.table(table)
+
+        def load(stream: Any, conf: bigquery.LoadJobConfig) -> bigquery.LoadJob:
+            return self.client.load_table_from_file(
+                stream, destination, job_config=conf).result()
+
+        streams = iter(streams)
+        first = next(streams, None)
+        if first is None:
+            return []
+        jobs = [load(first, job_config)]
+
+        append = bigquery.LoadJobConfig.from_api_repr(job_config.to_api_repr())
+        append.write_disposition = bigquery.WriteDisposition.WRITE_APPEND
+        append.create_disposition = bigquery.CreateDisposition.CREATE_NEVER
+        append.autodetect = False
+        if job_config.skip_leading_rows:
+            # only the first chunk starts with the header rows.
+            append.skip_leading_rows = 0
+
+        with ThreadPoolExecutor(max_workers=max_workers) as executor:
+            pending = set()  # type: set
+            futures = []
+            for stream in streams:
+                # bound the number of streams opened ahead of running jobs.
+                if len(pending) >= max_workers:
+                    _, pending = wait(pending, return_when=FIRST_COMPLETED)
+                future = executor.submit(load, stream, append)
+                pending.add(future)
+                futures.append(future)
+            jobs.extend(f.result() for f in futures)
+        return jobs
+
+    def load_from_file(self,
+                       table: str,
+                       filename: Union[str, Path],
+                       chunk_bytes: int = LOAD_CHUNK_BYTES,
+                       max_workers: int = 4,
+                       **kwargs: Any) -> List[bigquery.LoadJob]:
+        """
+        Load a local CSV or NDJSON file without staging it in Cloud Storage. The
+        file is gzip compressed while it is uploaded. Files larger than
+        `chunk_bytes` are split on line boundaries into parallel jobs appending
+        to the same table, except CSV files with `allow_quoted_newlines`, which
+        are loaded by a single job.
+
+        Args:
+            table (str) :
+            filename (str, os.PathLike) :
+            chunk_bytes (int) : bytes per load job
+            max_workers (int) : number of concurrent load jobs
+            **kwargs : Load Job Attributes, e.g. source_format, skip_leading_rows, autodetect
+
+        Returns:
+            list : finished bigquery.LoadJob
+        """
+        conf = bigquery.LoadJobConfig(**kwargs)
+        size = os.path.getsize(filename)
+        fd = os.open(str(filename), os.O_RDONLY)
+        try:
+            ranges = _line_ranges(fd, size, chunk_bytes) if _splittable(conf) else [(0, size)]
+            streams = (_GzipReader(_read_blocks(_FileRange(fd, offset, length)))
+                       for offset, length in ranges)
+            return self._load_chunks(table, streams, conf, max_workers)
+        finally:
+            os.close(fd)
+
+    def load_from_records(self,
+                          table: str,
+                          records: Iterable[Mapping[str, Any]],
+                          chunk_rows: int = 500000,
+                          max_workers: int = 4,
+                          **kwargs: Any) -> List[bigquery.LoadJob]:
+        """
+        Load Python records as newline delimited JSON without staging them in Cloud
+        Storage. Every `chunk_rows` records become one gzip compressed load job,
+        and at most `max_workers` of them are held in memory and run at once.
+
+        Args:
+            table (str) :
+            records (Iterable) : json serializable rows
+            chunk_rows (int) : records per load job
+            max_workers (int) : number of concurrent load jobs
+            **kwargs : Load Job Attributes
+
+        Returns:
+            list : finished bigquery.LoadJob
+        """
+        kwargs.setdefault('source_format', bigquery.SourceFormat.NEWLINE_DELIMITED_JSON)
+        conf = bigquery.LoadJobConfig(**kwargs)
+
+        def chunks() -> Iterator[io.BytesIO]:
+            records_iter = iter(records)
+            while True:
+                buffer = io.BytesIO()
+                count = 0
+                with gzip.GzipFile(fileobj=buffer, mode='wb') as gz:
+                    for row in itertools.islice(records_iter, chunk_rows):
+                        gz.write(json.dumps(row).encode('utf-8') + b'\n')
+                        count += 1
+                if not count:
+                    return
+                buffer.seek(0)
+                yield buffer
+
+        return self._load_chunks(table, chunks(), conf, max_workers)
+
+    @staticmethod
+    def _abandon_export(job: bigquery.ExtractJob,
+                        storage: CloudStorage,
+                        prefix: str,
+                        keep_staged: bool,
+                        paths: Iterable[Path],
+                        yielded: Set[Path]) -> None:
+        """
+        Clean up after an export which failed or was not iterated to the end.
+
+        Args:
+            job (bigquery.ExtractJob) :
+            storage (CloudStorage) : client of the staging bucket
+            prefix (str) : staging prefix of the shards
+            keep_staged (bool) : leave the staged shards in the bucket
+            paths (Iterable[Path]) : local paths of every started download
+            yielded (Set[Path]) : paths handed to the caller, which are kept
+        """
+        if not job.done():
+            job.cancel()
+        for path in paths:
+            if path in yielded:
+                continue
+            try:
+                os.remove(str(path))
+            except FileNotFoundError:
+                pass
+        if keep_staged:
+            return
+        for info in storage.iter_blobs(prefix=prefix, fields=('name',)):
+            try:
+                storage.bucket.blob(blob_name=info.name).delete(client=storage.client)
+            except exceptions.NotFound:
+                # deleted by its download in the meantime.
+                pass
+
+    def export_table(self,
+                     table: str,
+                     local_dir: Union[str, Path],
+                     bucket: str,
+                     destination_format: str = 'CSV',
+                     compression: Optional[str] = None,
+                     max_workers: int = 8,
+                     poll_interval: float = 2.0,
+                     keep_staged: bool = False) -> Iterator[Path]:
+        """
+        Export a table through a wildcard-sharded extract job and download the
+        shards concurrently while the job is still writing them. Local paths are
+        yielded as each download completes.
+
+        When the job or a download fails, or iteration stops early, the job is
+        cancelled, shards which were not yielded are removed from `local_dir`, and
+        unless `keep_staged` is set every staged shard is deleted from the bucket.
+        Paths already yielded stay on disk for the caller.
+
+        Args:
+            table (str) :
+            local_dir (str, os.PathLike) : where shards are written
+            bucket (str) : staging bucket for the extract job
+            destination_format (str) : "CSV", "NEWLINE_DELIMITED_JSON" or "AVRO"
+            compression (str, None) : e.g. "GZIP"
+            max_workers (int) : number of concurrent downloads
+            poll_interval (float) : seconds between listings of new shards
+            keep_staged (bool) : keep the shards in the bucket after downloading
+
+        Returns:
+            Iterator[Path] : downloaded shard paths
+        """
+        storage = CloudStorage(project=self.project, bucket=bucket, credential=self.credential)
+        root = Path(local_dir)
+        root.mkdir(parents=True, exist_ok=True)
+
+        extension = EXPORT_EXTENSIONS[destination_format]
+        if compression == 'GZIP' and destination_format != 'AVRO':
+            extension += '.gz'
+        prefix = 'bigquery-export/{}-{}/'.format(table, uuid.uuid4().hex)
+        conf = bigquery.ExtractJobConfig(destination_format=destination_format)
+        if compression is not None:
+            conf.compression = compression
+        job = self.client.extract_table(
+            self.dataset_ref.table(table),
+            'gs://{}/{}shard-*.{}'.format(bucket, prefix, extension),
+            job_config=conf)
+
+        def download(name: str) -> Path:
+            path = root / name[len(prefix):]
+            storage.bucket.blob(blob_name=name).download_to_filename(
+                filename=str(path), client=storage.client)
+            if not keep_staged:
+                storage.bucket.blob(blob_name=name).delete(client=storage.client)
+            return path
+
+        storage.ensure_http_pool(max_workers)
+        seen = set()  # type: Set[str]
+        pending = set()  # type: Set[Future]
+        yielded = set()  # type: Set[Path]
+        completed = False
+        try:
+            with ThreadPoolExecutor(max_workers=max_workers) as executor:
+                try:
+                    while True:
+                        # check the job before listing, so that the last listing sees every shard.
+                        finished = job.done()
+                        # completed objects only become visible once fully written.
+                        for info in storage.iter_blobs(prefix=prefix, fields=('name',)):
+                            if info.name not in seen:
+                                seen.add(info.name)
+                                pending.add(executor.submit(download, info.name))
+
+                        done = {f for f in pending if f.done()}
+                        pending -= done
+                        for future in done:
+                            path = future.result()
+                            yielded.add(path)
+                            yield path
+
+                        if finished:
+                            break
+                        time.sleep(poll_interval)
+
+                    if job.error_result is not None:
+                        raise ExtractJobError(job)
+                    for future in as_completed(pending):
+                        path = future.result()
+                        yielded.add(path)
+                        yield path
+                    completed = True
+                finally:
+                    # queued downloads would otherwise still run while the executor shuts down.
+                    for future in pending:
+                        future.cancel()
+        finally:
+            if not completed:
+                self._abandon_export(job, storage, prefix, keep_staged,
+                                     [root / name[len(prefix):] for name in seen], yielded)
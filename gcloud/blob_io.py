@@ -0,0 +1,246 @@
+import io
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Any, Dict, Optional
+
+import requests
+from google.cloud.storage import Blob, Client
+
+DEFAULT_CHUNK_SIZE = 8 * 1024 * 1024
+# chunks of a resumable upload must be multiples of 256 KiB.
+UPLOAD_CHUNK_ALIGNMENT = 256 * 1024
+
+
+class BlobReader(io.RawIOBase):
+    def __init__(self,
+                 blob: Blob,
+                 client: Client,
+                 chunk_size: int = DEFAULT_CHUNK_SIZE,
+                 read_ahead: int = 2) -> None:
+        """
+        Seekable reader which fetches a blob by ranges of `chunk_size` bytes. The
+        following `read_ahead` chunks are requested in the background, so only
+        `read_ahead + 1` chunks are held in memory at once.
+
+        Args:
+            blob (Blob) : blob with loaded metadata. its generation pins every range.
+            client (Client) :
+            chunk_size (int) : bytes per range request
+            read_ahead (int) : number of chunks fetched ahead of the reader
+        """
+        super().__init__()
+        self.blob = blob
+        self.client = client
+        self.chunk_size = chunk_size
+        self.read_ahead = read_ahead
+        self.size = blob.size
+        self._position = 0
+        self._current_index = -1
+        self._current = b''
+        self._futures = {}  # type: Dict[int, Future]
+        self._executor = ThreadPoolExecutor(max_workers=max(1, read_ahead))
+
+    def readable(self) -> bool:
+        return True
+
+    def seekable(self) -> bool:
+        return True
+
+    def tell(self) -> int:
+        return self._position
+
+    def seek(self, offset: int, whence: int = io.SEEK_SET) -> int:
+        if whence == io.SEEK_SET:
+            position = offset
+        elif whence == io.SEEK_CUR:
+            position = self._position + offset
+        else:
+            position = self.size + offset
+        if position < 0:
+            raise ValueError('negative seek position {}'.format(position))
+        self._position = position
+        return position
+
+    def readinto(self, buffer: Any) -> int:
+        if self._position >= self.size:
+            return 0
+
+        view = memoryview(buffer).cast('B')
+        index = self._position // self.chunk_size
+        data = self._chunk(index)
+        offset = self._position - index * self.chunk_size
+        size = min(len(view), len(data) - offset)
+        view[:size] = data[offset:offset + size]
+        self._position += size
+        return size
+
+    def close(self) -> None:
+        if not self.closed:
+            for future in self._futures.values():
+                future.cancel()
+            self._futures.clear()
+            self._executor.shutdown(wait=False)
+            self._current = b''
+        super().close()
+
+    def _fetch(self, index: int) -> bytes:
+        start = index * self.chunk_size
+        end = min(self.size, start + self.chunk_size) - 1
+        return self.blob.download_as_string(client=self.client, start=start, end=end)
+
+    def _chunk(self, index: int) -> bytes:
+        if index != self._current_index:
+            future = self._futures.pop(index, None) or self._executor.submit(self._fetch, index)
+            self._current = future.result()
+            self._current_index = index
+
+        # drop prefetched chunks which are no longer ahead of the reader, e.g. after a seek.
+        last = min(index + self.read_ahead, (self.size - 1) // self.chunk_size)
+        for stale in [i for i in self._futures if not index < i <= last]:
+            self._futures.pop(stale).cancel()
+        for ahead in range(index + 1, last + 1):
+            if ahead not in self._futures:
+                self._futures[ahead] = self._executor.submit(self._fetch, ahead)
+        return self._current
+
+
+class BlobWriter(io.RawIOBase):
+    def __init__(self,
+                 blob: Blob,
+                 client: Client,
+                 chunk_size: int = DEFAULT_CHUNK_SIZE,
+                 content_type: Optional[str] = None) -> None:
+        """
+        Writer which sends a resumable upload chunk each time `chunk_size` bytes
+        are buffered. The object is finalized by `close`. Leaving a `with` block
+        with an exception calls `abort` instead, so no truncated object is published.
+
+        Args:
+            blob (Blob) : destination
+            client (Client) :
+            chunk_size (int) : bytes per upload request. rounded up to 256 KiB.
+            content_type (str, None) :
+        """
+        super().__init__()
+        self.blob = blob
+        self.client = client
+        self.chunk_size = -(-chunk_size // UPLOAD_CHUNK_ALIGNMENT) * UPLOAD_CHUNK_ALIGNMENT
+        self._buffer = bytearray()
+        self._offset = 0
+        self._finished = False
+        self._session = requests.Session()
+        # nothing to finalize until the session exists.
+        self._aborted = True
+        # the blob builds the session from the client's endpoint, user project and
+        # encryption settings. the session URI authorizes the chunks by itself.
+        self._url = blob.create_resumable_upload_session(
+            content_type=content_type or 'application/octet-stream', client=client)
+        self._aborted = False
+
+    def writable(self) -> bool:
+        return True
+
+    def tell(self) -> int:
+        return self._offset + len(self._buffer)
+
+    def write(self, data: Any) -> int:
+        if self.closed:
+            raise ValueError('write to closed file')
+
+        size = len(memoryview(data).cast('B'))
+        if self._aborted:
+            # buffered wrappers flush into the raw stream while closing after an abort.
+            return size
+        self._buffer.extend(data)
+        while len(self._buffer) >= self.chunk_size:
+            self._send(self.chunk_size, final=False)
+        return size
+
+    def _send(self, size: int, final: bool) -> None:
+        """
+        PUT the first `size` buffered bytes. Only the final request states the
+        total size, which completes the upload.
+        """
+        data = bytes(self._buffer[:size])
+        end = self._offset + len(data)
+        span = '{}-{}'.format(self._offset, end - 1) if data else '*'
+        response = self._session.put(
+            self._url, data=data, allow_redirects=False,
+            headers={'Content-Range': 'bytes {}/{}'.format(span, end if final else '*')})
+
+        if final and response.status_code in (200, 201):
+            self._finished = True
+            persisted = end
+        elif not final and response.status_code == 308:
+            # the server may keep less than it was sent; the rest goes with the next request.
+            received = response.headers.get('Range')
+            persisted = int(received.rsplit('-', 1)[1]) + 1 if received else 0
+            persisted = max(persisted, self._offset)
+        else:
+            raise IOError('resumable upload of {} failed with {}: {}'.format(
+                self.blob.name, response.status_code, response.text))
+        del self._buffer[:persisted - self._offset]
+        self._offset = persisted
+
+    def abort(self) -> None:
+        """
+        Cancel the resumable session. Nothing is published and later writes are
+        discarded; `close` then only releases the writer.
+        """
+        if self._aborted or self.closed:
+            return
+        self._aborted = True
+        self._buffer = bytearray()
+        if not self._finished:
+            # the session answers 499 once cancelled.
+            self._session.delete(self._url)
+
+    def close(self) -> None:
+        if self.closed:
+            return
+        try:
+            if not self._aborted:
+                self._send(len(self._buffer), final=True)
+        finally:
+            self._session.close()
+            super().close()
+
+    def __exit__(self, exc_type: Any, *args: Any) -> None:
+        if exc_type is not None:
+            self.abort()
+        super().__exit__(exc_type, *args)
+
+
+class BufferedBlobWriter(io.BufferedWriter):
+    def __init__(self, writer: BlobWriter, buffer_size: int = io.DEFAULT_BUFFER_SIZE) -> None:
+        """
+        BufferedWriter which aborts its BlobWriter when a `with` block raises.
+
+        Args:
+            writer (BlobWriter) :
+            buffer_size (int) :
+        """
+        super().__init__(writer, buffer_size=buffer_size)
+        self.writer = writer
+
+    def __exit__(self, exc_type: Any, *args: Any) -> None:
+        if exc_type is not None:
+            self.writer.abort()
+        super().__exit__(exc_type, *args)
+
+
+class TextBlobWriter(io.TextIOWrapper):
+    def __init__(self, buffer: BufferedBlobWriter, encoding: Optional[str] = None) -> None:
+        """
+        TextIOWrapper which aborts its BlobWriter when a `with` block raises.
+
+        Args:
+            buffer (BufferedBlobWriter) :
+            encoding (str, None) :
+        """
+        super().__init__(buffer, encoding=encoding)
+        self.writer = buffer.writer
+
+    def __exit__(self, exc_type: Any, *args: Any) -> None:
+        if exc_type is not None:
+            self.writer.abort()
+        super().__exit__(exc_type, *args)
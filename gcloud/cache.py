@@ -0,0 +1,280 @@
+import abc
+import os
+import sqlite3
+import tempfile
+import threading
+import time
+from collections import OrderedDict
+from pathlib import Path
+from typing import Optional, Union
+
+
+class Cache(abc.ABC):
+    """
+    Bytes cache interface. Keys are hex digests computed by the caller.
+    """
+
+    def __init__(self) -> None:
+        self.hits = 0
+        self.misses = 0
+
+    @property
+    def hit_rate(self) -> float:
+        total = self.hits + self.misses
+        return self.hits / total if total else 0.0
+
+    def get(self, key: str) -> Optional[bytes]:
+        """
+        Args:
+            key (str) :
+
+        Returns:
+            bytes, None : None on a miss
+        """
+        value = self._get(key)
+        if value is None:
+            self.misses += 1
+        else:
+            self.hits += 1
+        return value
+
+    @abc.abstractmethod
+    def put(self, key: str, value: bytes) -> None:
+        """
+        Args:
+            key (str) :
+            value (bytes) :
+        """
+
+    def path(self, key: str) -> Optional[Path]:
+        """
+        File holding the value, for caches that keep one file per entry.
+        Does not count towards `hits` and `misses`.
+
+        Args:
+            key (str) :
+
+        Returns:
+            Path, None : None on a miss or when entries are not files
+        """
+        return None
+
+    @abc.abstractmethod
+    def _get(self, key: str) -> Optional[bytes]:
+        """
+        Look `key` up without counting hits and misses.
+        """
+
+
+class MemoryCache(Cache):
+    def __init__(self, max_bytes: int = 64 * 1024 * 1024, ttl: Optional[float] = None) -> None:
+        """
+        Thread-safe in-memory LRU bounded by the total size of the values.
+
+        Args:
+            max_bytes (int) : total size of stored values
+            ttl (float, None) : seconds an entry stays valid. None keeps entries until evicted.
+        """
+        super().__init__()
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self._size = 0
+        self._entries = OrderedDict()  # type: OrderedDict[str, tuple]
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def _get(self, key: str) -> Optional[bytes]:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            value, stored = entry
+            if self.ttl is not None and time.time() - stored > self.ttl:
+                del self._entries[key]
+                self._size -= len(value)
+                return None
+            self._entries.move_to_end(key)
+            return value
+
+    def put(self, key: str, value: bytes) -> None:
+        if len(value) > self.max_bytes:
+            return
+        with self._lock:
+            old = self._entries.pop(key, None)
+            if old is not None:
+                self._size -= len(old[0])
+            self._entries[key] = (value, time.time())
+            self._size += len(value)
+            while self._size > self.max_bytes:
+                _, (evicted, _) = self._entries.popitem(last=False)
+                self._size -= len(evicted)
+
+
+class SqliteCache(Cache):
+    def __init__(self, filename: Union[str, Path], ttl: Optional[float] = None) -> None:
+        """
+        Persistent cache in a single sqlite file, shared between threads.
+
+        Args:
+            filename (str, os.PathLike) : database location
+            ttl (float, None) : seconds an entry stays valid
+        """
+        super().__init__()
+        self.ttl = ttl
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(str(filename), check_same_thread=False)
+        self._conn.execute('CREATE TABLE IF NOT EXISTS cache (key TEXT PRIMARY KEY, value BLOB, stored REAL)')
+        self._conn.commit()
+
+    def _get(self, key: str) -> Optional[bytes]:
+        with self._lock:
+            row = self._conn.execute('SELECT value, stored FROM cache WHERE key = ?', (key,)).fetchone()
+        if row is None:
+            return None
+        if self.ttl is not None and time.time() - row[1] > self.ttl:
+            return None
+        return bytes(row[0])
+
+    def put(self, key: str, value: bytes) -> None:
+        with self._lock:
+            self._conn.execute('INSERT OR REPLACE INTO cache (key, value, stored) VALUES (?, ?, ?)',
+                               (key, value, time.time()))
+            self._conn.commit()
+
+    def close(self) -> None:
+        with self._lock:
+            self._conn.close()
+
+
+class DirectoryCache(Cache):
+    def __init__(self,
+                 directory: Union[str, Path],
+                 max_bytes: Optional[int] = None,
+                 ttl: Optional[float] = None) -> None:
+        """
+        Content-addressed store with one file per entry, at `directory/<key[:2]>/<key>`.
+        The file modification time is the time stored and the access time the
+        last use, so LRU order and expiry survive restarts.
+
+        Args:
+            directory (str, os.PathLike) : created if missing
+            max_bytes (int, None) : total size of stored files. None is unbounded.
+            ttl (float, None) : seconds an entry stays valid
+        """
+        super().__init__()
+        self.directory = Path(directory)
+        self.directory.mkdir(parents=True, exist_ok=True)
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self._lock = threading.Lock()
+        self._size = 0
+        self._entries = OrderedDict()  # type: OrderedDict[str, tuple]
+
+        found = []
+        for file in self.directory.glob('??/*'):
+            if file.name.endswith('.tmp'):
+                continue
+            stat = file.stat()
+            found.append((stat.st_atime, file.name, stat.st_size, stat.st_mtime))
+        for _, key, size, stored in sorted(found):
+            self._entries[key] = (size, stored)
+            self._size += size
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def _file(self, key: str) -> Path:
+        return self.directory / key[:2] / key
+
+    def _remove(self, key: str) -> None:
+        size, _ = self._entries.pop(key)
+        self._size -= size
+        try:
+            self._file(key).unlink()
+        except FileNotFoundError:
+            pass
+
+    def path(self, key: str) -> Optional[Path]:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            _, stored = entry
+            if self.ttl is not None and time.time() - stored > self.ttl:
+                self._remove(key)
+                return None
+            self._entries.move_to_end(key)
+        file = self._file(key)
+        try:
+            os.utime(str(file), (time.time(), stored))
+        except FileNotFoundError:
+            with self._lock:
+                if key in self._entries:
+                    self._remove(key)
+            return None
+        return file
+
+    def _get(self, key: str) -> Optional[bytes]:
+        file = self.path(key)
+        if file is None:
+            return None
+        try:
+            return file.read_bytes()
+        except FileNotFoundError:
+            return None
+
+    def put(self, key: str, value: bytes) -> None:
+        if self.max_bytes is not None and len(value) > self.max_bytes:
+            return
+        file = self._file(key)
+        file.parent.mkdir(exist_ok=True)
+        fd, tmp = tempfile.mkstemp(dir=str(file.parent), suffix='.tmp')
+        with os.fdopen(fd, 'wb') as f:
+            f.write(value)
+        # readers never see a partial file.
+        os.replace(tmp, str(file))
+        stored = os.stat(str(file)).st_mtime
+
+        with self._lock:
+            old = self._entries.pop(key, None)
+            if old is not None:
+                self._size -= old[0]
+            self._entries[key] = (len(value), stored)
+            self._size += len(value)
+            while self.max_bytes is not None and self._size > self.max_bytes:
+                self._remove(next(iter(self._entries)))
+
+
+class TieredCache(Cache):
+    def __init__(self, *tiers: Cache) -> None:
+        """
+        Look tiers up in order, e.g. a MemoryCache in front of a SqliteCache. A hit
+        in a slower tier is copied into the faster ones.
+
+        Args:
+            *tiers (Cache) : fastest first
+        """
+        super().__init__()
+        self.tiers = tiers
+
+    def _get(self, key: str) -> Optional[bytes]:
+        for i, tier in enumerate(self.tiers):
+            value = tier.get(key)
+            if value is not None:
+                for faster in self.tiers[:i]:
+                    faster.put(key, value)
+                return value
+        return None
+
+    def put(self, key: str, value: bytes) -> None:
+        for tier in self.tiers:
+            tier.put(key, value)
+
+    def path(self, key: str) -> Optional[Path]:
+        for tier in self.tiers:
+            file = tier.path(key)
+            if file is not None:
+                return file
+        return None
@@ -1,18 +1,299 @@
+import hashlib
 import json
+import re
+import struct
+import threading
+from collections import deque
+from concurrent.futures import Future, ThreadPoolExecutor, FIRST_COMPLETED, wait
+from functools import partial
 from pathlib import Path
-from typing import Optional, Sequence, Tuple, Union, Dict, List, Mapping
+from typing import Any, Deque, Iterable, Iterator, Optional, Sequence, Tuple, Union, Dict, List, Mapping
 
 from google.api_core.retry import Retry
 from google.cloud.language import LanguageServiceClient, types, enums
 from google.protobuf.json_format import MessageToJson
 
+from gcloud.cache import Cache
+from gcloud.concurrency import Backoff, TokenBucket, call_with_retry
+from gcloud.language_table import AnnotationTable
+from gcloud.pool import get_client
+
+# default byte budget of one chunk in `annotate_long_text`.
+LONG_TEXT_CHUNK_BYTES = 100000
+# a sentence or paragraph with its trailing whitespace.
+_SENTENCE = re.compile(r'.*?(?:[.!?\u3002\uff01\uff1f]+\s+|\n\s*\n|$)', re.S)
+
+# enum value to the name used by MessageToJson, for the protobuf parsing path.
+_POS_TAGS = {e.value: e.name for e in enums.PartOfSpeech.Tag}
+_POS_NUMBERS = {e.value: e.name for e in enums.PartOfSpeech.Number}
+_DEPENDENCY_LABELS = {e.value: e.name for e in enums.DependencyEdge.Label}
+_ENTITY_TYPES = {e.value: e.name for e in enums.Entity.Type}
+_MENTION_TYPES = {e.value: e.name for e in enums.EntityMention.Type}
+
+
+def _float32(value: float) -> float:
+    """
+    Shortest decimal which reads back as the same single precision float, which is
+    how MessageToJson prints `float` fields, e.g. 0.800000011920929 becomes 0.8.
+
+    Args:
+        value (float) : a float field of a protobuf message
+
+    Returns:
+        float
+    """
+    for precision in range(6, 10):
+        rounded = float('{:.{}g}'.format(value, precision))
+        if struct.unpack('<f', struct.pack('<f', rounded))[0] == value:
+            return rounded
+    return value
+
+
+def annotation_key(content: str,
+                   language: str,
+                   document_type: str,
+                   encoding_type: str,
+                   features: Mapping[str, bool]) -> str:
+    """
+    Content address of an annotation request.
+
+    Args:
+        content (str) :
+        language (str) :
+        document_type (str) :
+        encoding_type (str) :
+        features (Mapping[str, bool]) :
+
+    Returns:
+        str : hex digest
+    """
+    payload = json.dumps([content, language, int(document_type), int(encoding_type),
+                          sorted(k for k, v in features.items() if v)])
+    return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+
+def split_text(content: str, max_bytes: int = LONG_TEXT_CHUNK_BYTES) -> List[Tuple[int, str]]:
+    """
+    Split text at sentence or paragraph boundaries into chunks of at most
+    `max_bytes` UTF-8 bytes. A single sentence over the budget is cut at the
+    last whitespace that fits, or at a character boundary.
+
+    Args:
+        content (str) :
+        max_bytes (int) : UTF-8 bytes per chunk
+
+    Returns:
+        list : (character offset, chunk) pairs which concatenate to `content`
+    """
+    pieces = []  # type: List[str]
+    for match in _SENTENCE.finditer(content):
+        piece = match.group()
+        while len(piece.encode('utf-8')) > max_bytes:
+            size, cut = 0, 0
+            for i, char in enumerate(piece):
+                size += len(char.encode('utf-8'))
+                if size > max_bytes:
+                    break
+                cut = i + 1
+            space = piece.rfind(' ', 0, cut)
+            cut = space + 1 if space > 0 else max(cut, 1)
+            pieces.append(piece[:cut])
+            piece = piece[cut:]
+        if piece:
+            pieces.append(piece)
+
+    chunks = []  # type: List[Tuple[int, str]]
+    start, current, current_bytes = 0, [], 0  # type: int, List[str], int
+    for piece in pieces:
+        size = len(piece.encode('utf-8'))
+        if current and current_bytes + size > max_bytes:
+            text = ''.join(current)
+            chunks.append((start, text))
+            start += len(text)
+            current, current_bytes = [], 0
+        current.append(piece)
+        current_bytes += size
+    if current:
+        chunks.append((start, ''.join(current)))
+    return chunks
+
+
+def _offset_units(text: str, encoding_type: str) -> int:
+    """
+    Args:
+        text (str) :
+        encoding_type (str) : enums.EncodingType
+
+    Returns:
+        int : length of `text` in the unit of `beginOffset` for the encoding
+    """
+    if encoding_type == enums.EncodingType.UTF8:
+        return len(text.encode('utf-8'))
+    if encoding_type == enums.EncodingType.UTF16:
+        return len(text.encode('utf-16-le')) // 2
+    if encoding_type == enums.EncodingType.UTF32:
+        return len(text)
+    return 0
+
+
+def merge_responses(chunks: Sequence[Tuple[int, types.AnnotateTextResponse]],
+                    content: str,
+                    encoding_type: str) -> types.AnnotateTextResponse:
+    """
+    Merge responses of consecutive chunks into one response on the original
+    document. Offsets are shifted to the original coordinates and dependency
+    edges are re-based onto the merged token list. Entities with the same name
+    and type are merged, with salience weighted by chunk length. Document
+    sentiment magnitudes add up and scores are averaged by chunk length.
+
+    Args:
+        chunks (Sequence) : (character offset, response) pairs in document order
+        content (str) : the original document
+        encoding_type (str) : encoding used for the requests
+
+    Returns:
+        types.AnnotateTextResponse
+    """
+    merged = types.AnnotateTextResponse()
+    entities = {}  # type: Dict[Tuple[str, int], Any]
+    categories = {}  # type: Dict[str, float]
+    total = max(1, len(content))
+    score = 0.0
+    shift = 0
+
+    for i, (start, response) in enumerate(chunks):
+        end = chunks[i + 1][0] if i + 1 < len(chunks) else len(content)
+        share = (end - start) / total
+        token_base = len(merged.tokens)
+
+        for sentence in response.sentences:
+            added = merged.sentences.add()
+            added.CopyFrom(sentence)
+            if encoding_type != enums.EncodingType.NONE:
+                added.text.begin_offset += shift
+
+        for token in response.tokens:
+            added = merged.tokens.add()
+            added.CopyFrom(token)
+            added.dependency_edge.head_token_index += token_base
+            if encoding_type != enums.EncodingType.NONE:
+                added.text.begin_offset += shift
+
+        for entity in response.entities:
+            key = (entity.name, entity.type)
+            target = entities.get(key)
+            if target is None:
+                target = entities[key] = merged.entities.add(
+                    name=entity.name, type=entity.type)
+                target.metadata.update(entity.metadata)
+            target.salience += entity.salience * share
+            target.sentiment.magnitude += entity.sentiment.magnitude
+            target.sentiment.score += entity.sentiment.score * len(entity.mentions)
+            for mention in entity.mentions:
+                added = target.mentions.add()
+                added.CopyFrom(mention)
+                if encoding_type != enums.EncodingType.NONE:
+                    added.text.begin_offset += shift
+
+        for category in response.categories:
+            categories[category.name] = max(categories.get(category.name, 0.0), category.confidence)
+
+        merged.document_sentiment.magnitude += response.document_sentiment.magnitude
+        score += response.document_sentiment.score * share
+        if not merged.language:
+            merged.language = response.language
+        shift += _offset_units(content[start:end], encoding_type)
+
+    merged.document_sentiment.score = score
+    for entity in merged.entities:
+        if entity.mentions:
+            entity.sentiment.score /= len(entity.mentions)
+    for name, confidence in sorted(categories.items(), key=lambda c: -c[1]):
+        merged.categories.add(name=name, confidence=confidence)
+    return merged
+
 
 class CloudLanguage:
-    def __init__(self, credentials: Optional[Union[str, Path]] = None) -> None:
-        if credentials is None:
-            self.client = LanguageServiceClient()
+    def __init__(self,
+                 credentials: Optional[Union[str, Path]] = None,
+                 cache: Optional[Cache] = None) -> None:
+        """
+        Args:
+            credentials (str, os.PathLike, None) :
+            cache (Cache, None) : stores serialized responses by `annotation_key`,
+                e.g. TieredCache(MemoryCache(), SqliteCache("language.sqlite"))
+        """
+        def factory() -> LanguageServiceClient:
+            if credentials is None:
+                return LanguageServiceClient()
+            return LanguageServiceClient.from_service_account_file(filename=credentials)
+
+        self.client = get_client('language', None, credentials, factory)
+        self.cache = cache
+        self._inflight = {}  # type: Dict[str, Future]
+        self._inflight_lock = threading.Lock()
+
+    def annotate_text(
+            self,
+            content: str,
+            encoding_type: str = enums.EncodingType.UTF32,
+            retry: Optional[Retry] = None,
+            timeout: Optional[float] = None,
+            metadata: Optional[Sequence[Tuple[str, str]]] = None,
+            language: str = "en",
+            document_type: str = enums.Document.Type.PLAIN_TEXT,
+            syntax: bool = True,
+            entities: bool = True,
+            document_sentiment: bool = True,
+            entity_sentiment: bool = True,
+            classify: bool = True) -> types.AnnotateTextResponse:
+        """
+        Same as `annotate_text_from_string` but returns the protobuf response.
+        Identical requests running at the same time are sent only once, and
+        responses are looked up in and stored to `cache` as serialized protobuf.
+
+        Returns:
+            types.AnnotateTextResponse
+        """
+        features = {"extract_syntax": syntax,
+                    "extract_entities": entities,
+                    "extract_document_sentiment": document_sentiment,
+                    "extract_entity_sentiment": entity_sentiment,
+                    "classify_text": classify
+                    }
+        key = annotation_key(content, language, document_type, encoding_type, features)
+
+        if self.cache is not None:
+            cached = self.cache.get(key)
+            if cached is not None:
+                return types.AnnotateTextResponse.FromString(cached)
+
+        future = Future()  # type: Future
+        with self._inflight_lock:
+            inflight = self._inflight.setdefault(key, future)
+        if inflight is not future:
+            return inflight.result()
+
+        try:
+            document = types.Document(content=content, language=language, type=document_type)
+            response = self.client.annotate_text(
+                document=document,
+                features=features,
+                encoding_type=encoding_type,
+                retry=retry,
+                timeout=timeout,
+                metadata=metadata)
+            if self.cache is not None:
+                self.cache.put(key, response.SerializeToString())
+        except Exception as e:
+            future.set_exception(e)
+            raise
         else:
-            self.client = LanguageServiceClient.from_service_account_file(filename=credentials)
+            future.set_result(response)
+            return response
+        finally:
+            with self._inflight_lock:
+                del self._inflight[key]
 
     def annotate_text_from_string(
             self,
@@ -44,24 +325,129 @@ class CloudLanguage:
             classify:
         Returns:
         """
-
-        features = {"extract_syntax": syntax,
-                    "extract_entities": entities,
-                    "extract_document_sentiment": document_sentiment,
-                    "extract_entity_sentiment": entity_sentiment,
-                    "classify_text": classify
-                    }
-
-        document = types.Document(content=content, language=language, type=document_type)
-        response = self.client.annotate_text(
-            document=document,
-            features=features,
+        response = self.annotate_text(
+            content,
             encoding_type=encoding_type,
             retry=retry,
             timeout=timeout,
-            metadata=metadata)
+            metadata=metadata,
+            language=language,
+            document_type=document_type,
+            syntax=syntax,
+            entities=entities,
+            document_sentiment=document_sentiment,
+            entity_sentiment=entity_sentiment,
+            classify=classify)
         return json.loads(MessageToJson(response))
 
+    def annotate_many(self,
+                      documents: Iterable[str],
+                      max_workers: int = 8,
+                      requests_per_minute: float = 600,
+                      ordered: bool = True,
+                      max_retries: int = 5,
+                      return_exceptions: bool = False,
+                      raw: bool = False,
+                      **kwargs: Any) -> Iterator[Tuple[int, Any]]:
+        """
+        Annotate many documents concurrently. Requests are shaped by a token bucket
+        matched to the per-minute quota, whose rate is halved on RESOURCE_EXHAUSTED
+        and raised again as requests succeed. Repeated documents are sent once: with
+        a `cache` through the cache, without one by sharing a request which is still
+        in flight. Finished requests are forgotten, so memory stays bounded by the
+        window of submitted documents.
+
+        Args:
+            documents (Iterable[str]) : contents
+            max_workers (int) : number of concurrent requests
+            requests_per_minute (float) : quota to stay under
+            ordered (bool) : yield results in input order instead of completion order
+            max_retries (int) : retries of a request failing transiently
+            return_exceptions (bool) : yield the exception of a failed document instead of raising it
+            raw (bool) : yield protobuf responses of `annotate_text` instead of dicts
+            **kwargs : annotate_text_from_string arguments
+
+        Returns:
+            Iterator[Tuple[int, Any]] : (index of the document, annotate_text_from_string result)
+        """
+        call = self.annotate_text if raw else self.annotate_text_from_string
+        limiter = TokenBucket(rate=requests_per_minute / 60, capacity=max_workers)
+        backoff = Backoff(initial=1.0, maximum=30.0)
+
+        def annotate(content: str) -> Any:
+            try:
+                return call_with_retry(limiter, backoff, lambda: call(content, **kwargs), max_retries)
+            except Exception as e:
+                if return_exceptions:
+                    return e
+                raise
+
+        # without a cache, a repeated document would be sent again once the first one finished.
+        submitted = {} if self.cache is None else None  # type: Optional[Dict[str, Future]]
+
+        def forget(content: str, future: Future) -> None:
+            # runs in a worker thread. only this loop adds entries, and only for absent keys.
+            if submitted is not None and submitted.get(content) is future:
+                del submitted[content]
+        with ThreadPoolExecutor(max_workers=max_workers) as executor:
+            pending = deque()  # type: Deque[Tuple[int, Future]]
+            for index, content in enumerate(documents):
+                future = submitted.get(content) if submitted is not None else None
+                if future is None:
+                    future = executor.submit(annotate, content)
+                    if submitted is not None:
+                        submitted[content] = future
+                        future.add_done_callback(partial(forget, content))
+                pending.append((index, future))
+                # keep a bounded window of submitted documents.
+                while len(pending) >= 2 * max_workers:
+                    yield from self._drain(pending, ordered)
+
+            while pending:
+                yield from self._drain(pending, ordered)
+
+    def annotate_long_text(self,
+                           content: str,
+                           max_bytes: int = LONG_TEXT_CHUNK_BYTES,
+                           max_workers: int = 8,
+                           encoding_type: str = enums.EncodingType.UTF32,
+                           **kwargs: Any) -> types.AnnotateTextResponse:
+        """
+        Annotate a document of any length. The text is split at sentence or
+        paragraph boundaries under `max_bytes`, the chunks are annotated
+        concurrently, and the responses are merged with `merge_responses`.
+
+        Args:
+            content (str) :
+            max_bytes (int) : UTF-8 bytes per request
+            max_workers (int) : number of concurrent requests
+            encoding_type (str) : enums.EncodingType used for offsets
+            **kwargs : annotate_text arguments
+
+        Returns:
+            types.AnnotateTextResponse : use `parse_message` or MessageToJson on it
+        """
+        chunks = split_text(content, max_bytes=max_bytes)
+        if len(chunks) <= 1:
+            return self.annotate_text(content, encoding_type=encoding_type, **kwargs)
+
+        with ThreadPoolExecutor(max_workers=max_workers) as executor:
+            responses = list(executor.map(
+                lambda chunk: self.annotate_text(chunk[1], encoding_type=encoding_type, **kwargs), chunks))
+        return merge_responses([(start, response) for (start, _), response in zip(chunks, responses)],
+                               content, encoding_type)
+
+    @staticmethod
+    def _drain(pending: Deque[Tuple[int, Future]], ordered: bool) -> Iterator[Tuple[int, Any]]:
+        if ordered:
+            index, future = pending.popleft()
+            yield index, future.result()
+            return
+        done, _ = wait({future for _, future in pending}, return_when=FIRST_COMPLETED)
+        for item in [item for item in pending if item[1] in done]:
+            pending.remove(item)
+            yield item[0], item[1].result()
+
     @staticmethod
     def parse(response: Dict) -> Dict:
         results = CloudLanguage.parse_sentences(response)
@@ -182,4 +568,79 @@ class CloudLanguage:
             results['category_name'].append(category['name'])
             results['category_confidence'].append(category['confidence'])
 
-        return results
\ No newline at end of file
+        return results
+
+    @staticmethod
+    def parse_message(response: types.AnnotateTextResponse) -> Dict:
+        """
+        Same layout as `parse`, read straight from the protobuf response without the
+        MessageToJson round trip. Fields which MessageToJson omits because they hold
+        the default value become None, as they do in `parse`, and single precision
+        scores are rounded the way MessageToJson prints them.
+
+        Args:
+            response (types.AnnotateTextResponse) :
+
+        Returns:
+            Dict
+        """
+        sentences = response.sentences
+        results = {
+            'sentence_content': [s.text.content for s in sentences],
+            'sentence_begin_offset': [s.text.begin_offset or None for s in sentences],
+            'sentence_sentiment_magnitude': [_float32(s.sentiment.magnitude) for s in sentences],
+            'sentence_sentiment_score': [_float32(s.sentiment.score) for s in sentences],
+        }  # type: Dict[str, Any]
+
+        tokens = response.tokens
+        results.update({
+            'token_content': [t.text.content for t in tokens],
+            'token_begin_offset': [t.text.begin_offset or None for t in tokens],
+            'token_pos_tag': [_POS_TAGS[t.part_of_speech.tag] for t in tokens],
+            'token_pos_number': [_POS_NUMBERS[t.part_of_speech.number] if t.part_of_speech.number else None
+                                 for t in tokens],
+            'token_dependency_edge_head_token_index': [t.dependency_edge.head_token_index for t in tokens],
+            'token_dependency_edge_label': [_DEPENDENCY_LABELS[t.dependency_edge.label] for t in tokens],
+            'token_lemma': [t.lemma for t in tokens],
+        })
+
+        results.update({
+            'document_sentiment_magnitude': _float32(response.document_sentiment.magnitude),
+            'document_sentiment_score': _float32(response.document_sentiment.score),
+        })
+
+        entities = response.entities
+        mentions = [m for e in entities for m in e.mentions]
+        results.update({
+            'entity_name': [e.name for e in entities],
+            'entity_type': [_ENTITY_TYPES[e.type] for e in entities],
+            'entity_salience': [_float32(e.salience) for e in entities],
+            'entity_mention_content': [m.text.content for m in mentions],
+            'entity_mention_begin_offset': [m.text.begin_offset or None for m in mentions],
+            'entity_mention_type': [_MENTION_TYPES[m.type] for m in mentions],
+            'entity_sentiment_magnitude': [_float32(m.sentiment.magnitude) or None for m in mentions],
+            'entity_sentiment_score': [_float32(m.sentiment.score) or None for m in mentions],
+        })
+
+        results.update({
+            'category_name': [c.name for c in response.categories],
+            'category_confidence': [_float32(c.confidence) for c in response.categories],
+            'language': response.language,
+        })
+        return results
+
+    @staticmethod
+    def parse_many(responses: Iterable[Union[types.AnnotateTextResponse, Dict]]) -> AnnotationTable:
+        """
+        Parse many documents into one column store whose rows stay joinable across
+        documents, entities and mentions.
+
+        Args:
+            responses (Iterable) : protobuf responses or dicts, in document order
+
+        Returns:
+            AnnotationTable
+        """
+        table = AnnotationTable()
+        table.extend(responses)
+        return table
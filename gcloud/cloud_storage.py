@@ -1,26 +1,64 @@
+import base64
+import hashlib
+import io
+import os
+import threading
+import time
+import uuid
+import warnings
+import weakref
+from concurrent.futures import Future, ThreadPoolExecutor, FIRST_COMPLETED, wait
+from functools import partial
 from pathlib import Path
-from typing import Union, Optional
+from typing import IO, Any, Union, Optional, Callable, Dict, Iterable, Iterator, List, NamedTuple, Sequence, Tuple
 
 from google.cloud.storage import Client, Blob
-from google.oauth2.service_account import Credentials
+from requests.adapters import HTTPAdapter
 
+from gcloud.blob_io import BlobReader, BlobWriter, BufferedBlobWriter, TextBlobWriter, DEFAULT_CHUNK_SIZE
+from gcloud.manifest import Manifest
+from gcloud.pool import CredentialPath, get_client, get_credentials
 
-def _get_client(project: str,
-                credential: Optional[Union[str, Path]] = None) -> Client:
+try:
+    from crcmod.predefined import mkPredefinedCrcFun
+    _crc32c = mkPredefinedCrcFun('crc-32c')
+except ImportError:
+    _crc32c = None
+
+# files at least this large are uploaded as parallel composite uploads.
+PARALLEL_COMPOSITE_THRESHOLD = 150 * 1024 * 1024
+# the compose API accepts at most 32 source objects per request.
+MAX_COMPOSE_COMPONENTS = 32
+# default manifest name used by `CloudStorage.sync`. it is never synced itself.
+MANIFEST_FILENAME = '.gcloud_manifest.sqlite'
+# suggested `sliced_threshold`: blobs this large gain from concurrent range requests.
+SLICED_DOWNLOAD_THRESHOLD = 150 * 1024 * 1024
+
+# connection pool size mounted on each pooled HTTP session. sessions are shared
+# by every CloudStorage of one client, so the size only ever grows.
+_http_pool_sizes = weakref.WeakKeyDictionary()  # type: weakref.WeakKeyDictionary
+_http_pool_lock = threading.Lock()
+
+
+def _get_client(project: Optional[str],
+                credential: Optional[CredentialPath] = None) -> Client:
     """
+    Clients are shared through the process-wide pool, so repeated calls
+    reuse the same credentials and HTTP session.
 
     Args:
-        project (str) :
-        credential (str, None) :
+        project (str, None) : None takes the project of the credentials or environment
+        credential (str, os.PathLike, None) :
 
     Returns:
         Client
     """
-    if credential is None:
-        return Client(project=project)
+    def factory() -> Client:
+        if credential is None:
+            return Client(project=project)
+        return Client(project=project, credentials=get_credentials(credential))
 
-    credential = Credentials.from_service_account_file(filename=credential)
-    return Client(project=project, credentials=credential)
+    return get_client('storage', project, credential, factory)
 
 
 def upload_from_filename(filename: Union[str, Path],
@@ -54,7 +92,8 @@ def download_from_blob(filename: str,
                        project: str,
                        bucket: str,
                        blob: str,
-                       credential: Optional[Union[str, Path]] = None):
+                       credential: Optional[Union[str, Path]] = None,
+                       sliced_threshold: Optional[int] = None):
     """
 
     Args:
@@ -63,15 +102,314 @@ def download_from_blob(filename: str,
         bucket (str) :
         blob (str) :
         credential (str, None) :
+        sliced_threshold (int, None) : blobs of this size or larger are downloaded
+            with `CloudStorage.download_sliced`. None always uses a single stream.
 
     Returns:
         None
     """
+    if sliced_threshold is not None:
+        storage = CloudStorage(project=project, bucket=bucket, credential=credential)
+        storage.download_from_blob(filename=filename, blob=blob, sliced_threshold=sliced_threshold)
+        return
+
     client = _get_client(project=project, credential=credential)
     bkt = client.bucket(bucket_name=bucket)
     bkt.blob(blob_name=blob).download_to_filename(filename=filename)
 
 
+class ChecksumMismatch(ValueError):
+    pass
+
+
+class BlobInfo(NamedTuple):
+    """
+    Lightweight listing record. With a delimiter, common prefixes are yielded
+    with only `name` set. `page_token` is the token of the page the record came
+    from; passing it back to `CloudStorage.iter_blobs` resumes the scan there.
+    """
+    name: str
+    size: Optional[int] = None
+    # ISO 8601
+    updated: Optional[str] = None
+    crc32c: Optional[str] = None
+    md5_hash: Optional[str] = None
+    page_token: Optional[str] = None
+
+
+class SyncPlan(NamedTuple):
+    """
+    Paths are relative to the synced directory and prefix. `summary` is None for dry runs.
+    """
+    transfer: List[str]
+    delete: List[str]
+    summary: Optional['TransferSummary'] = None
+
+
+class TransferSummary(NamedTuple):
+    succeeded: List[str]
+    failed: Dict[str, str]
+    bytes_transferred: int
+    elapsed: float
+    # names left out because their destination was already complete.
+    skipped: List[str]
+
+    @property
+    def files_per_second(self) -> float:
+        return len(self.succeeded) / self.elapsed if self.elapsed else 0.0
+
+    @property
+    def bytes_per_second(self) -> float:
+        return self.bytes_transferred / self.elapsed if self.elapsed else 0.0
+
+
+def run_transfers(tasks: Iterable[Tuple[str, Callable[[], int]]],
+                  max_workers: int) -> TransferSummary:
+    """
+    Run transfer tasks on a thread pool. At most `2 * max_workers` tasks are queued
+    at once, so huge iterables are consumed lazily. A failed task is recorded and
+    does not abort the others.
+
+    Args:
+        tasks (Iterable) : pairs of (name, callable returning transferred bytes)
+        max_workers (int) : number of threads
+
+    Returns:
+        TransferSummary
+    """
+    succeeded = []  # type: List[str]
+    failed = {}  # type: Dict[str, str]
+    transferred = 0
+    start = time.monotonic()
+
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        pending = {}  # type: Dict[Future, str]
+        for name, task in tasks:
+            pending[executor.submit(task)] = name
+            if len(pending) < 2 * max_workers:
+                continue
+            done, _ = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                transferred += _collect(future, pending.pop(future), succeeded, failed)
+
+        for future in list(pending):
+            transferred += _collect(future, pending.pop(future), succeeded, failed)
+
+    return TransferSummary(succeeded=succeeded,
+                           failed=failed,
+                           bytes_transferred=transferred,
+                           elapsed=time.monotonic() - start,
+                           skipped=[])
+
+
+def _merge(first: TransferSummary, second: TransferSummary) -> TransferSummary:
+    """
+    Combine the summaries of two transfer phases which ran one after the other.
+    """
+    failed = dict(first.failed)
+    failed.update(second.failed)
+    return TransferSummary(succeeded=first.succeeded + second.succeeded,
+                           failed=failed,
+                           bytes_transferred=first.bytes_transferred + second.bytes_transferred,
+                           elapsed=first.elapsed + second.elapsed,
+                           skipped=first.skipped + second.skipped)
+
+
+def _collect(future: Future, name: str, succeeded: List[str], failed: Dict[str, str]) -> int:
+    try:
+        size = future.result()
+    except Exception as e:
+        failed[name] = repr(e)
+        return 0
+    succeeded.append(name)
+    return size
+
+
+def _local_path(root: Path, rel: str) -> Optional[Path]:
+    """
+    Args:
+        root (Path) : local directory
+        rel (str) : path below `root` taken from a blob name
+
+    Returns:
+        Path, None : resolved path, or None when `rel` leaves `root`, e.g. through ".."
+    """
+    base = root.resolve()
+    target = (base / rel).resolve()
+    if target == base or base not in target.parents:
+        return None
+    return target
+
+
+def _reject(blob: str, root: Path) -> int:
+    raise ValueError('blob {} resolves to a path outside {}'.format(blob, root))
+
+
+def _remove_local(path: Path) -> int:
+    os.remove(str(path))
+    return 0
+
+
+class _FileRange(io.RawIOBase):
+    def __init__(self, fd: int, offset: int, length: int) -> None:
+        """
+        Read-only view of `length` bytes of an open file starting at `offset`.
+        Reads go through `os.pread`, so several views can share one descriptor
+        from different threads and nothing is read ahead into memory.
+
+        Args:
+            fd (int) : file descriptor
+            offset (int) : first byte of the range
+            length (int) : size of the range
+        """
+        super().__init__()
+        self._fd = fd
+        self._offset = offset
+        self._length = length
+        self._position = 0
+
+    def readable(self) -> bool:
+        return True
+
+    def seekable(self) -> bool:
+        return True
+
+    def tell(self) -> int:
+        return self._position
+
+    def seek(self, offset: int, whence: int = io.SEEK_SET) -> int:
+        if whence == io.SEEK_SET:
+            position = offset
+        elif whence == io.SEEK_CUR:
+            position = self._position + offset
+        else:
+            position = self._length + offset
+        self._position = min(max(position, 0), self._length)
+        return self._position
+
+    def readinto(self, buffer: Any) -> int:
+        # any writable buffer: callers pass bytearray or memoryview.
+        view = memoryview(buffer).cast('B')
+        size = min(len(view), self._length - self._position)
+        if size <= 0:
+            return 0
+        data = os.pread(self._fd, size, self._offset + self._position)
+        view[:len(data)] = data
+        self._position += len(data)
+        return len(data)
+
+
+class _FileSlice(io.RawIOBase):
+    def __init__(self, fd: int, offset: int) -> None:
+        """
+        Write-only view of an open file starting at `offset`. Writes go through
+        `os.pwrite`, so downloaded chunks land at their final position directly.
+
+        Args:
+            fd (int) : file descriptor
+            offset (int) : first byte of the slice
+        """
+        super().__init__()
+        self._fd = fd
+        self._offset = offset
+        self._position = 0
+
+    def writable(self) -> bool:
+        return True
+
+    def tell(self) -> int:
+        return self._position
+
+    def write(self, data: Any) -> int:
+        view = memoryview(data).cast('B')
+        size = len(view)
+        while view:
+            written = os.pwrite(self._fd, view, self._offset + self._position)
+            self._position += written
+            view = view[written:]
+        return size
+
+
+def _file_checksums(filename: Union[str, Path]) -> Tuple[Optional[str], Optional[str]]:
+    """
+    Args:
+        filename (str, os.PathLike) :
+
+    Returns:
+        tuple : base64 encoded (crc32c, md5) as in blob metadata. crc32c is None
+            when `crcmod` is not installed.
+    """
+    digest = hashlib.md5()
+    crc = 0
+    with open(str(filename), 'rb') as f:
+        for chunk in iter(lambda: f.read(8 * 1024 * 1024), b''):
+            digest.update(chunk)
+            if _crc32c is not None:
+                crc = _crc32c(chunk, crc)
+
+    crc32c = base64.b64encode(crc.to_bytes(4, 'big')).decode('ascii') if _crc32c is not None else None
+    return crc32c, base64.b64encode(digest.digest()).decode('ascii')
+
+
+def _matches(checksums: Tuple[Optional[str], Optional[str]], blob: Union[Blob, BlobInfo]) -> Optional[bool]:
+    """
+    Args:
+        checksums (tuple) : (crc32c, md5) of a local file
+        blob (Blob, BlobInfo) : remote object
+
+    Returns:
+        bool, None : None when no checksum is available on both sides.
+            Composite objects only carry crc32c, which needs `crcmod`.
+    """
+    crc32c, md5 = checksums
+    if blob.crc32c and crc32c:
+        return blob.crc32c == crc32c
+    if blob.md5_hash and md5:
+        return blob.md5_hash == md5
+    return None
+
+
+def _verify_checksum(filename: Union[str, Path], blob: Blob) -> None:
+    """
+    Compare a downloaded file with the checksums of the blob metadata.
+
+    Args:
+        filename (str, os.PathLike) : downloaded file
+        blob (Blob) : blob with loaded metadata
+
+    Raises:
+        ChecksumMismatch
+
+    Warns:
+        RuntimeWarning : no checksum could be compared, e.g. a composite object
+            (crc32c only) without `crcmod` installed
+    """
+    checksums = _file_checksums(filename)
+    matched = _matches(checksums, blob)
+    if matched is None:
+        warnings.warn('{}: download not verified, no comparable checksum (crc32c needs crcmod)'.format(blob.name),
+                      RuntimeWarning)
+    elif matched is False:
+        raise ChecksumMismatch('{}: expected crc32c={} md5={}, got crc32c={} md5={}'.format(
+            blob.name, blob.crc32c, blob.md5_hash, *checksums))
+
+
+def _split_ranges(size: int, parts: int) -> List[Tuple[int, int]]:
+    """
+    Args:
+        size (int) : total bytes
+        parts (int) : number of ranges
+
+    Returns:
+        list : (offset, length) pairs covering [0, size)
+    """
+    if size == 0:
+        return []
+    parts = max(1, min(parts, size))
+    step = -(-size // parts)
+    return [(offset, min(step, size - offset)) for offset in range(0, size, step)]
+
+
 class CloudStorage:
     def __init__(self, project: str, bucket: str,
                  credential: Optional[Union[str, Path]] = None):
@@ -93,12 +431,114 @@ class CloudStorage:
 
     def get_blob_list(self) -> list:
         """
+        Load every blob of the bucket. Use `iter_blobs` for large buckets.
 
         Returns:
             list
         """
         return [b for b in self.bucket.list_blobs()]
 
+    def iter_blobs(self,
+                   prefix: Optional[str] = None,
+                   delimiter: Optional[str] = None,
+                   fields: Sequence[str] = ('name', 'size', 'updated', 'crc32c', 'md5Hash'),
+                   page_size: int = 1000,
+                   page_token: Optional[str] = None) -> Iterator[BlobInfo]:
+        """
+        Iterate blobs page by page as lightweight records. Only `fields` are
+        requested, and the next page is requested in the background while the
+        current one is consumed.
+
+        Args:
+            prefix (str, None) :
+            delimiter (str, None) : e.g. "/" to list one directory level
+            fields (Sequence) : object fields to request, in JSON API names
+            page_size (int) : objects per page. the API caps it at 1000.
+            page_token (str, None) : resume a scan from `BlobInfo.page_token`
+
+        Returns:
+            Iterator[BlobInfo]
+        """
+        item_fields = ['name'] + [f for f in fields if f != 'name']
+        iterator = self.bucket.list_blobs(
+            page_token=page_token,
+            prefix=prefix,
+            delimiter=delimiter,
+            fields='items({}),prefixes,nextPageToken'.format(','.join(item_fields)),
+            client=self.client)
+        # max_results would cap the whole listing, not each page.
+        iterator.extra_params['maxResults'] = page_size
+        pages = iterator.pages
+
+        def request() -> Tuple[Optional[str], Any]:
+            # the token which the iterator is about to send identifies the page.
+            token = iterator.next_page_token
+            return token, next(pages, None)
+
+        with ThreadPoolExecutor(max_workers=1) as executor:
+            future = executor.submit(request)
+            while True:
+                token, page = future.result()
+                if page is None:
+                    return
+                future = executor.submit(request)
+
+                for name in page.prefixes:
+                    yield BlobInfo(name=name, page_token=token)
+                for blob in page:
+                    yield BlobInfo(name=blob.name,
+                                   size=blob.size,
+                                   updated=blob.updated.isoformat() if blob.updated is not None else None,
+                                   crc32c=blob.crc32c,
+                                   md5_hash=blob.md5_hash,
+                                   page_token=token)
+
+    def open(self,
+             blob: str,
+             mode: str = 'rb',
+             chunk_size: int = DEFAULT_CHUNK_SIZE,
+             read_ahead: int = 2,
+             content_type: Optional[str] = None,
+             encoding: Optional[str] = None) -> IO:
+        """
+        Open a blob as a stream without a local copy. Reads fetch ranges with
+        background read-ahead and writes send resumable upload chunks, so objects
+        larger than memory can be processed line by line. A written object is
+        published on close; if a `with` block raises, the upload is cancelled.
+
+        Args:
+            blob (str) :
+            mode (str) : "rb", "wb", "r" or "w"
+            chunk_size (int) : bytes per request
+            read_ahead (int) : chunks fetched ahead of the reader
+            content_type (str, None) : used when writing
+            encoding (str, None) : used in text mode
+
+        Returns:
+            IO : buffered binary stream, or text stream for "r" and "w"
+        """
+        if mode not in ('rb', 'wb', 'r', 'w'):
+            raise ValueError('unsupported mode: {}'.format(mode))
+
+        if mode.startswith('r'):
+            bl = self.bucket.get_blob(blob_name=blob)
+            if bl is None:
+                raise FileNotFoundError('gs://{}/{}'.format(self.bucket.name, blob))
+            stream = io.BufferedReader(
+                BlobReader(bl, self.client, chunk_size=chunk_size, read_ahead=read_ahead),
+                buffer_size=io.DEFAULT_BUFFER_SIZE * 8)  # type: IO
+            if 'b' in mode:
+                return stream
+            return io.TextIOWrapper(stream, encoding=encoding)
+
+        writer = BufferedBlobWriter(
+            BlobWriter(self.bucket.blob(blob_name=blob), self.client,
+                       chunk_size=chunk_size, content_type=content_type),
+            buffer_size=io.DEFAULT_BUFFER_SIZE * 8)
+        if 'b' in mode:
+            return writer
+        return TextBlobWriter(writer, encoding=encoding)
+
     def get_blob_url(self, blob: str) -> str:
         """
 
@@ -113,15 +553,21 @@ class CloudStorage:
     def upload_from_filename(self,
                              filename: Union[str, Path],
                              blob: str,
-                             content_type: Optional[str] = None) -> str:
+                             content_type: Optional[str] = None,
+                             parallel_threshold: Optional[int] = PARALLEL_COMPOSITE_THRESHOLD) -> str:
         """
         Args:
             filename (str, os.PathLike) :
             blob (str) :
             content_type (str, None) :
+            parallel_threshold (int, None) : files of this size or larger are sent with
+                `upload_composite`. None always uses a single stream.
         Returns:
             str : public url
         """
+        if parallel_threshold is not None and os.path.getsize(filename) >= parallel_threshold:
+            return self.upload_composite(filename, blob, content_type=content_type)
+
         bl = self.bucket.blob(blob_name=blob)
         bl.upload_from_filename(
             filename=filename,
@@ -129,17 +575,425 @@ class CloudStorage:
             client=self.client)
         return bl.public_url
 
-    def download_from_blob(self, filename: str, blob: str) -> None:
+    def upload_from_string(self,
+                           data: Union[bytes, str],
+                           blob: str,
+                           content_type: Optional[str] = None) -> str:
+        """
+        Upload in-memory data without a temporary file.
+
+        Args:
+            data (bytes, str) :
+            blob (str) :
+            content_type (str, None) :
+        Returns:
+            str : public url
+        """
+        bl = self.bucket.blob(blob_name=blob)
+        bl.upload_from_string(data, content_type=content_type or 'application/octet-stream', client=self.client)
+        return bl.public_url
+
+    def download_from_blob(self, filename: str, blob: str,
+                           sliced_threshold: Optional[int] = None) -> None:
         """
 
         Args:
             filename (str) :
             blob (str) :
+            sliced_threshold (int, None) : blobs of this size or larger are downloaded
+                with `download_sliced`, e.g. SLICED_DOWNLOAD_THRESHOLD. Checking the
+                size costs one metadata request. None always uses a single stream.
 
         Returns:
             None
         """
+        if sliced_threshold is not None:
+            bl = self.bucket.get_blob(blob_name=blob)
+            if bl is not None and bl.size >= sliced_threshold:
+                self.download_sliced(filename, blob)
+                return
+
         self.bucket.blob(
             blob_name=blob).download_to_filename(
             filename=filename)
 
+    def ensure_http_pool(self, size: int) -> None:
+        """
+        Let the shared HTTP session keep `size` connections alive, so that worker
+        threads reuse connections instead of opening new ones. The session belongs
+        to the pooled client, so its adapter is only replaced by a larger one.
+        The clients expose their session only as `_http`; without a mountable
+        session the default pool is kept.
+
+        Args:
+            size (int) : number of concurrent connections
+        """
+        session = getattr(self.client, '_http', None)  # type: Any
+        if not hasattr(session, 'mount'):
+            return
+        with _http_pool_lock:
+            if size <= _http_pool_sizes.get(session, 0):
+                return
+            session.mount('https://', HTTPAdapter(pool_connections=size, pool_maxsize=size))
+            _http_pool_sizes[session] = size
+
+    def _upload_task(self, filename: Union[str, Path], blob: str,
+                     content_type: Optional[str]) -> Callable[[], int]:
+        def task() -> int:
+            self.bucket.blob(blob_name=blob).upload_from_filename(
+                filename=str(filename),
+                content_type=content_type,
+                client=self.client)
+            return os.path.getsize(filename)
+        return task
+
+    def _download_task(self, blob: str, filename: Union[str, Path]) -> Callable[[], int]:
+        def task() -> int:
+            directory = os.path.dirname(str(filename))
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            self.bucket.blob(blob_name=blob).download_to_filename(
+                filename=str(filename),
+                client=self.client)
+            return os.path.getsize(filename)
+        return task
+
+    def upload_many(self,
+                    files: Iterable[Tuple[Union[str, Path], str]],
+                    content_type: Optional[str] = None,
+                    max_workers: int = 8) -> TransferSummary:
+        """
+        Args:
+            files (Iterable) : pairs of (local filename, blob name)
+            content_type (str, None) :
+            max_workers (int) : number of concurrent uploads
+
+        Returns:
+            TransferSummary : failures are keyed by blob name
+        """
+        self.ensure_http_pool(max_workers)
+        tasks = ((blob, self._upload_task(filename, blob, content_type))
+                 for filename, blob in files)
+        return run_transfers(tasks, max_workers=max_workers)
+
+    def download_many(self,
+                      blobs: Iterable[Tuple[str, Union[str, Path]]],
+                      max_workers: int = 8) -> TransferSummary:
+        """
+        Args:
+            blobs (Iterable) : pairs of (blob name, local filename)
+            max_workers (int) : number of concurrent downloads
+
+        Returns:
+            TransferSummary : failures are keyed by blob name
+        """
+        self.ensure_http_pool(max_workers)
+        tasks = ((blob, self._download_task(blob, filename))
+                 for blob, filename in blobs)
+        return run_transfers(tasks, max_workers=max_workers)
+
+    def upload_directory(self,
+                         directory: Union[str, Path],
+                         prefix: str = '',
+                         content_type: Optional[str] = None,
+                         max_workers: int = 8) -> TransferSummary:
+        """
+        Upload every file under `directory`. Blob names are `prefix` followed by
+        the path relative to `directory`.
+
+        Args:
+            directory (str, os.PathLike) :
+            prefix (str) : e.g. "exports/2019-04-01/"
+            content_type (str, None) :
+            max_workers (int) : number of concurrent uploads
+
+        Returns:
+            TransferSummary
+        """
+        root = Path(directory)
+
+        def files() -> Iterable[Tuple[Path, str]]:
+            for dirpath, _, filenames in os.walk(str(root)):
+                for name in filenames:
+                    path = Path(dirpath) / name
+                    yield path, prefix + path.relative_to(root).as_posix()
+
+        return self.upload_many(files(), content_type=content_type, max_workers=max_workers)
+
+    def download_prefix(self,
+                        prefix: str,
+                        directory: Union[str, Path],
+                        max_workers: int = 8) -> TransferSummary:
+        """
+        Download every blob under `prefix` into `directory`, keeping the layout
+        below the prefix.
+
+        Args:
+            prefix (str) :
+            directory (str, os.PathLike) :
+            max_workers (int) : number of concurrent downloads
+
+        Returns:
+            TransferSummary
+        """
+        root = Path(directory)
+
+        def tasks() -> Iterable[Tuple[str, Callable[[], int]]]:
+            for info in self.iter_blobs(prefix=prefix, fields=('name',)):
+                # skip folder placeholders created by the console.
+                if info.name.endswith('/'):
+                    continue
+                target = _local_path(root, info.name[len(prefix):].lstrip('/'))
+                if target is None:
+                    yield info.name, partial(_reject, info.name, root)
+                else:
+                    yield info.name, self._download_task(info.name, target)
+
+        self.ensure_http_pool(max_workers)
+        return run_transfers(tasks(), max_workers=max_workers)
+
+    def upload_composite(self,
+                         filename: Union[str, Path],
+                         blob: str,
+                         content_type: Optional[str] = None,
+                         parts: int = 8,
+                         max_workers: Optional[int] = None) -> str:
+        """
+        Parallel composite upload. The file is split into `parts` byte ranges which
+        are uploaded concurrently as temporary objects and then composed into `blob`.
+        Temporary objects are deleted whether or not the upload succeeds.
+
+        Args:
+            filename (str, os.PathLike) :
+            blob (str) :
+            content_type (str, None) :
+            parts (int) : number of byte ranges
+            max_workers (int, None) : number of concurrent uploads. defaults to `parts`.
+
+        Returns:
+            str : public url
+        """
+        size = os.path.getsize(filename)
+        ranges = _split_ranges(size, parts)
+        if len(ranges) < 2:
+            return self.upload_from_filename(filename, blob, content_type=content_type,
+                                             parallel_threshold=None)
+        workers = max_workers or len(ranges)
+        temp_prefix = '{}.composite-{}/'.format(blob, uuid.uuid4().hex)
+        temporaries = []  # type: List[Blob]
+
+        self.ensure_http_pool(workers)
+        fd = os.open(str(filename), os.O_RDONLY)
+        try:
+            def upload_part(index: int, offset: int, length: int) -> Blob:
+                part = self.bucket.blob(blob_name='{}{:05d}'.format(temp_prefix, index))
+                part.upload_from_file(_FileRange(fd, offset, length),
+                                      size=length,
+                                      content_type=content_type,
+                                      client=self.client)
+                return part
+
+            with ThreadPoolExecutor(max_workers=workers) as executor:
+                futures = [executor.submit(upload_part, i, offset, length)
+                           for i, (offset, length) in enumerate(ranges)]
+                # register every part before raising so that cleanup sees all of them.
+                sources = []
+                for future in futures:
+                    if future.exception() is None:
+                        sources.append(future.result())
+                temporaries.extend(sources)
+                for future in futures:
+                    future.result()
+
+            target = self.bucket.blob(blob_name=blob)
+            target.content_type = content_type
+            self._compose(target, sources, temp_prefix, temporaries)
+            return target.public_url
+        finally:
+            os.close(fd)
+            for temporary in temporaries:
+                try:
+                    temporary.delete(client=self.client)
+                except Exception:
+                    pass
+
+    def _compose(self, target: Blob, sources: List[Blob], temp_prefix: str,
+                 temporaries: List[Blob]) -> None:
+        """
+        Compose `sources` into `target`, folding them through intermediate objects
+        when there are more than `MAX_COMPOSE_COMPONENTS`.
+
+        Args:
+            target (Blob) :
+            sources (list) :
+            temp_prefix (str) : name prefix of intermediate objects
+            temporaries (list) : intermediate objects are appended here for cleanup
+        """
+        level = 0
+        while len(sources) > MAX_COMPOSE_COMPONENTS:
+            merged = []
+            for i in range(0, len(sources), MAX_COMPOSE_COMPONENTS):
+                intermediate = self.bucket.blob(
+                    blob_name='{}merged-{}-{:05d}'.format(temp_prefix, level, i))
+                intermediate.content_type = target.content_type
+                temporaries.append(intermediate)
+                intermediate.compose(sources[i:i + MAX_COMPOSE_COMPONENTS], client=self.client)
+                merged.append(intermediate)
+            sources = merged
+            level += 1
+
+        target.compose(sources, client=self.client)
+
+    def download_sliced(self,
+                        filename: Union[str, Path],
+                        blob: str,
+                        slice_size: int = 64 * 1024 * 1024,
+                        max_workers: int = 8,
+                        retries: int = 3) -> None:
+        """
+        Download a blob with concurrent range requests. Each slice is written
+        straight into a preallocated file at its own offset. Only failed slices
+        are retried, and the whole file is checked against the blob checksum.
+
+        Args:
+            filename (str, os.PathLike) :
+            blob (str) :
+            slice_size (int) : bytes per range request
+            max_workers (int) : number of concurrent requests
+            retries (int) : how many times failed slices are requested again
+
+        Raises:
+            ChecksumMismatch : the downloaded file does not match the metadata
+        """
+        bl = self.bucket.get_blob(blob_name=blob)
+        if bl is None:
+            raise FileNotFoundError('gs://{}/{}'.format(self.bucket.name, blob))
+
+        self.ensure_http_pool(max_workers)
+        fd = os.open(str(filename), os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o644)
+        try:
+            os.ftruncate(fd, bl.size)
+
+            def fetch(offset: int, length: int) -> int:
+                # `end` is inclusive. the blob generation pins every slice to one object version.
+                bl.download_to_file(_FileSlice(fd, offset),
+                                    client=self.client,
+                                    start=offset,
+                                    end=offset + length - 1)
+                return length
+
+            slices = {'bytes={}-{}'.format(offset, offset + length - 1): (offset, length)
+                      for offset, length in _split_ranges(bl.size, -(-bl.size // slice_size))}
+            for attempt in range(retries + 1):
+                summary = run_transfers(
+                    ((key, partial(fetch, offset, length)) for key, (offset, length) in slices.items()),
+                    max_workers=max_workers)
+                if not summary.failed:
+                    break
+                if attempt == retries:
+                    raise IOError('failed to download slices of {}: {}'.format(blob, summary.failed))
+                slices = {key: slices[key] for key in summary.failed}
+        finally:
+            os.close(fd)
+
+        _verify_checksum(filename, bl)
+
+    def sync(self,
+             local_dir: Union[str, Path],
+             prefix: str = '',
+             direction: str = 'upload',
+             delete: bool = False,
+             dry_run: bool = False,
+             manifest: Optional[Union[str, Path]] = None,
+             max_workers: int = 8) -> SyncPlan:
+        """
+        Transfer only new or changed files between `local_dir` and `prefix`.
+        Files are compared by size first and then by crc32c (or md5) against the
+        object metadata. Local checksums are cached in a sqlite manifest keyed by
+        path, mtime and size.
+
+        Args:
+            local_dir (str, os.PathLike) :
+            prefix (str) : blob name prefix, usually ending with "/"
+            direction (str) : "upload" (local to bucket) or "download" (bucket to local)
+            delete (bool) : remove destination files which do not exist at the source
+            dry_run (bool) : only compute the plan
+            manifest (str, os.PathLike, None) : manifest location.
+                defaults to `MANIFEST_FILENAME` in `local_dir`.
+            max_workers (int) : number of concurrent transfers
+
+        Returns:
+            SyncPlan : `summary` covers transfers and deletions. deleted blob names
+                or local paths are in `succeeded`, failed ones in `failed`.
+        """
+        if direction not in ('upload', 'download'):
+            raise ValueError('direction must be "upload" or "download": {}'.format(direction))
+
+        root = Path(local_dir)
+        root.mkdir(parents=True, exist_ok=True)
+        manifest_path = os.path.abspath(str(manifest) if manifest is not None else str(root / MANIFEST_FILENAME))
+
+        local = {}  # type: Dict[str, os.stat_result]
+        for dirpath, _, filenames in os.walk(str(root)):
+            for name in filenames:
+                path = Path(dirpath) / name
+                # skip the manifest and its sqlite journal.
+                if os.path.abspath(str(path)).startswith(manifest_path):
+                    continue
+                local[path.relative_to(root).as_posix()] = path.stat()
+
+        remote = {}  # type: Dict[str, BlobInfo]
+        for info in self.iter_blobs(prefix=prefix):
+            rel = info.name[len(prefix):]
+            if rel and not rel.endswith('/'):
+                remote[rel] = info
+
+        with Manifest(manifest_path) as mf:
+            def changed(rel: str) -> bool:
+                stat, info = local[rel], remote[rel]
+                if info.size != stat.st_size:
+                    return True
+                checksums = mf.checksums(root / rel, _file_checksums, stat=stat)
+                return _matches(checksums, info) is not True
+
+            if direction == 'upload':
+                transfer = [rel for rel in sorted(local) if rel not in remote or changed(rel)]
+                extraneous = sorted(set(remote) - set(local)) if delete else []
+            else:
+                transfer = [rel for rel in sorted(remote) if rel not in local or changed(rel)]
+                extraneous = sorted(set(local) - set(remote)) if delete else []
+            mf.commit()
+
+            if dry_run:
+                return SyncPlan(transfer=transfer, delete=extraneous)
+
+            if direction == 'upload':
+                summary = self.upload_many(((root / rel, prefix + rel) for rel in transfer),
+                                           max_workers=max_workers)
+                deleted = run_transfers(((prefix + rel, partial(self._delete_task, prefix + rel))
+                                          for rel in extraneous), max_workers=max_workers)
+            else:
+                def downloads() -> Iterable[Tuple[str, Callable[[], int]]]:
+                    for rel in transfer:
+                        target = _local_path(root, rel)
+                        if target is None:
+                            yield prefix + rel, partial(_reject, prefix + rel, root)
+                        else:
+                            yield prefix + rel, self._download_task(prefix + rel, target)
+
+                self.ensure_http_pool(max_workers)
+                summary = run_transfers(downloads(), max_workers=max_workers)
+                for name in summary.succeeded:
+                    info = remote[name[len(prefix):]]
+                    mf.record(root / name[len(prefix):], info.crc32c, info.md5_hash)
+                deleted = run_transfers(((str(root / rel), partial(_remove_local, root / rel))
+                                          for rel in extraneous), max_workers=max_workers)
+                for path in deleted.succeeded:
+                    mf.forget(Path(path))
+            summary = _merge(summary, deleted)
+
+        return SyncPlan(transfer=transfer, delete=extraneous, summary=summary)
+
+    def _delete_task(self, blob: str) -> int:
+        self.bucket.blob(blob_name=blob).delete(client=self.client)
+        return 0
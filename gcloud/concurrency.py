@@ -0,0 +1,146 @@
+import random
+import threading
+import time
+from typing import Callable, Optional, TypeVar
+
+from google.api_core import exceptions
+
+# errors worth retrying: the request may succeed later without any change.
+TRANSIENT_ERRORS = (exceptions.TooManyRequests,
+                    exceptions.InternalServerError,
+                    exceptions.BadGateway,
+                    exceptions.ServiceUnavailable,
+                    exceptions.GatewayTimeout,
+                    exceptions.DeadlineExceeded,
+                    exceptions.ResourceExhausted)
+
+T = TypeVar('T')
+
+
+class Backoff:
+    def __init__(self,
+                 initial: float = 1.0,
+                 maximum: float = 60.0,
+                 multiplier: float = 2.0,
+                 jitter: float = 0.2) -> None:
+        """
+        Exponential backoff with proportional jitter.
+
+        Args:
+            initial (float) : first delay in seconds
+            maximum (float) : upper bound of a delay
+            multiplier (float) : growth per attempt
+            jitter (float) : random spread as a fraction of the delay
+        """
+        self.initial = initial
+        self.maximum = maximum
+        self.multiplier = multiplier
+        self.jitter = jitter
+
+    def delay(self, attempt: int) -> float:
+        """
+        Args:
+            attempt (int) : 0 for the first retry
+
+        Returns:
+            float : seconds to wait
+        """
+        delay = min(self.maximum, self.initial * self.multiplier ** attempt)
+        return delay * (1 + random.uniform(-self.jitter, self.jitter))
+
+
+class TokenBucket:
+    def __init__(self,
+                 rate: float,
+                 capacity: Optional[float] = None,
+                 min_rate: Optional[float] = None) -> None:
+        """
+        Thread-safe token bucket. `throttle` halves the rate after a quota error
+        and `recover` raises it back step by step, which keeps a client just under
+        the quota it is actually granted.
+
+        Args:
+            rate (float) : tokens per second, e.g. a per-minute quota divided by 60
+            capacity (float, None) : burst size. defaults to one second of tokens.
+            min_rate (float, None) : lower bound of `throttle`. defaults to 1% of `rate`.
+        """
+        self.max_rate = rate
+        self.rate = rate
+        self.capacity = capacity if capacity is not None else max(1.0, rate)
+        self.min_rate = min_rate if min_rate is not None else rate / 100
+        self._tokens = self.capacity
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def _refill(self, now: float) -> None:
+        self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+        self._updated = now
+
+    def acquire(self, tokens: float = 1.0) -> None:
+        """
+        Block until `tokens` are available and take them.
+
+        Args:
+            tokens (float) :
+        """
+        while True:
+            with self._lock:
+                self._refill(time.monotonic())
+                if self._tokens >= tokens:
+                    self._tokens -= tokens
+                    return
+                wait = (tokens - self._tokens) / self.rate
+            time.sleep(wait)
+
+    def throttle(self, factor: float = 0.5) -> None:
+        """
+        Args:
+            factor (float) : multiplier applied to the current rate
+        """
+        with self._lock:
+            self._refill(time.monotonic())
+            self.rate = max(self.min_rate, self.rate * factor)
+
+    def recover(self, step: float = 0.05) -> None:
+        """
+        Args:
+            step (float) : fraction of the configured rate added back
+        """
+        with self._lock:
+            if self.rate < self.max_rate:
+                self._refill(time.monotonic())
+                self.rate = min(self.max_rate, self.rate + self.max_rate * step)
+
+
+def call_with_retry(limiter: TokenBucket, backoff: Backoff, fn: Callable[[], T], max_retries: int = 5) -> T:
+    """
+    Call `fn` at the rate of `limiter` and retry it on TRANSIENT_ERRORS. A quota
+    error throttles the limiter and a success lets it recover.
+
+    Args:
+        limiter (TokenBucket) : shared by every caller of the same quota
+        backoff (Backoff) : delay between retries
+        fn (Callable) : the request, without arguments
+        max_retries (int) : retries of a request failing transiently
+
+    Returns:
+        the result of `fn`
+
+    Raises:
+        the error of the last attempt, or any error which is not transient
+    """
+    attempt = 0
+    while True:
+        limiter.acquire()
+        try:
+            result = fn()
+        except TRANSIENT_ERRORS as e:
+            if isinstance(e, exceptions.TooManyRequests):
+                limiter.throttle()
+            if attempt >= max_retries:
+                raise
+            time.sleep(backoff.delay(attempt))
+            attempt += 1
+        else:
+            limiter.recover()
+            return result
@@ -0,0 +1,240 @@
+from array import array
+from typing import Any, Dict, Iterable, Iterator, List, Mapping, Optional, Union
+
+from google.cloud.language import enums, types
+from google.protobuf.json_format import ParseDict
+
+try:
+    import numpy as np
+except ImportError:
+    np = None  # type: ignore
+
+try:
+    import pyarrow
+except ImportError:
+    pyarrow = None
+
+# column name to array typecode. "str" columns are kept in Python lists.
+_SCHEMAS = {
+    'documents': {'id': 'str', 'language': 'str', 'sentiment_magnitude': 'd', 'sentiment_score': 'd'},
+    'sentences': {'content': 'str', 'begin_offset': 'q', 'sentiment_magnitude': 'd', 'sentiment_score': 'd'},
+    'tokens': {'content': 'str', 'begin_offset': 'q', 'pos_tag': 'h', 'pos_number': 'h',
+               'head_token_index': 'q', 'dependency_label': 'h', 'lemma': 'str'},
+    'entities': {'name': 'str', 'type': 'h', 'salience': 'd'},
+    'mentions': {'content': 'str', 'begin_offset': 'q', 'type': 'h',
+                 'sentiment_magnitude': 'd', 'sentiment_score': 'd'},
+    'categories': {'name': 'str', 'confidence': 'd'},
+}
+
+# child table to (parent table, key column added on export).
+_PARENTS = {
+    'sentences': ('documents', 'document'),
+    'tokens': ('documents', 'document'),
+    'entities': ('documents', 'document'),
+    'categories': ('documents', 'document'),
+    'mentions': ('entities', 'entity'),
+}
+
+# enum columns stored as codes and exported as names in rows.
+_ENUMS = {
+    ('tokens', 'pos_tag'): enums.PartOfSpeech.Tag,
+    ('tokens', 'pos_number'): enums.PartOfSpeech.Number,
+    ('tokens', 'dependency_label'): enums.DependencyEdge.Label,
+    ('entities', 'type'): enums.Entity.Type,
+    ('mentions', 'type'): enums.EntityMention.Type,
+}
+
+
+class AnnotationTable:
+    def __init__(self) -> None:
+        """
+        Column store of many AnnotateTextResponse. Numeric and enum columns are
+        typed `array.array`, and child rows are located by CSR-style offsets:
+        the tokens of document i are rows `offsets['tokens'][i]:offsets['tokens'][i + 1]`,
+        and the mentions of entity j are rows `offsets['mentions'][j]:offsets['mentions'][j + 1]`.
+        """
+        self.columns = {table: {name: [] if code == 'str' else array(code)
+                                for name, code in schema.items()}
+                        for table, schema in _SCHEMAS.items()}  # type: Dict[str, Dict[str, Any]]
+        self.offsets = {table: array('q', [0]) for table in _PARENTS}  # type: Dict[str, array]
+
+    def __len__(self) -> int:
+        return len(self.columns['documents']['id'])
+
+    def size(self, table: str) -> int:
+        """
+        Args:
+            table (str) : e.g. "tokens"
+
+        Returns:
+            int : number of rows
+        """
+        return len(next(iter(self.columns[table].values())))
+
+    def add(self,
+            response: Union[types.AnnotateTextResponse, Mapping],
+            doc_id: Optional[str] = None) -> None:
+        """
+        Append one document.
+
+        Args:
+            response (types.AnnotateTextResponse, Mapping) : protobuf response, or the
+                dict returned by `CloudLanguage.annotate_text_from_string`
+            doc_id (str, None) : defaults to the document index
+        """
+        if isinstance(response, Mapping):
+            response = ParseDict(response, types.AnnotateTextResponse(), ignore_unknown_fields=True)
+
+        c = self.columns
+        documents = c['documents']
+        documents['id'].append(doc_id if doc_id is not None else str(len(self)))
+        documents['language'].append(response.language)
+        documents['sentiment_magnitude'].append(response.document_sentiment.magnitude)
+        documents['sentiment_score'].append(response.document_sentiment.score)
+
+        sentences = c['sentences']
+        for s in response.sentences:
+            sentences['content'].append(s.text.content)
+            sentences['begin_offset'].append(s.text.begin_offset)
+            sentences['sentiment_magnitude'].append(s.sentiment.magnitude)
+            sentences['sentiment_score'].append(s.sentiment.score)
+
+        tokens = c['tokens']
+        for t in response.tokens:
+            tokens['content'].append(t.text.content)
+            tokens['begin_offset'].append(t.text.begin_offset)
+            tokens['pos_tag'].append(t.part_of_speech.tag)
+            tokens['pos_number'].append(t.part_of_speech.number)
+            tokens['head_token_index'].append(t.dependency_edge.head_token_index)
+            tokens['dependency_label'].append(t.dependency_edge.label)
+            tokens['lemma'].append(t.lemma)
+
+        entities, mentions = c['entities'], c['mentions']
+        for e in response.entities:
+            entities['name'].append(e.name)
+            entities['type'].append(e.type)
+            entities['salience'].append(e.salience)
+            for m in e.mentions:
+                mentions['content'].append(m.text.content)
+                mentions['begin_offset'].append(m.text.begin_offset)
+                mentions['type'].append(m.type)
+                mentions['sentiment_magnitude'].append(m.sentiment.magnitude)
+                mentions['sentiment_score'].append(m.sentiment.score)
+            self.offsets['mentions'].append(len(mentions['content']))
+
+        categories = c['categories']
+        for category in response.categories:
+            categories['name'].append(category.name)
+            categories['confidence'].append(category.confidence)
+
+        for table in ('sentences', 'tokens', 'entities', 'categories'):
+            self.offsets[table].append(self.size(table))
+
+    def extend(self, responses: Iterable[Union[types.AnnotateTextResponse, Mapping]]) -> None:
+        """
+        Args:
+            responses (Iterable) : responses in document order
+        """
+        for response in responses:
+            self.add(response)
+
+    def to_numpy(self, table: str) -> Dict[str, Any]:
+        """
+        Numeric columns are zero-copy views of the stored arrays. Child tables
+        get a `document` or `entity` key column expanded from the offsets.
+        The arrays can not grow while a view is alive, so release views before
+        calling `add` again.
+
+        Args:
+            table (str) :
+
+        Returns:
+            dict : column name to numpy.ndarray
+        """
+        if np is None:
+            raise ImportError('numpy is required for to_numpy')
+
+        result = {}
+        if table in _PARENTS:
+            _, key = _PARENTS[table]
+            offsets = np.frombuffer(self.offsets[table], dtype=np.int64)
+            result[key] = np.repeat(np.arange(len(offsets) - 1), np.diff(offsets))
+        for name, column in self.columns[table].items():
+            if isinstance(column, array):
+                result[name] = np.frombuffer(column, dtype=np.dtype(column.typecode))
+            else:
+                result[name] = np.array(column, dtype=object)
+        return result
+
+    def to_arrow(self, table: str) -> 'pyarrow.Table':
+        """
+        Args:
+            table (str) :
+
+        Returns:
+            pyarrow.Table : numeric columns are built without copying
+        """
+        if pyarrow is None:
+            raise ImportError('pyarrow is required for to_arrow')
+
+        columns = self.to_numpy(table)
+        return pyarrow.Table.from_arrays(
+            [pyarrow.array(v, type=pyarrow.string()) if v.dtype == object else pyarrow.array(v)
+             for v in columns.values()],
+            names=list(columns))
+
+    def rows(self, table: str) -> Iterator[Dict[str, Any]]:
+        """
+        Rows as dicts with enum names, e.g. for `BigQuery.load_from_records`.
+        Child rows carry the id of their document (and the index of their entity).
+
+        Args:
+            table (str) :
+
+        Returns:
+            Iterator[Dict[str, Any]]
+        """
+        columns = self.columns[table]
+        names = list(columns)
+        decoders = {name: {e.value: e.name for e in _ENUMS[(table, name)]}
+                    for name in names if (table, name) in _ENUMS}
+        keys = self._keys(table)
+        doc_ids = self.columns['documents']['id']
+        entity_documents = self._keys('entities') if table == 'mentions' else []
+
+        for i in range(self.size(table)):
+            row = {name: columns[name][i] for name in names}
+            for name, decoder in decoders.items():
+                row[name] = decoder.get(row[name], str(row[name]))
+            if table == 'mentions':
+                row['entity'] = keys[i]
+                row['document'] = doc_ids[entity_documents[keys[i]]]
+            elif table != 'documents':
+                row['document'] = doc_ids[keys[i]]
+            yield row
+
+    def _keys(self, table: str) -> List[int]:
+        if table not in self.offsets:
+            return []
+        offsets = self.offsets[table]
+        return [parent for parent in range(len(offsets) - 1)
+                for _ in range(offsets[parent + 1] - offsets[parent])]
+
+    def load_to_bigquery(self, bigquery: Any, table_prefix: str = 'language_', **kwargs: Any) -> List[Any]:
+        """
+        Append every table to BigQuery through `BigQuery.load_from_records`.
+
+        Args:
+            bigquery (gcloud.bigquery.BigQuery) :
+            table_prefix (str) : e.g. "language_" loads "language_tokens"
+            **kwargs : load_from_records arguments
+
+        Returns:
+            list : finished bigquery.LoadJob
+        """
+        kwargs.setdefault('autodetect', True)
+        jobs = []
+        for table in _SCHEMAS:
+            if self.size(table):
+                jobs.extend(bigquery.load_from_records(table_prefix + table, self.rows(table), **kwargs))
+        return jobs
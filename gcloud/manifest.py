@@ -0,0 +1,88 @@
+import os
+import sqlite3
+from pathlib import Path
+from typing import Callable, Optional, Tuple, Union
+
+Checksums = Tuple[Optional[str], Optional[str]]
+
+
+class Manifest:
+    def __init__(self, filename: Union[str, Path]) -> None:
+        """
+        Local checksum cache keyed by path, mtime and size, so that unchanged files
+        are never hashed twice.
+
+        Args:
+            filename (str, os.PathLike) : sqlite database location
+        """
+        self.filename = str(filename)
+        self._conn = sqlite3.connect(self.filename)
+        self._conn.execute(
+            'CREATE TABLE IF NOT EXISTS files ('
+            'path TEXT PRIMARY KEY, mtime_ns INTEGER, size INTEGER, crc32c TEXT, md5 TEXT)')
+        self._conn.commit()
+
+    def __enter__(self) -> 'Manifest':
+        return self
+
+    def __exit__(self, *args: object) -> None:
+        self.close()
+
+    def checksums(self,
+                  path: Union[str, Path],
+                  hasher: Callable[[str], Checksums],
+                  stat: Optional[os.stat_result] = None) -> Checksums:
+        """
+        Args:
+            path (str, os.PathLike) : local file
+            hasher (Callable) : returns (crc32c, md5) of a file, both base64 encoded
+            stat (os.stat_result, None) : result of `os.stat(path)` if already known
+
+        Returns:
+            tuple : (crc32c, md5). crc32c is None when it can not be computed.
+        """
+        path = os.path.abspath(str(path))
+        stat = stat or os.stat(path)
+        row = self._conn.execute(
+            'SELECT crc32c, md5 FROM files WHERE path = ? AND mtime_ns = ? AND size = ?',
+            (path, stat.st_mtime_ns, stat.st_size)).fetchone()
+        if row is not None:
+            return row[0], row[1]
+
+        crc32c, md5 = hasher(path)
+        self.record(path, crc32c, md5, stat=stat)
+        return crc32c, md5
+
+    def record(self,
+               path: Union[str, Path],
+               crc32c: Optional[str],
+               md5: Optional[str],
+               stat: Optional[os.stat_result] = None) -> None:
+        """
+        Store checksums which are known without hashing, e.g. right after a download.
+
+        Args:
+            path (str, os.PathLike) : local file
+            crc32c (str, None) :
+            md5 (str, None) :
+            stat (os.stat_result, None) :
+        """
+        path = os.path.abspath(str(path))
+        stat = stat or os.stat(path)
+        self._conn.execute(
+            'INSERT OR REPLACE INTO files (path, mtime_ns, size, crc32c, md5) VALUES (?, ?, ?, ?, ?)',
+            (path, stat.st_mtime_ns, stat.st_size, crc32c, md5))
+
+    def forget(self, path: Union[str, Path]) -> None:
+        """
+        Args:
+            path (str, os.PathLike) : local file
+        """
+        self._conn.execute('DELETE FROM files WHERE path = ?', (os.path.abspath(str(path)),))
+
+    def commit(self) -> None:
+        self._conn.commit()
+
+    def close(self) -> None:
+        self._conn.commit()
+        self._conn.close()
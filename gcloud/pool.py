@@ -0,0 +1,241 @@
+import os
+import threading
+import time
+from collections import OrderedDict
+from pathlib import Path
+from typing import Any, Callable, Dict, Hashable, List, Optional, Tuple, Union
+
+from google.oauth2.service_account import Credentials
+
+PoolKey = Tuple[str, Optional[str], Optional[str]]
+CredentialPath = Union[str, os.PathLike]
+
+
+def _resolve(credential: CredentialPath) -> str:
+    """
+    Args:
+        credential (str, os.PathLike) : access key location
+
+    Returns:
+        str : absolute path of the key, so that equivalent paths share one entry
+    """
+    return str(Path(credential).expanduser().resolve())
+
+
+def _normalize_credential(credential: Optional[CredentialPath]) -> Optional[str]:
+    return None if credential is None else _resolve(credential)
+
+
+def _close_client(client: Any) -> None:
+    """
+    Release the transport held by a client. google-cloud clients do not share a
+    common close method, so the HTTP session and the gRPC channel are both tried.
+
+    Args:
+        client (Any) : client built by a pool factory
+    """
+    close = getattr(client, 'close', None)
+    if callable(close):
+        close()
+        return
+
+    http = getattr(client, '_http_internal', None) or getattr(client, '_http', None)
+    if http is not None and callable(getattr(http, 'close', None)):
+        http.close()
+
+    transport = getattr(client, 'transport', None)
+    channel = getattr(transport, 'channel', None)
+    if channel is not None and callable(getattr(channel, 'close', None)):
+        channel.close()
+
+
+class ClientPool:
+    def __init__(self, max_size: int = 32, idle_timeout: Optional[float] = 600.0) -> None:
+        """
+        Thread-safe pool of clients keyed by (service, project, credential path).
+
+        Wrappers keep the client they got for their whole life, and the pool can
+        not tell when they stop using it. Eviction therefore only drops a client
+        from the pool: it is never closed there, and its transport is released
+        by garbage collection once no wrapper refers to it. Only `close` and
+        `clear` close clients.
+
+        Args:
+            max_size (int) : maximum number of clients kept. the least recently requested one is dropped first.
+            idle_timeout (float, None) : seconds after which a client not requested again is dropped.
+                None disables it.
+        """
+        if max_size < 1:
+            raise ValueError('max_size must be positive')
+
+        self.max_size = max_size
+        self.idle_timeout = idle_timeout
+        self._lock = threading.RLock()
+        self._entries = OrderedDict()  # type: OrderedDict[Hashable, Tuple[Any, float]]
+        self._closed = False
+
+    def __len__(self) -> int:
+        with self._lock:
+            return len(self._entries)
+
+    def __enter__(self) -> 'ClientPool':
+        return self
+
+    def __exit__(self, *args: Any) -> None:
+        self.close()
+
+    def get(self,
+            service: str,
+            project: Optional[str],
+            credential: Optional[CredentialPath],
+            factory: Callable[[], Any]) -> Any:
+        """
+        Return the pooled client for the key, building it with `factory` on the first call.
+        The factory runs outside the pool lock, so clients of different keys are
+        built concurrently.
+
+        Args:
+            service (str) : service name, e.g. "storage"
+            project (str, None) : project_id on google cloud platform
+            credential (str, os.PathLike, None) : access key location
+            factory (Callable) : builds a new client when the key is not pooled
+
+        Returns:
+            Any : client
+        """
+        key = (service, project, _normalize_credential(credential))  # type: PoolKey
+        with self._lock:
+            if self._closed:
+                raise RuntimeError('ClientPool is already closed')
+            now = time.monotonic()
+            self._pop_idle(now)
+            if key in self._entries:
+                client, _ = self._entries.pop(key)
+                self._entries[key] = (client, now)
+                return client
+
+        built = factory()
+        with self._lock:
+            if self._closed:
+                _close_client(built)
+                raise RuntimeError('ClientPool is already closed')
+            if key in self._entries:
+                # another thread built the same client first; ours was never handed out.
+                client, _ = self._entries.pop(key)
+                discarded = built  # type: Any
+            else:
+                client, discarded = built, None
+            self._entries[key] = (client, time.monotonic())
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+
+        if discarded is not None:
+            _close_client(discarded)
+        return client
+
+    def evict_idle(self) -> int:
+        """
+        Drop clients which have not been requested for `idle_timeout` seconds.
+        Clients still held by a wrapper keep working.
+
+        Returns:
+            int : number of dropped clients
+        """
+        with self._lock:
+            return len(self._pop_idle(time.monotonic()))
+
+    def close(self) -> None:
+        """
+        Close every pooled client, including ones wrappers still hold.
+        The pool can not be used afterwards.
+        """
+        with self._lock:
+            clients = [client for client, _ in self._entries.values()]
+            self._entries.clear()
+            self._closed = True
+        for client in clients:
+            _close_client(client)
+
+    def clear(self) -> None:
+        """
+        Close every pooled client, including ones wrappers still hold, but keep
+        the pool usable.
+        """
+        with self._lock:
+            clients = [client for client, _ in self._entries.values()]
+            self._entries.clear()
+        for client in clients:
+            _close_client(client)
+
+    def _pop_idle(self, now: float) -> List[Any]:
+        if self.idle_timeout is None:
+            return []
+
+        evicted = []
+        # entries are kept in last-requested order, so the idle ones are at the head.
+        while self._entries:
+            key, (client, last_used) = next(iter(self._entries.items()))
+            if now - last_used < self.idle_timeout:
+                break
+            del self._entries[key]
+            evicted.append(client)
+        return evicted
+
+
+_default_pool = ClientPool()
+_credentials_lock = threading.Lock()
+_credentials = {}  # type: Dict[str, Credentials]
+
+
+def get_pool() -> ClientPool:
+    """
+    Returns:
+        ClientPool : process-wide pool used by every wrapper in this package
+    """
+    return _default_pool
+
+
+def get_credentials(credential: CredentialPath) -> Credentials:
+    """
+    Parse a service account key once per process.
+
+    Args:
+        credential (str, os.PathLike) : access key location
+
+    Returns:
+        Credentials
+    """
+    path = _resolve(credential)
+    with _credentials_lock:
+        if path not in _credentials:
+            _credentials[path] = Credentials.from_service_account_file(filename=path)
+        return _credentials[path]
+
+
+def get_client(service: str,
+               project: Optional[str],
+               credential: Optional[CredentialPath],
+               factory: Callable[[], Any]) -> Any:
+    """
+    Shortcut of `get_pool().get(...)`.
+
+    Args:
+        service (str) : service name
+        project (str, None) : project_id on google cloud platform
+        credential (str, os.PathLike, None) : access key location
+        factory (Callable) : builds a new client
+
+    Returns:
+        Any : client
+    """
+    return _default_pool.get(service, project, credential, factory)
+
+
+def close() -> None:
+    """
+    Close every client in the process-wide pool and parsed credentials.
+    The pool is reset, so later calls build fresh clients.
+    """
+    _default_pool.clear()
+    with _credentials_lock:
+        _credentials.clear()
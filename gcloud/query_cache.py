@@ -0,0 +1,187 @@
+import hashlib
+import json
+import os
+import re
+import sqlite3
+import threading
+import time
+from pathlib import Path
+from typing import Callable, Dict, Mapping, Optional, Union
+
+from google.cloud import bigquery
+
+try:
+    import pyarrow
+except ImportError:
+    pyarrow = None
+
+
+# string literals and quoted identifiers, whose whitespace is significant.
+_QUOTED = re.compile('({})'.format('|'.join([
+    r"'''.*?'''",
+    r'""".*?"""',
+    r"'(?:\\.|[^'\\])*'",
+    r'"(?:\\.|[^"\\])*"',
+    r'`(?:\\.|[^`\\])*`',
+])), re.S)
+
+
+def normalize_sql(sql: str) -> str:
+    """
+    Collapse whitespace outside of quoted literals and drop a trailing semicolon,
+    so that formatting differences do not produce separate cache entries.
+
+    Args:
+        sql (str) :
+
+    Returns:
+        str
+    """
+    parts = _QUOTED.split(sql)
+    # odd parts are the quoted literals matched by the group.
+    sql = ''.join(part if i % 2 else re.sub(r'\s+', ' ', part) for i, part in enumerate(parts))
+    return sql.strip().rstrip(';').strip()
+
+
+def cache_key(sql: str, job_config: Optional[bigquery.QueryJobConfig] = None) -> str:
+    """
+    Args:
+        sql (str) :
+        job_config (bigquery.QueryJobConfig, None) : every configured property is part of
+            the key, e.g. query parameters, default dataset and use_legacy_sql
+
+    Returns:
+        str : hex digest
+    """
+    config = job_config.to_api_repr() if job_config is not None else {}
+    payload = json.dumps([normalize_sql(sql), config], sort_keys=True, default=str)
+    return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+
+class QueryCache:
+    def __init__(self, directory: Union[str, Path], max_bytes: int = 1024 ** 3) -> None:
+        """
+        On-disk cache of query results stored as Arrow IPC files. Each entry keeps
+        the `modified` timestamp of every table the query referenced and is
+        dropped as soon as one of them changes. The least recently used entries
+        are evicted once the cache exceeds `max_bytes`.
+
+        Args:
+            directory (str, os.PathLike) : where results and the index are stored
+            max_bytes (int) : total size of stored results
+        """
+        if pyarrow is None:
+            raise ImportError('pyarrow is required for QueryCache')
+
+        self.directory = Path(directory)
+        self.directory.mkdir(parents=True, exist_ok=True)
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(str(self.directory / 'index.sqlite'), check_same_thread=False)
+        self._conn.execute(
+            'CREATE TABLE IF NOT EXISTS entries ('
+            'key TEXT PRIMARY KEY, size INTEGER, last_access REAL, tables TEXT)')
+        self._conn.commit()
+
+    @property
+    def hit_rate(self) -> float:
+        total = self.hits + self.misses
+        return self.hits / total if total else 0.0
+
+    def _path(self, key: str) -> Path:
+        return self.directory / '{}.arrow'.format(key)
+
+    def get(self, key: str, modified: Callable[[str], Optional[str]]) -> Optional['pyarrow.Table']:
+        """
+        Args:
+            key (str) : `cache_key` of the query
+            modified (Callable) : returns the current `modified` timestamp of a table id
+
+        Returns:
+            pyarrow.Table, None : None when missing or stale
+        """
+        if pyarrow is None:
+            raise ImportError('pyarrow is required for QueryCache')
+        with self._lock:
+            row = self._conn.execute('SELECT tables FROM entries WHERE key = ?', (key,)).fetchone()
+        if row is None:
+            self.misses += 1
+            return None
+
+        tables = json.loads(row[0])  # type: Dict[str, Optional[str]]
+        if any(modified(table_id) != stamp for table_id, stamp in tables.items()):
+            self.invalidate(key)
+            self.misses += 1
+            return None
+
+        try:
+            with pyarrow.memory_map(str(self._path(key))) as source:
+                result = pyarrow.ipc.open_file(source).read_all()
+        except (IOError, OSError, pyarrow.ArrowInvalid):
+            self.invalidate(key)
+            self.misses += 1
+            return None
+
+        with self._lock:
+            self._conn.execute('UPDATE entries SET last_access = ? WHERE key = ?', (time.time(), key))
+            self._conn.commit()
+        self.hits += 1
+        return result
+
+    def put(self, key: str, table: 'pyarrow.Table', tables: Mapping[str, Optional[str]]) -> None:
+        """
+        Args:
+            key (str) : `cache_key` of the query
+            table (pyarrow.Table) : query result
+            tables (dict) : referenced table id to its `modified` timestamp
+        """
+        if pyarrow is None:
+            raise ImportError('pyarrow is required for QueryCache')
+        path = self._path(key)
+        temporary = path.with_suffix('.tmp')
+        with pyarrow.OSFile(str(temporary), 'wb') as sink:
+            writer = pyarrow.ipc.new_file(sink, table.schema)
+            writer.write_table(table)
+            writer.close()
+        os.replace(str(temporary), str(path))
+
+        with self._lock:
+            self._conn.execute(
+                'INSERT OR REPLACE INTO entries (key, size, last_access, tables) VALUES (?, ?, ?, ?)',
+                (key, path.stat().st_size, time.time(), json.dumps(tables)))
+            self._conn.commit()
+        self._evict()
+
+    def invalidate(self, key: str) -> None:
+        """
+        Args:
+            key (str) : `cache_key` of the query
+        """
+        with self._lock:
+            self._conn.execute('DELETE FROM entries WHERE key = ?', (key,))
+            self._conn.commit()
+        try:
+            os.remove(str(self._path(key)))
+        except FileNotFoundError:
+            pass
+
+    def clear(self) -> None:
+        with self._lock:
+            keys = [k for k, in self._conn.execute('SELECT key FROM entries')]
+        for key in keys:
+            self.invalidate(key)
+
+    def _evict(self) -> None:
+        with self._lock:
+            rows = self._conn.execute('SELECT key, size FROM entries ORDER BY last_access DESC').fetchall()
+        total = 0
+        for key, size in rows:
+            total += size
+            if total > self.max_bytes:
+                self.invalidate(key)
+
+    def close(self) -> None:
+        with self._lock:
+            self._conn.close()
@@ -1,10 +1,44 @@
 import io
 import os
-from typing import Union
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor, FIRST_COMPLETED, wait
+from typing import Any, Dict, Iterable, Iterator, Mapping, Optional, Tuple, Union
 
 from google.api_core import exceptions
 from google.cloud.speech import SpeechClient, enums, types
-from google.oauth2.service_account import Credentials
+
+from gcloud import audio as audio_preprocessing
+from gcloud.cloud_storage import _get_client as _get_storage_client
+from gcloud.concurrency import Backoff
+from gcloud.pool import get_client, get_credentials
+
+# bytes per streaming request. the API accepts up to 25600 bytes of audio per message.
+STREAM_CHUNK_SIZE = 25600
+# audio longer than this can not be sent to synchronous recognition.
+SYNC_RECOGNITION_SECONDS = 60
+# bytes per sample of uncompressed encodings. compressed ones have no fixed ratio.
+_BYTES_PER_SAMPLE = {enums.RecognitionConfig.AudioEncoding.LINEAR16: 2,
+                     enums.RecognitionConfig.AudioEncoding.MULAW: 1}
+# bytes read from the start of a blob to find the frame count of WAV and FLAC headers.
+_HEADER_BYTES = 4096
+
+
+def _get_client(credential: Union[str, os.PathLike, None] = None) -> SpeechClient:
+    """
+
+    Args:
+        credential (str, os.PathLike, None) :
+
+    Returns:
+        SpeechClient : pooled client
+    """
+    def factory() -> SpeechClient:
+        if credential is None:
+            return SpeechClient()
+        return SpeechClient(credentials=get_credentials(credential))
+
+    return get_client('speech', None, credential, factory)
 
 
 def parse_response(response: types.RecognizeResponse) -> tuple:
@@ -25,6 +59,81 @@ def parse_response(response: types.RecognizeResponse) -> tuple:
     return transcript, confidence
 
 
+def estimate_duration(size: int,
+                      encoding: enums.RecognitionConfig.AudioEncoding,
+                      sampling_rate_hertz: int) -> Optional[float]:
+    """
+    Upper bound of the audio duration of a mono file of `size` bytes.
+
+    Args:
+        size (int) : bytes
+        encoding (enums.RecognitionConfig.AudioEncoding) :
+        sampling_rate_hertz (int) :
+
+    Returns:
+        float, None : seconds. None for compressed encodings, whose size says
+            nothing reliable about their duration.
+    """
+    if encoding in _BYTES_PER_SAMPLE:
+        return size / (_BYTES_PER_SAMPLE[encoding] * sampling_rate_hertz)
+    return None
+
+
+def _rechunk(blocks: Iterable[bytes], size: int) -> Iterator[bytes]:
+    buffer = bytearray()
+    for block in blocks:
+        buffer.extend(block)
+        while len(buffer) >= size:
+            yield bytes(buffer[:size])
+            del buffer[:size]
+    if buffer:
+        yield bytes(buffer)
+
+
+def prepare_audio(file: Union[str, os.PathLike],
+                  encoding: enums.RecognitionConfig.AudioEncoding,
+                  sampling_rate_hertz: int,
+                  chunk_size: int,
+                  preprocess: bool = True) -> Tuple[Any, int, Iterator[bytes]]:
+    """
+    Prepare a local file for recognition. With `preprocess`, the container header
+    decides the encoding and sample rate, and decodable audio is converted to
+    16 kHz mono LINEAR16, which is all recognition models use. Mono FLAC and Opus
+    at or below 16 kHz are sent as they are, since they are smaller than LINEAR16.
+    Converted audio is always headerless LINEAR16: FLAC would need an encoder
+    beyond numpy, and the API takes either without loss.
+
+    Args:
+        file (str, os.PathLike) :
+        encoding (enums.RecognitionConfig.AudioEncoding) : used when the header is unknown
+        sampling_rate_hertz (int) : used when the header is unknown
+        chunk_size (int) : bytes per yielded chunk
+        preprocess (bool) :
+
+    Returns:
+        tuple : (encoding, sample rate, chunks of audio content)
+
+    Raises:
+        ValueError : the file is WAV of a sample width the API can not read,
+            e.g. 8 or 24 bit PCM, and can not be converted in this environment
+    """
+    def raw() -> Iterator[bytes]:
+        with io.open(file, 'rb', buffering=chunk_size) as f:
+            yield from iter(lambda: f.read(chunk_size), b'')
+
+    info = audio_preprocessing.sniff(file) if preprocess else None
+    if info is None:
+        return encoding, sampling_rate_hertz, raw()
+    if audio_preprocessing.can_convert(info) and not audio_preprocessing.is_compact(info):
+        rate = min(audio_preprocessing.TARGET_SAMPLE_RATE, info.sample_rate)
+        blocks = audio_preprocessing.to_linear16(file, info, sample_rate=rate)
+        return enums.RecognitionConfig.AudioEncoding.LINEAR16, rate, _rechunk(blocks, chunk_size)
+    if info.encoding == enums.RecognitionConfig.AudioEncoding.ENCODING_UNSPECIFIED:
+        raise ValueError('{} bit PCM WAV has to be converted to LINEAR16, which requires numpy '
+                         '(and soundfile for 24 bit)'.format(8 * (info.sample_width or 0)))
+    return info.encoding, info.sample_rate, raw()
+
+
 def recognize_audio_from_uri(uri: str,
                              credential: Union[str,
                                                os.PathLike,
@@ -45,11 +154,7 @@ def recognize_audio_from_uri(uri: str,
     Returns:
         types.RecognizeResponse
     """
-    if credential is None:
-        client = SpeechClient()
-    else:
-        credentials = Credentials.from_service_account_file(filename=credential)
-        client = SpeechClient(credentials=credentials)
+    client = _get_client(credential)
 
     config = types.RecognitionConfig(
         encoding=encoding,
@@ -88,16 +193,12 @@ def recognize_audio_from_file(file: Union[str, os.PathLike],
     Returns:
         types.RecognizeResponse
     """
-    if credential is None:
-        client = SpeechClient()
-    else:
-        credentials = Credentials.from_service_account_file(filename=credential)
-        client = SpeechClient(credentials=credentials)
+    client = _get_client(credential)
 
     config = types.RecognitionConfig(
         encoding=encoding,
         language_code=language_code,
-        sampling_rate_hertz=sampling_rate_hertz
+        sample_rate_hertz=sampling_rate_hertz
     )
     with io.open(file, 'rb') as audio:
         content = audio.read()
@@ -113,11 +214,8 @@ class SpeechToText:
         Args:
             credential (str, os.PathLike, None) :
         """
-        if credential is None:
-            self.client = SpeechClient()
-        else:
-            credentials = Credentials.from_service_account_file(filename=credential)
-            self.client = SpeechClient(credentials=credentials)
+        self.credential = credential
+        self.client = _get_client(credential)
 
     def recognize_from_uri(
             self,
@@ -139,7 +237,7 @@ class SpeechToText:
         config = types.RecognitionConfig(
             encoding=encoding,
             language_code=language_code,
-            sampling_rate_hertz=sampling_rate_hertz)
+            sample_rate_hertz=sampling_rate_hertz)
         audio = types.RecognitionAudio(uri=uri)
 
         return self.client.recognize(config, audio)
@@ -148,7 +246,8 @@ class SpeechToText:
                             file: Union[str, os.PathLike],
                             encoding: enums.RecognitionConfig.AudioEncoding = enums.RecognitionConfig.AudioEncoding.FLAC,
                             language_code: str = 'en-US',
-                            sampling_rate_hertz: int = 44100) -> types.RecognizeResponse:
+                            sampling_rate_hertz: int = 44100,
+                            preprocess: bool = False) -> types.RecognizeResponse:
         """
 
         Args:
@@ -156,15 +255,195 @@ class SpeechToText:
             encoding (enums.RecognitionConfig.AudioEncoding) :
             language_code (str) :
             sampling_rate_hertz (int) :
+            preprocess (bool) : detect the format and send 16 kHz mono LINEAR16. see `prepare_audio`.
 
         Returns:
             types.RecognizeResponse
         """
+        if preprocess:
+            encoding, sampling_rate_hertz, chunks = prepare_audio(
+                file, encoding, sampling_rate_hertz, chunk_size=1024 * 1024)
+            content = b''.join(chunks)
+        else:
+            with io.open(file, 'rb') as audio:
+                content = audio.read()
+
         config = types.RecognitionConfig(
             encoding=encoding,
             language_code=language_code,
-            sampling_rate_hertz=sampling_rate_hertz)
-        with io.open(file, 'rb') as audio:
-            content = audio.read()
+            sample_rate_hertz=sampling_rate_hertz)
         audio = types.RecognitionAudio(content=content)
         return self.client.recognize(config, audio)
+
+    def stream_file(self,
+                    file: Union[str, os.PathLike],
+                    chunk_size: int = STREAM_CHUNK_SIZE,
+                    encoding: enums.RecognitionConfig.AudioEncoding = enums.RecognitionConfig.AudioEncoding.FLAC,
+                    language_code: str = 'en-US',
+                    sampling_rate_hertz: int = 44100,
+                    interim_results: bool = True,
+                    preprocess: bool = False) -> Iterator[types.StreamingRecognitionResult]:
+        """
+        Recognize a local file with streaming recognition. The file is read in
+        `chunk_size` pieces while it is sent, so memory stays flat and results
+        arrive before the whole file is uploaded. A single stream is limited to
+        about five minutes of audio by the API.
+
+        Args:
+            file (str, os.PathLike) :
+            chunk_size (int) : bytes per request
+            encoding (enums.RecognitionConfig.AudioEncoding) :
+            language_code (str) :
+            sampling_rate_hertz (int) :
+            interim_results (bool) : also yield results which are not final yet
+            preprocess (bool) : detect the format and send 16 kHz mono LINEAR16. see `prepare_audio`.
+
+        Returns:
+            Iterator[types.StreamingRecognitionResult] : check `is_final` to tell them apart
+        """
+        encoding, sampling_rate_hertz, chunks = prepare_audio(
+            file, encoding, sampling_rate_hertz, chunk_size=chunk_size, preprocess=preprocess)
+        config = types.StreamingRecognitionConfig(
+            config=types.RecognitionConfig(
+                encoding=encoding,
+                language_code=language_code,
+                sample_rate_hertz=sampling_rate_hertz),
+            interim_results=interim_results)
+
+        requests = (types.StreamingRecognizeRequest(audio_content=chunk) for chunk in chunks)
+        for response in self.client.streaming_recognize(config, requests):
+            yield from response.results
+
+    def _durations(self, uris: Iterable[str], max_workers: int,
+                   encoding: enums.RecognitionConfig.AudioEncoding,
+                   sampling_rate_hertz: int) -> Dict[str, Optional[float]]:
+        """
+        Read durations from blob metadata ("duration" in seconds), from the frame
+        count in WAV and FLAC headers, or estimate them from the sizes of
+        uncompressed encodings.
+
+        Returns:
+            dict : uri to seconds. None when the object can not be read or the duration is unknown.
+        """
+        storage = _get_storage_client(project=None, credential=self.credential)
+
+        def duration(uri: str) -> Optional[float]:
+            bucket, _, name = uri[len('gs://'):].partition('/')
+            blob = storage.bucket(bucket_name=bucket).get_blob(blob_name=name)
+            if blob is None:
+                return None
+            if blob.metadata and 'duration' in blob.metadata:
+                return float(blob.metadata['duration'])
+            if encoding == enums.RecognitionConfig.AudioEncoding.FLAC or encoding in _BYTES_PER_SAMPLE:
+                head = blob.download_as_string(end=min(blob.size, _HEADER_BYTES) - 1) if blob.size else b''
+                seconds = audio_preprocessing.header_duration(head, blob.size)
+                if seconds is not None:
+                    return seconds
+            return estimate_duration(blob.size, encoding, sampling_rate_hertz)
+
+        uris = list(uris)
+        with ThreadPoolExecutor(max_workers=max_workers) as executor:
+            return dict(zip(uris, executor.map(duration, uris)))
+
+    def recognize_many(self,
+                       uris: Iterable[str],
+                       encoding: enums.RecognitionConfig.AudioEncoding = enums.RecognitionConfig.AudioEncoding.FLAC,
+                       language_code: str = 'en-US',
+                       sampling_rate_hertz: int = 44100,
+                       durations: Optional[Mapping[str, float]] = None,
+                       max_workers: int = 8,
+                       max_in_flight: int = 100,
+                       backoff: Optional[Backoff] = None,
+                       return_exceptions: bool = False) -> Iterator[Tuple[str, Any]]:
+        """
+        Recognize many Cloud Storage files concurrently. Each file is sent to
+        synchronous or long-running recognition according to its duration, known
+        up front from `durations`, blob metadata, the WAV or FLAC header, or the
+        size of uncompressed audio. Files of unknown duration, and files which
+        synchronous recognition rejects with InvalidArgument, go to long-running
+        recognition. Up to `max_in_flight` long-running operations run at once and
+        are polled together with one shared backoff, which resets whenever an
+        operation completes.
+
+        Args:
+            uris (Iterable[str]) : gs:// uris
+            encoding (enums.RecognitionConfig.AudioEncoding) :
+            language_code (str) :
+            sampling_rate_hertz (int) :
+            durations (Mapping, None) : known durations in seconds by uri
+            max_workers (int) : number of concurrent synchronous requests
+            max_in_flight (int) : number of concurrent long-running operations
+            backoff (Backoff, None) : delay between polling rounds
+            return_exceptions (bool) : yield the exception of a failed file instead of raising it
+
+        Returns:
+            Iterator[Tuple[str, Any]] : (uri, parse_response result) in completion order
+        """
+        config = types.RecognitionConfig(
+            encoding=encoding,
+            language_code=language_code,
+            sample_rate_hertz=sampling_rate_hertz)
+        backoff = backoff or Backoff(initial=1.0, maximum=30.0, multiplier=1.5)
+
+        uris = list(uris)
+        known = dict(durations or {})  # type: Dict[str, Optional[float]]
+        unknown = [uri for uri in uris if uri not in known]
+        if unknown:
+            known.update(self._durations(unknown, max_workers, encoding, sampling_rate_hertz))
+
+        def failed(uri: str, error: BaseException) -> Tuple[str, Any]:
+            if return_exceptions:
+                return uri, error
+            raise error
+
+        waiting = deque()  # type: deque
+        with ThreadPoolExecutor(max_workers=max_workers) as executor:
+            sync = {}
+            for uri in uris:
+                duration = known.get(uri)
+                if duration is not None and duration <= SYNC_RECOGNITION_SECONDS:
+                    sync[executor.submit(self.client.recognize, config,
+                                         types.RecognitionAudio(uri=uri))] = uri
+                else:
+                    waiting.append(uri)
+
+            operations = {}  # type: Dict[str, Any]
+            idle = 0
+            while sync or operations or waiting:
+                while waiting and len(operations) < max_in_flight:
+                    uri = waiting.popleft()
+                    try:
+                        operations[uri] = self.client.long_running_recognize(
+                            config, types.RecognitionAudio(uri=uri))
+                    except Exception as e:
+                        yield failed(uri, e)
+
+                completed = False
+                for future in [f for f in sync if f.done()]:
+                    uri = sync.pop(future)
+                    completed = True
+                    error = future.exception()
+                    if isinstance(error, exceptions.InvalidArgument):
+                        # the duration was estimated or its metadata was wrong.
+                        waiting.append(uri)
+                    elif error is not None:
+                        yield failed(uri, error)
+                    else:
+                        yield uri, parse_response(future.result())
+
+                for uri, operation in list(operations.items()):
+                    if not operation.done():
+                        continue
+                    del operations[uri]
+                    completed = True
+                    error = operation.exception()
+                    yield failed(uri, error) if error is not None else (uri, parse_response(operation.result()))
+
+                if not (sync or operations or waiting):
+                    break
+                idle = 0 if completed else idle + 1
+                # synchronous results wake the loop up early; operations wait for the next round.
+                if sync:
+                    wait(sync, timeout=backoff.delay(idle), return_when=FIRST_COMPLETED)
+                else:
+                    time.sleep(backoff.delay(idle))
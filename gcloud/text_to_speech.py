@@ -1,44 +1,570 @@
+import hashlib
+import io
+import json
+import os
+import re
+import shutil
+import struct
+import tempfile
+from collections import deque
+from concurrent.futures import Future, ThreadPoolExecutor
 from pathlib import Path
-from typing import Optional, NoReturn, Union
+from typing import Any, Callable, Iterable, Iterator, List, Optional, Set, Tuple, Union
 
 from google.cloud.texttospeech import TextToSpeechClient, enums, types
 
+from gcloud.cache import Cache
+from gcloud.cloud_language import split_text
+from gcloud.cloud_storage import CloudStorage, TransferSummary, run_transfers
+from gcloud.concurrency import Backoff, TokenBucket, call_with_retry
+from gcloud.pool import get_client
 
-class TextToSpeech:
-    def __init__(self, credential: Optional[Union[str, Path]] = None) -> NoReturn:
-        if credential is None:
-            self.client = TextToSpeechClient()
+# request size limit of one SynthesisInput.
+SYNTHESIS_CHUNK_BYTES = 5000
+_SPEAK = re.compile(r'^\s*(<speak\b[^>]*>)(.*)</speak>\s*$', re.S)
+_TAG = re.compile(r'<(/?)[^>]*?(/?)>')
+_SENTENCE_END = re.compile(r'[.!?\u3002\uff01\uff1f]+\s+')
+# file extension and content type of each output encoding.
+_EXTENSIONS = {
+    enums.AudioEncoding.LINEAR16: ('.wav', 'audio/wav'),
+    enums.AudioEncoding.MP3: ('.mp3', 'audio/mpeg'),
+    enums.AudioEncoding.OGG_OPUS: ('.ogg', 'audio/ogg'),
+}
+# header sizes are unknown while streaming; players read to the end of the file.
+_WAV_UNKNOWN_SIZE = 0xFFFFFFFF
+
+
+def _ssml_gender(gender: int) -> int:
+    if gender == 0:
+        return enums.SsmlVoiceGender.FEMALE
+    elif gender == 1:
+        return enums.SsmlVoiceGender.MALE
+    return enums.SsmlVoiceGender.NEUTRAL
+
+
+def synthesis_key(text: str, language: str, gender: int, encoding: int, ssml: bool = False) -> str:
+    """
+    Content address of a synthesis request.
+
+    Args:
+        text (str) :
+        language (str) :
+        gender (int) : same convention as `TextToSpeech.synthesize`
+        encoding (int) : enums.AudioEncoding
+        ssml (bool) : `text` is SSML
+
+    Returns:
+        str : hex digest
+    """
+    fields = [text, language, int(_ssml_gender(gender)), int(encoding)]
+    if ssml:
+        fields.append('ssml')
+    payload = json.dumps(fields)
+    return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+
+def split_ssml(ssml: str, max_bytes: int = SYNTHESIS_CHUNK_BYTES) -> List[str]:
+    """
+    Split an SSML document into `<speak>` documents of at most `max_bytes`
+    UTF-8 bytes. Cuts are made only outside elements, after a closing or empty
+    tag or a sentence end, so every chunk is well formed. Plain text between
+    tags that is over the budget is cut with `split_text`, and an element that
+    is over the budget is split inside and its tags are repeated around each part.
+
+    Args:
+        ssml (str) : "<speak>...</speak>"
+        max_bytes (int) : UTF-8 bytes per chunk, including the speak element
+
+    Returns:
+        list : SSML chunks in order
+    """
+    match = _SPEAK.match(ssml)
+    if match is None:
+        raise ValueError('SSML must be a single <speak> element')
+    opening, body = match.groups()
+    budget = max_bytes - len(opening.encode('utf-8')) - len('</speak>')
+    return [opening + group + '</speak>' for group in _pack_ssml(_ssml_pieces(body, budget), budget)]
+
+
+def _ssml_pieces(body: str, budget: int) -> List[str]:
+    """
+    Cut SSML content at the boundaries described in `split_ssml` into pieces of
+    at most `budget` UTF-8 bytes.
+    """
+    cuts = [0]
+    depth, position = 0, 0
+    for tag in _TAG.finditer(body):
+        if depth == 0:
+            cuts.extend(m.end() for m in _SENTENCE_END.finditer(body, position, tag.start()))
+        closing, empty = tag.groups()
+        if closing:
+            depth -= 1
+        elif not empty and not tag.group().startswith(('<!', '<?')):
+            depth += 1
+        if depth == 0:
+            cuts.append(tag.end())
+        position = tag.end()
+    if depth == 0:
+        cuts.extend(m.end() for m in _SENTENCE_END.finditer(body, position))
+    cuts.append(len(body))
+
+    pieces = []  # type: List[str]
+    for start, end in zip(cuts, cuts[1:]):
+        piece = body[start:end]
+        if len(piece.encode('utf-8')) <= budget:
+            pieces.append(piece)
+        elif '<' not in piece:
+            pieces.extend(chunk for _, chunk in split_text(piece, max_bytes=budget))
+        else:
+            pieces.extend(_split_element(piece, budget))
+    return pieces
+
+
+def _split_element(piece: str, budget: int) -> List[str]:
+    """
+    Split a piece made of optional text and one element by splitting the text and
+    the content of the element, wrapping every part of the content in the tags
+    of the element.
+    """
+    tags = list(_TAG.finditer(piece))
+    if len(tags) < 2:
+        raise ValueError('an SSML tag is longer than {} bytes: {!r}...'.format(budget, piece[:80]))
+    first, last = tags[0], tags[-1]
+    if first.group(1) or first.group(2) or first.group().startswith(('<!', '<?')) or not last.group(1):
+        raise ValueError('an SSML tag is longer than {} bytes: {!r}...'.format(budget, piece[:80]))
+
+    start_tag, end_tag = first.group(), last.group()
+    inner_budget = budget - len(start_tag.encode('utf-8')) - len(end_tag.encode('utf-8'))
+    if inner_budget <= 0:
+        raise ValueError('the tags of an SSML element are longer than {} bytes: {!r}'.format(budget, start_tag))
+
+    pieces = _ssml_pieces(piece[:first.start()], budget) if first.start() else []
+    inner = _ssml_pieces(piece[first.end():last.start()], inner_budget)
+    pieces.extend(start_tag + group + end_tag for group in _pack_ssml(inner, inner_budget))
+    return pieces
+
+
+def _pack_ssml(pieces: List[str], budget: int) -> List[str]:
+    """
+    Join consecutive pieces into groups of at most `budget` UTF-8 bytes. A
+    whitespace-only last group is dropped.
+    """
+    groups, current, current_bytes = [], [], 0  # type: List[str], List[str], int
+    for piece in pieces:
+        size = len(piece.encode('utf-8'))
+        if current and current_bytes + size > budget:
+            groups.append(''.join(current))
+            current, current_bytes = [], 0
+        current.append(piece)
+        current_bytes += size
+    if current and ''.join(current).strip():
+        groups.append(''.join(current))
+    return groups
+
+
+def _wav_parts(content: bytes) -> Tuple[bytes, bytes]:
+    """
+    Returns:
+        tuple : body of the fmt chunk, samples of the data chunk
+    """
+    if content[:4] != b'RIFF' or content[8:12] != b'WAVE':
+        raise ValueError('LINEAR16 response is not a WAV file')
+    fmt, offset = None, 12
+    while offset + 8 <= len(content):
+        chunk_id, size = struct.unpack('<4sI', content[offset:offset + 8])
+        body = offset + 8
+        if chunk_id == b'fmt ':
+            fmt = content[body:body + size]
+        elif chunk_id == b'data':
+            if fmt is None:
+                raise ValueError('WAV data chunk before fmt chunk')
+            end = len(content) if size == _WAV_UNKNOWN_SIZE else body + size
+            return fmt, content[body:end]
+        offset = body + size + (size & 1)
+    raise ValueError('WAV file has no data chunk')
+
+
+def _wav_header(fmt: bytes, data_size: int = _WAV_UNKNOWN_SIZE) -> bytes:
+    riff_size = _WAV_UNKNOWN_SIZE if data_size == _WAV_UNKNOWN_SIZE else 4 + 8 + len(fmt) + 8 + data_size
+    return (b'RIFF' + struct.pack('<I', riff_size) + b'WAVE'
+            + b'fmt ' + struct.pack('<I', len(fmt)) + fmt
+            + b'data' + struct.pack('<I', data_size))
+
+
+def _strip_id3(content: bytes) -> bytes:
+    if content[:3] != b'ID3':
+        return content
+    size = 10 + sum((b & 0x7f) << (7 * (3 - i)) for i, b in enumerate(content[6:10]))
+    if content[5] & 0x10:
+        size += 10
+    return content[size:]
+
+
+def _ogg_crc_table() -> List[int]:
+    table = []
+    for i in range(256):
+        r = i << 24
+        for _ in range(8):
+            r = ((r << 1) ^ 0x04c11db7) if r & 0x80000000 else r << 1
+        table.append(r & 0xffffffff)
+    return table
+
+
+_OGG_CRC = _ogg_crc_table()
+
+
+def _ogg_crc(data: Union[bytes, bytearray]) -> int:
+    crc = 0
+    for b in data:
+        crc = ((crc << 8) & 0xffffffff) ^ _OGG_CRC[((crc >> 24) ^ b) & 0xff]
+    return crc
+
+
+class _OggJoiner:
+    """
+    Rewrite consecutive Ogg Opus files into one logical stream: the headers of
+    the first file are kept, later headers are dropped, and the pages of later
+    files get the first serial number, continued sequence numbers, shifted
+    granule positions and new checksums.
+    """
+
+    def __init__(self) -> None:
+        self.serial = None  # type: Optional[int]
+        self.sequence = 0
+        self.granule_offset = 0
+
+    def feed(self, content: bytes, last: bool) -> bytes:
+        pages = []
+        offset = 0
+        while offset < len(content):
+            if content[offset:offset + 4] != b'OggS':
+                raise ValueError('invalid Ogg page at byte {}'.format(offset))
+            flags, granule, serial = struct.unpack('<BqI', content[offset + 5:offset + 18])
+            segments = content[offset + 26]
+            table = content[offset + 27:offset + 27 + segments]
+            end = offset + 27 + segments + sum(table)
+            pages.append((flags, granule, serial, table, content[offset + 27 + segments:end]))
+            offset = end
+
+        first = self.serial is None
+        if first:
+            self.serial = pages[0][2]
         else:
-            self.client = TextToSpeechClient.from_service_account_file(filename=credential)
+            # header pages have granule position 0.
+            while pages and pages[0][1] == 0:
+                pages.pop(0)
+
+        out = io.BytesIO()
+        stream_granule = 0
+        for i, (flags, granule, _, table, body) in enumerate(pages):
+            if not first:
+                flags &= ~0x02
+            if not (last and i == len(pages) - 1):
+                flags &= ~0x04
+            if granule != -1:
+                stream_granule = granule
+                granule += self.granule_offset
+            header = b'OggS\x00' + struct.pack('<BqIII', flags, granule, self.serial, self.sequence, 0) \
+                + bytes([len(table)]) + table
+            page = bytearray(header + body)
+            page[22:26] = struct.pack('<I', _ogg_crc(page))
+            out.write(page)
+            self.sequence += 1
+        self.granule_offset += stream_granule
+        return out.getvalue()
+
+
+class _AudioJoiner:
+    """
+    Join synthesized chunks of one encoding into a single stream.
+    """
+
+    def __init__(self, encoding: int) -> None:
+        self.encoding = encoding
+        self.ogg = _OggJoiner() if encoding == enums.AudioEncoding.OGG_OPUS else None
+        self.started = False
+
+    def feed(self, content: bytes, last: bool) -> bytes:
+        first = not self.started
+        self.started = True
+        if self.encoding == enums.AudioEncoding.LINEAR16:
+            fmt, data = _wav_parts(content)
+            if first:
+                return _wav_header(fmt) + data
+            return data
+        if self.ogg is not None:
+            return self.ogg.feed(content, last)
+        return content if first else _strip_id3(content)
+
+
+class TextToSpeech:
+    def __init__(self,
+                 credential: Optional[Union[str, Path]] = None,
+                 cache: Optional[Cache] = None) -> None:
+        """
+        Args:
+            credential (str, os.PathLike, None) :
+            cache (Cache, None) : stores audio bytes by `synthesis_key`,
+                e.g. TieredCache(MemoryCache(), DirectoryCache("tts-cache", max_bytes=2 ** 30))
+        """
+        def factory() -> TextToSpeechClient:
+            if credential is None:
+                return TextToSpeechClient()
+            return TextToSpeechClient.from_service_account_file(filename=credential)
+
+        self.client = get_client('texttospeech', None, credential, factory)
+        self.cache = cache
 
     def synthesize(self,
                    text: str,
                    language: str = 'en-US',
                    gender: int = 1,
-                   encoding: enums.AudioEncoding = enums.AudioEncoding.MP3) -> types.SynthesizeSpeechResponse:
+                   encoding: enums.AudioEncoding = enums.AudioEncoding.MP3,
+                   ssml: bool = False) -> types.SynthesizeSpeechResponse:
         """
+        Responses are looked up in and stored to `cache` when one is set.
+
         Args:
             text:
             language:
             gender:
             encoding:
+            ssml: `text` is an SSML document
         Returns:
         """
-        if gender == 0:
-            ssml_gender = enums.SsmlVoiceGender.FEMALE
-        elif gender == 1:
-            ssml_gender = enums.SsmlVoiceGender.MALE
-        else:
-            ssml_gender = enums.SsmlVoiceGender.NEUTRAL
+        key = synthesis_key(text, language, gender, encoding, ssml=ssml)
+        if self.cache is not None:
+            cached = self.cache.get(key)
+            if cached is not None:
+                return types.SynthesizeSpeechResponse(audio_content=cached)
 
-        synthesis_data = types.SynthesisInput(text=text)
-        voice = types.VoiceSelectionParams(language_code=language, ssml_gender=ssml_gender)
+        synthesis_data = types.SynthesisInput(ssml=text) if ssml else types.SynthesisInput(text=text)
+        voice = types.VoiceSelectionParams(language_code=language, ssml_gender=_ssml_gender(gender))
         audio_config = types.AudioConfig(audio_encoding=encoding)
 
-        return self.client.synthesize_speech(input_=synthesis_data, voice=voice, audio_config=audio_config)
+        response = self.client.synthesize_speech(input_=synthesis_data, voice=voice, audio_config=audio_config)
+        if self.cache is not None:
+            self.cache.put(key, response.audio_content)
+        return response
+
+    def synthesize_to_file(self,
+                           text: str,
+                           filename: Union[str, Path],
+                           language: str = 'en-US',
+                           gender: int = 1,
+                           encoding: enums.AudioEncoding = enums.AudioEncoding.MP3,
+                           link: bool = True) -> None:
+        """
+        Synthesize into `filename`. When `cache` keeps the audio in a file
+        (DirectoryCache), that file is hard-linked or copied instead of rewritten.
+
+        Args:
+            text (str) :
+            filename (str, os.PathLike) :
+            language (str) :
+            gender (int) :
+            encoding (enums.AudioEncoding) :
+            link (bool) : hard-link cached files. A linked file shares its data
+                with the cache, so do not modify it in place.
+        """
+        key = synthesis_key(text, language, gender, encoding)
+        cached = self.cache.path(key) if self.cache is not None else None
+        if cached is None:
+            response = self.synthesize(text, language=language, gender=gender, encoding=encoding)
+            # a disk tier now holds the audio.
+            cached = self.cache.path(key) if self.cache is not None else None
+        if cached is not None:
+            self.save_file(cached, filename, link=link)
+            return
+        self.save(response, filename)
+
+    def synthesize_long(self,
+                        text: str,
+                        language: str = 'en-US',
+                        gender: int = 1,
+                        encoding: enums.AudioEncoding = enums.AudioEncoding.MP3,
+                        ssml: Optional[bool] = None,
+                        max_bytes: int = SYNTHESIS_CHUNK_BYTES,
+                        max_workers: int = 4) -> Iterator[bytes]:
+        """
+        Synthesize text of any length as one audio stream. The text is split at
+        sentence or SSML boundaries under `max_bytes`, chunks are synthesized
+        concurrently, and audio is yielded in order as soon as each leading
+        chunk is ready. LINEAR16 is yielded as one WAV with an open-ended header,
+        OGG_OPUS as one Ogg stream, and MP3 as concatenated frames.
+
+        Args:
+            text (str) : plain text or a "<speak>" document
+            language (str) :
+            gender (int) :
+            encoding (enums.AudioEncoding) :
+            ssml (bool, None) : None detects a leading "<speak>"
+            max_bytes (int) : UTF-8 bytes per request
+            max_workers (int) : number of concurrent requests
+
+        Returns:
+            Iterator[bytes] : audio, to be written out in order
+        """
+        if ssml is None:
+            ssml = text.lstrip().startswith('<speak')
+        if ssml:
+            chunks = split_ssml(text, max_bytes=max_bytes)
+        else:
+            chunks = [chunk for _, chunk in split_text(text, max_bytes=max_bytes) if chunk.strip()]
+        joiner = _AudioJoiner(encoding)
+
+        def submit(chunk: str) -> Future:
+            return executor.submit(self.synthesize, chunk, language, gender, encoding, ssml)
+
+        with ThreadPoolExecutor(max_workers=max_workers) as executor:
+            pending = deque(submit(chunk) for chunk in chunks[:max_workers * 2])
+            submitted = len(pending)
+            try:
+                for index in range(len(chunks)):
+                    response = pending.popleft().result()
+                    if submitted < len(chunks):
+                        pending.append(submit(chunks[submitted]))
+                        submitted += 1
+                    yield joiner.feed(response.audio_content, last=index == len(chunks) - 1)
+            finally:
+                for future in pending:
+                    future.cancel()
+
+    def synthesize_long_to_file(self,
+                                text: str,
+                                filename: Union[str, Path],
+                                language: str = 'en-US',
+                                gender: int = 1,
+                                encoding: enums.AudioEncoding = enums.AudioEncoding.MP3,
+                                **kwargs: Any) -> int:
+        """
+        Write `synthesize_long` to a file as it arrives. WAV sizes are filled
+        in at the end.
+
+        Args:
+            text (str) :
+            filename (str, os.PathLike) :
+            language (str) :
+            gender (int) :
+            encoding (enums.AudioEncoding) :
+            **kwargs : synthesize_long arguments
+
+        Returns:
+            int : bytes written
+        """
+        written = 0
+        with open(filename, 'w+b') as audio_file:
+            for piece in self.synthesize_long(text, language=language, gender=gender, encoding=encoding, **kwargs):
+                audio_file.write(piece)
+                written += len(piece)
+            if encoding == enums.AudioEncoding.LINEAR16 and written:
+                audio_file.seek(12)
+                fmt_size = struct.unpack('<4sI', audio_file.read(8))[1]
+                data_size = written - (12 + 8 + fmt_size + 8)
+                audio_file.seek(4)
+                audio_file.write(struct.pack('<I', written - 8))
+                audio_file.seek(12 + 8 + fmt_size + 4)
+                audio_file.write(struct.pack('<I', data_size))
+        return written
+
+    def synthesize_many(self,
+                        items: Iterable[Tuple[str, str]],
+                        out_dir: Optional[Union[str, Path]] = None,
+                        bucket: Optional[CloudStorage] = None,
+                        prefix: str = '',
+                        language: str = 'en-US',
+                        gender: int = 1,
+                        encoding: enums.AudioEncoding = enums.AudioEncoding.MP3,
+                        max_workers: int = 8,
+                        requests_per_minute: float = 1000,
+                        max_retries: int = 3,
+                        overwrite: bool = False) -> TransferSummary:
+        """
+        Synthesize many texts on a bounded thread pool and write each result to
+        `out_dir/<name><ext>` or upload it to `bucket` as `<prefix><name><ext>`
+        straight from memory. Outputs that already exist are skipped, so an
+        interrupted run can be resumed by calling this again; local files are
+        renamed into place only once complete.
+
+        Args:
+            items (Iterable) : pairs of (name, text). consumed lazily.
+            out_dir (str, os.PathLike, None) : local destination
+            bucket (CloudStorage, None) : destination bucket, used when `out_dir` is None
+            prefix (str) : blob name prefix
+            language (str) :
+            gender (int) :
+            encoding (enums.AudioEncoding) : also selects the file extension
+            max_workers (int) : number of concurrent requests
+            requests_per_minute (float) : quota to stay under
+            max_retries (int) : retries of a request failing transiently
+            overwrite (bool) : synthesize items whose output exists
+
+        Returns:
+            TransferSummary : names of written items, failures keyed by name,
+                bytes of audio written, and names skipped because their output exists
+        """
+        if (out_dir is None) == (bucket is None):
+            raise ValueError('give exactly one of out_dir and bucket')
+        extension, content_type = _EXTENSIONS[encoding]
+        limiter = TokenBucket(rate=requests_per_minute / 60, capacity=max_workers)
+        backoff = Backoff(initial=1.0, maximum=30.0)
+
+        def synthesize(text: str) -> bytes:
+            response = call_with_retry(
+                limiter, backoff,
+                lambda: self.synthesize(text, language=language, gender=gender, encoding=encoding),
+                max_retries)
+            return response.audio_content
+
+        if out_dir is not None:
+            root = Path(out_dir)
+
+            def task(name: str, text: str) -> Callable[[], int]:
+                def write() -> int:
+                    target = root / (name + extension)
+                    target.parent.mkdir(parents=True, exist_ok=True)
+                    audio = synthesize(text)
+                    fd, tmp = tempfile.mkstemp(dir=str(target.parent), suffix='.tmp')
+                    with os.fdopen(fd, 'wb') as f:
+                        f.write(audio)
+                    os.replace(tmp, str(target))
+                    return len(audio)
+                return write
+
+            def exists(name: str) -> bool:
+                return (root / (name + extension)).exists()
+        elif bucket is not None:
+            storage = bucket
+            storage.ensure_http_pool(max_workers)
+            # one listing instead of a request per item.
+            existing = set()  # type: Set[str]
+            if not overwrite:
+                existing = {b.name for b in storage.iter_blobs(prefix=prefix, fields=('name',))}
+
+            def task(name: str, text: str) -> Callable[[], int]:
+                def upload() -> int:
+                    audio = synthesize(text)
+                    storage.upload_from_string(audio, prefix + name + extension, content_type=content_type)
+                    return len(audio)
+                return upload
+
+            def exists(name: str) -> bool:
+                return prefix + name + extension in existing
+
+        skipped = []  # type: List[str]
+
+        def tasks() -> Iterator[Tuple[str, Callable[[], int]]]:
+            for name, text in items:
+                if not overwrite and exists(name):
+                    skipped.append(name)
+                else:
+                    yield name, task(name, text)
+
+        summary = run_transfers(tasks(), max_workers=max_workers)
+        return summary._replace(skipped=skipped)
 
     @staticmethod
-    def save(response: types.SynthesizeSpeechResponse, filename: Union[str, Path]) -> NoReturn:
+    def save(response: types.SynthesizeSpeechResponse, filename: Union[str, Path]) -> None:
         """
         Args:
             response:
@@ -46,4 +572,22 @@ class TextToSpeech:
         Returns:
         """
         with open(filename, 'wb') as audio_file:
-            audio_file.write(response.audio_content)
\ No newline at end of file
+            audio_file.write(response.audio_content)
+
+    @staticmethod
+    def save_file(source: Union[str, Path], filename: Union[str, Path], link: bool = True) -> None:
+        """
+        Args:
+            source (str, os.PathLike) : audio file, e.g. from `Cache.path`
+            filename (str, os.PathLike) : replaced if it exists
+            link (bool) : hard-link `source`, falling back to a copy across file systems
+        """
+        if os.path.lexists(filename):
+            os.remove(filename)
+        if link:
+            try:
+                os.link(str(source), str(filename))
+                return
+            except OSError:
+                pass
+        shutil.copyfile(str(source), str(filename))
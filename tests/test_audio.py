@@ -0,0 +1,122 @@
+import wave
+
+import pytest
+from google.cloud.speech import enums
+
+from gcloud.audio import header_duration, sniff, to_linear16
+
+np = pytest.importorskip('numpy')
+
+
+def write_wav(path, samples, rate, width=2):
+    """
+    Args:
+        samples (numpy.ndarray) : floats in [-1, 1] of shape (frames, channels)
+    """
+    if width == 1:
+        data = (samples * 127 + 128).astype(np.uint8)
+    else:
+        data = (samples * (2 ** (8 * width - 1) - 1)).astype('<i{}'.format(width))
+    with wave.open(str(path), 'wb') as w:
+        w.setnchannels(samples.shape[1])
+        w.setsampwidth(width)
+        w.setframerate(rate)
+        w.writeframes(data.tobytes())
+    return path
+
+
+def tone(frequency, rate, seconds, channels=1):
+    t = np.arange(int(rate * seconds)) / rate
+    signal = 0.5 * np.sin(2 * np.pi * frequency * t)
+    return np.repeat(signal[:, None], channels, axis=1)
+
+
+def decode(blocks):
+    return np.frombuffer(b''.join(blocks), dtype='<i2') / 32767
+
+
+def peak_frequency(samples, rate):
+    spectrum = np.abs(np.fft.rfft(samples))
+    return np.fft.rfftfreq(len(samples), 1 / rate)[spectrum.argmax()]
+
+
+def test_sniff_wav(tmp_path):
+    info = sniff(write_wav(tmp_path / 'a.wav', tone(440, 44100, 0.1, channels=2), 44100))
+
+    assert info.container == 'wav'
+    assert info.encoding == enums.RecognitionConfig.AudioEncoding.LINEAR16
+    assert (info.sample_rate, info.channels, info.sample_width) == (44100, 2, 2)
+
+
+@pytest.mark.parametrize('width', [1, 4])
+def test_sniff_other_pcm_widths_need_conversion(tmp_path, width):
+    info = sniff(write_wav(tmp_path / 'a.wav', tone(440, 16000, 0.1), 16000, width=width))
+
+    assert info.encoding == enums.RecognitionConfig.AudioEncoding.ENCODING_UNSPECIFIED
+    assert info.sample_width == width
+
+
+def test_to_linear16_resamples_stereo_to_mono(tmp_path):
+    path = write_wav(tmp_path / 'a.wav', tone(440, 44100, 1.0, channels=2), 44100)
+
+    samples = decode(to_linear16(path, sniff(path), sample_rate=16000))
+
+    assert abs(len(samples) - 16000) <= 1
+    assert peak_frequency(samples, 16000) == pytest.approx(440, abs=2)
+    assert np.abs(samples[1000:-1000]).max() == pytest.approx(0.5, abs=0.02)
+
+
+def test_to_linear16_removes_content_above_the_new_nyquist(tmp_path):
+    path = write_wav(tmp_path / 'a.wav', tone(12000, 48000, 1.0), 48000)
+
+    samples = decode(to_linear16(path, sniff(path), sample_rate=16000))
+
+    # 12 kHz would alias to 4 kHz without the low-pass filter.
+    assert np.abs(samples[1000:-1000]).max() < 0.05
+
+
+def test_to_linear16_does_not_depend_on_block_size(tmp_path):
+    path = write_wav(tmp_path / 'a.wav', tone(440, 44100, 0.5), 44100)
+    info = sniff(path)
+
+    whole = b''.join(to_linear16(path, info, block_frames=65536))
+    blocks = b''.join(to_linear16(path, info, block_frames=1000))
+
+    assert len(whole) == len(blocks)
+    assert np.abs(decode([whole]) - decode([blocks])).max() < 1e-3
+
+
+def test_to_linear16_converts_8_bit(tmp_path):
+    path = write_wav(tmp_path / 'a.wav', tone(440, 16000, 0.5), 16000, width=1)
+
+    samples = decode(to_linear16(path, sniff(path)))
+
+    assert len(samples) == 8000
+    assert peak_frequency(samples, 16000) == pytest.approx(440, abs=2)
+
+
+def test_header_duration_of_wav(tmp_path):
+    data = write_wav(tmp_path / 'a.wav', tone(440, 8000, 3.0, channels=2), 8000).read_bytes()
+
+    assert header_duration(data[:4096], len(data)) == 3.0
+    # a streamed file leaves the data size at its maximum.
+    streamed = data[:40] + b'\xff\xff\xff\xff' + data[44:]
+    assert header_duration(streamed[:4096], len(streamed)) == 3.0
+
+
+def flac_head(rate, samples):
+    # STREAMINFO of mono 16 bit audio: block and frame sizes, then 20 bits rate,
+    # 3 bits channels - 1, 5 bits bits per sample - 1 and 36 bits samples.
+    packed = (rate << 44) | (0 << 41) | (15 << 36) | samples
+    return b'fLaC' + b'\x80\x00\x00\x22' + b'\x10\x00' * 2 + b'\x00' * 6 + packed.to_bytes(8, 'big') + b'\x00' * 16
+
+
+def test_header_duration_of_flac():
+    assert header_duration(flac_head(44100, 441000), 100000) == 10.0
+    # encoders which stream FLAC may leave the sample count at zero.
+    assert header_duration(flac_head(44100, 0), 100000) is None
+
+
+def test_header_duration_of_other_formats():
+    assert header_duration(b'OggS' + b'\x00' * 100, 1000) is None
+    assert header_duration(b'\x00' * 100, 1000) is None
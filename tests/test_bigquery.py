@@ -0,0 +1,130 @@
+import gzip
+import io
+import os
+import random
+
+import pytest
+from google.cloud import bigquery
+
+from gcloud.bigquery import _GzipReader, _line_ranges, _read_blocks, _splittable, _to_numpy
+
+
+@pytest.fixture
+def fd(tmp_path):
+    def open_file(data):
+        path = tmp_path / 'data'
+        path.write_bytes(data)
+        descriptor = os.open(str(path), os.O_RDONLY)
+        opened.append(descriptor)
+        return descriptor
+
+    opened = []
+    yield open_file
+    for descriptor in opened:
+        os.close(descriptor)
+
+
+def test_gzip_reader_round_trip():
+    blocks = [b'a,b\n' * 1000, b'', b'c,d\n' * 3000]
+    reader = _GzipReader(iter(blocks))
+
+    compressed = reader.read()
+
+    assert gzip.decompress(compressed) == b''.join(blocks)
+    assert reader.tell() == len(compressed)
+
+
+def test_gzip_reader_tell_counts_emitted_bytes():
+    reader = _GzipReader(iter([os.urandom(100000)]))
+
+    chunks = []
+    for chunk in iter(lambda: reader.read(1000), b''):
+        chunks.append(chunk)
+        assert reader.tell() == sum(len(c) for c in chunks)
+    assert len(chunks) > 1
+
+
+def test_gzip_reader_fills_every_read_but_the_last():
+    blocks = [b'%d,%d\n' % (i, i * i) for i in range(500000)]
+    reader = _GzipReader(iter(blocks))
+
+    chunks = list(iter(lambda: reader.read(1024 * 1024), b''))
+
+    assert len(chunks) > 1
+    assert all(len(chunk) == 1024 * 1024 for chunk in chunks[:-1])
+    assert gzip.decompress(b''.join(chunks)) == b''.join(blocks)
+
+
+def test_gzip_reader_small_source_is_read_whole():
+    reader = _GzipReader(iter([b'a,b\n']))
+
+    data = reader.read(1024 * 1024)
+
+    assert gzip.decompress(data) == b'a,b\n'
+    assert reader.read(1024 * 1024) == b''
+
+
+def test_gzip_reader_reads_into_memoryview():
+    reader = _GzipReader(iter([b'x' * 10]))
+    buffer = bytearray(8)
+
+    size = reader.readinto(memoryview(buffer)[2:])
+
+    assert size == 6
+    assert bytes(buffer[2:4]) == b'\x1f\x8b'
+
+
+def test_read_blocks():
+    assert list(_read_blocks(io.BytesIO(b'abcdefg'), block_size=3)) == [b'abc', b'def', b'g']
+
+
+def test_line_ranges_end_on_newlines(fd):
+    data = b''.join(b'%d\n' % i for i in range(10000))
+
+    ranges = _line_ranges(fd(data), len(data), chunk_bytes=1000)
+
+    assert len(ranges) > 1
+    assert ranges[0][0] == 0
+    assert sum(length for _, length in ranges) == len(data)
+    for (offset, length), (next_offset, _) in zip(ranges, ranges[1:]):
+        assert offset + length == next_offset
+        assert data[next_offset - 1:next_offset] == b'\n'
+
+
+def test_line_ranges_without_trailing_newline(fd):
+    data = b'a\nb\nc'
+
+    assert _line_ranges(fd(data), len(data), chunk_bytes=1) == [(0, 2), (2, 2), (4, 1)]
+
+
+def test_line_ranges_line_longer_than_chunk(fd):
+    data = b'x' * 200000 + b'\ny\n'
+
+    assert _line_ranges(fd(data), len(data), chunk_bytes=10) == [(0, 200001), (200001, 2)]
+
+
+def test_line_ranges_empty_file(fd):
+    assert _line_ranges(fd(b''), 0, chunk_bytes=10) == []
+
+
+@pytest.mark.parametrize('kwargs, expected', [
+    ({}, True),
+    ({'source_format': bigquery.SourceFormat.CSV}, True),
+    ({'allow_quoted_newlines': True}, False),
+    ({'source_format': bigquery.SourceFormat.CSV, 'allow_quoted_newlines': True}, False),
+    ({'source_format': bigquery.SourceFormat.NEWLINE_DELIMITED_JSON}, True),
+])
+def test_splittable(kwargs, expected):
+    assert _splittable(bigquery.LoadJobConfig(**kwargs)) is expected
+
+
+def test_to_numpy_timestamps_keep_every_microsecond():
+    np = pytest.importorskip('numpy')
+    field = bigquery.SchemaField('ts', 'TIMESTAMP')
+    micros = [random.randrange(2 * 10 ** 15) for _ in range(10000)]
+    values = ['%d.%06d' % divmod(m, 10 ** 6) for m in micros] + [None]
+
+    column = _to_numpy(field, values)
+
+    assert (column[:-1].astype(np.int64) == np.array(micros)).all()
+    assert np.isnat(column[-1])
@@ -0,0 +1,88 @@
+import pytest
+
+from gcloud.cache import Cache, DirectoryCache, MemoryCache, SqliteCache, TieredCache
+
+KEY = 'ab' + '0' * 62
+OTHER = 'cd' + '0' * 62
+
+
+@pytest.fixture(params=['memory', 'sqlite', 'directory', 'tiered'])
+def cache(request, tmp_path):
+    if request.param == 'memory':
+        yield MemoryCache()
+    elif request.param == 'sqlite':
+        cache = SqliteCache(tmp_path / 'cache.sqlite')
+        yield cache
+        cache.close()
+    elif request.param == 'directory':
+        yield DirectoryCache(tmp_path / 'cache')
+    else:
+        yield TieredCache(MemoryCache(), DirectoryCache(tmp_path / 'cache'))
+
+
+def test_cache_is_abstract():
+    with pytest.raises(TypeError):
+        Cache()
+
+
+def test_round_trip(cache):
+    assert cache.get(KEY) is None
+
+    cache.put(KEY, b'\x00value')
+    cache.put(KEY, b'\x00replaced')
+
+    assert cache.get(KEY) == b'\x00replaced'
+    assert cache.get(OTHER) is None
+    assert (cache.hits, cache.misses) == (1, 2)
+
+
+def test_ttl_expires_entries(tmp_path):
+    for cache in [MemoryCache(ttl=-1), SqliteCache(tmp_path / 'cache.sqlite', ttl=-1),
+                  DirectoryCache(tmp_path / 'cache', ttl=-1)]:
+        cache.put(KEY, b'value')
+        assert cache.get(KEY) is None
+
+
+def test_memory_cache_evicts_least_recently_used():
+    cache = MemoryCache(max_bytes=10)
+    cache.put('a', b'12345')
+    cache.put('b', b'12345')
+    cache.get('a')
+
+    cache.put('c', b'12345')
+
+    assert cache.get('b') is None
+    assert cache.get('a') == b'12345'
+    assert len(cache) == 2
+
+
+def test_directory_cache_survives_restart(tmp_path):
+    DirectoryCache(tmp_path).put(KEY, b'value')
+
+    reopened = DirectoryCache(tmp_path)
+
+    assert len(reopened) == 1
+    assert reopened.path(KEY) == tmp_path / KEY[:2] / KEY
+    assert reopened.get(KEY) == b'value'
+
+
+def test_directory_cache_evicts_to_max_bytes(tmp_path):
+    cache = DirectoryCache(tmp_path, max_bytes=8)
+    cache.put(KEY, b'12345')
+
+    cache.put(OTHER, b'12345')
+
+    assert cache.path(KEY) is None
+    assert not (tmp_path / KEY[:2] / KEY).exists()
+    assert cache.get(OTHER) == b'12345'
+
+
+def test_tiered_cache_promotes_hits(tmp_path):
+    memory = MemoryCache()
+    slow = DirectoryCache(tmp_path)
+    slow.put(KEY, b'value')
+    cache = TieredCache(memory, slow)
+
+    assert cache.get(KEY) == b'value'
+    assert memory.get(KEY) == b'value'
+    assert cache.path(KEY) == tmp_path / KEY[:2] / KEY
@@ -0,0 +1,89 @@
+import time
+
+import pytest
+from google.api_core import exceptions
+
+from gcloud.concurrency import Backoff, TokenBucket, call_with_retry
+
+
+def test_backoff_grows_and_is_capped():
+    backoff = Backoff(initial=1.0, maximum=10.0, multiplier=2.0, jitter=0.0)
+
+    assert [backoff.delay(attempt) for attempt in range(6)] == [1.0, 2.0, 4.0, 8.0, 10.0, 10.0]
+
+
+def test_backoff_jitter_stays_in_bounds():
+    backoff = Backoff(initial=4.0, maximum=4.0, jitter=0.25)
+
+    delays = [backoff.delay(3) for _ in range(1000)]
+
+    assert all(3.0 <= delay <= 5.0 for delay in delays)
+    assert max(delays) - min(delays) > 0.5
+    assert sum(delays) / len(delays) == pytest.approx(4.0, rel=0.05)
+
+
+def test_token_bucket_allows_a_burst_then_paces():
+    bucket = TokenBucket(rate=50, capacity=5)
+
+    start = time.monotonic()
+    for _ in range(5):
+        bucket.acquire()
+    burst = time.monotonic() - start
+    for _ in range(5):
+        bucket.acquire()
+    paced = time.monotonic() - start - burst
+
+    assert burst < 0.05
+    assert paced >= 0.08
+
+
+def test_token_bucket_throttle_and_recover():
+    bucket = TokenBucket(rate=10, min_rate=2)
+
+    bucket.throttle()
+    assert bucket.rate == 5
+    bucket.throttle()
+    bucket.throttle()
+    assert bucket.rate == 2
+
+    for _ in range(100):
+        bucket.recover(step=0.1)
+    assert bucket.rate == 10
+
+
+def _flaky(errors, result):
+    calls = []
+
+    def fn():
+        calls.append(None)
+        if errors:
+            raise errors.pop(0)
+        return result
+
+    return fn, calls
+
+
+def test_call_with_retry_retries_transient_errors():
+    bucket = TokenBucket(rate=1000, capacity=10)
+    fn, calls = _flaky([exceptions.TooManyRequests('quota'), exceptions.ServiceUnavailable('down')], 'ok')
+
+    assert call_with_retry(bucket, Backoff(initial=0.0), fn) == 'ok'
+    assert len(calls) == 3
+    # throttled once by the quota error, then raised again by the success.
+    assert bucket.rate == pytest.approx(1000 * 0.55)
+
+
+def test_call_with_retry_gives_up():
+    fn, calls = _flaky([exceptions.ServiceUnavailable('down')] * 3, 'ok')
+
+    with pytest.raises(exceptions.ServiceUnavailable):
+        call_with_retry(TokenBucket(rate=1000), Backoff(initial=0.0), fn, max_retries=2)
+    assert len(calls) == 3
+
+
+def test_call_with_retry_raises_permanent_errors_at_once():
+    fn, calls = _flaky([exceptions.InvalidArgument('bad')], 'ok')
+
+    with pytest.raises(exceptions.InvalidArgument):
+        call_with_retry(TokenBucket(rate=1000), Backoff(initial=0.0), fn)
+    assert len(calls) == 1
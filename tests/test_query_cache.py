@@ -0,0 +1,49 @@
+import pytest
+
+from gcloud.query_cache import QueryCache, normalize_sql
+
+
+@pytest.mark.parametrize('sql, expected', [
+    ('SELECT 1', 'SELECT 1'),
+    ('  SELECT\n\t*\n  FROM  t ;  ', 'SELECT * FROM t'),
+    ('SELECT 1;', 'SELECT 1'),
+])
+def test_normalize_sql_collapses_whitespace(sql, expected):
+    assert normalize_sql(sql) == expected
+
+
+@pytest.mark.parametrize('literal', [
+    "'a  b'",
+    '"a \n b"',
+    '`my  table`',
+    "'''a\n\n  b'''",
+    '"""a  ;  b"""',
+    r"'it\'s  ok'",
+])
+def test_normalize_sql_keeps_quoted_literals(literal):
+    assert normalize_sql('SELECT   {}  FROM t'.format(literal)) == 'SELECT {} FROM t'.format(literal)
+
+
+def test_normalize_sql_is_idempotent():
+    sql = "SELECT  'x  y' ,\n  `a  b`  FROM t ;"
+
+    assert normalize_sql(normalize_sql(sql)) == normalize_sql(sql)
+
+
+def test_normalize_sql_distinguishes_literals():
+    assert normalize_sql("SELECT 'a b'") != normalize_sql("SELECT 'a  b'")
+
+
+def test_query_cache_round_trip(tmp_path):
+    pyarrow = pytest.importorskip('pyarrow')
+    table = pyarrow.Table.from_arrays([pyarrow.array([1, 2, None])], names=['x'])
+    stamps = {'p.d.t': '2019-01-01T00:00:00'}
+    cache = QueryCache(tmp_path)
+
+    cache.put('key', table, stamps)
+
+    assert cache.get('key', stamps.get).equals(table)
+    assert cache.get('key', lambda table_id: '2019-01-02T00:00:00') is None
+    assert cache.get('key', stamps.get) is None
+    assert (cache.hits, cache.misses) == (1, 2)
+    cache.close()
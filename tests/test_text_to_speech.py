@@ -0,0 +1,108 @@
+import re
+import struct
+import xml.dom.minidom
+
+import pytest
+
+from gcloud.text_to_speech import _OggJoiner, _ogg_crc, split_ssml
+
+
+def text_of(ssml):
+    return re.sub(r'\s+', ' ', re.sub(r'<[^>]*>', ' ', ssml)).strip()
+
+
+def test_split_ssml_keeps_short_documents():
+    ssml = '<speak version="1.0">Hello <break time="1s"/> world.</speak>'
+
+    assert split_ssml(ssml) == [ssml]
+
+
+def test_split_ssml_chunks_are_well_formed_and_small():
+    paragraph = '<p>' + ' '.join('Sentence number {} is here.'.format(i) for i in range(60)) + '</p>'
+    nested = '<prosody rate="slow"><s>' + 'word ' * 400 + '</s></prosody>'
+    ssml = '<speak>Intro text. ' + paragraph + ' Middle. ' + nested + ' <break time="1s"/> End.</speak>'
+
+    chunks = split_ssml(ssml, max_bytes=300)
+
+    assert len(chunks) > 1
+    for chunk in chunks:
+        xml.dom.minidom.parseString(chunk)
+        assert len(chunk.encode('utf-8')) <= 300
+    assert text_of(''.join(chunks)) == text_of(ssml)
+
+
+def test_split_ssml_repeats_the_tags_of_a_split_element():
+    ssml = '<speak><prosody rate="slow">' + 'Sentence here. ' * 40 + '</prosody></speak>'
+
+    chunks = split_ssml(ssml, max_bytes=200)
+
+    assert len(chunks) > 1
+    assert all(chunk.startswith('<speak><prosody rate="slow">') for chunk in chunks)
+    assert all(chunk.endswith('</prosody></speak>') for chunk in chunks)
+
+
+def test_split_ssml_counts_utf8_bytes():
+    ssml = '<speak>' + 'これは文です。 ' * 100 + '</speak>'
+
+    chunks = split_ssml(ssml, max_bytes=200)
+
+    assert all(len(chunk.encode('utf-8')) <= 200 for chunk in chunks)
+    assert text_of(''.join(chunks)) == text_of(ssml)
+
+
+@pytest.mark.parametrize('ssml, max_bytes', [
+    ('Hello', 100),
+    ('<speak><audio src="' + 'x' * 400 + '"/></speak>', 300),
+])
+def test_split_ssml_rejects(ssml, max_bytes):
+    with pytest.raises(ValueError):
+        split_ssml(ssml, max_bytes=max_bytes)
+
+
+def test_ogg_crc_check_value():
+    # CRC-32 with polynomial 0x04c11db7, no reflection, zero initial value.
+    assert _ogg_crc(b'123456789') == 0x89a1897f
+
+
+def ogg_page(flags, granule, serial, sequence, body):
+    page = bytearray(b'OggS\x00' + struct.pack('<BqIII', flags, granule, serial, sequence, 0)
+                     + bytes([1, len(body)]) + body)
+    page[22:26] = struct.pack('<I', _ogg_crc(page))
+    return bytes(page)
+
+
+def ogg_file(serial, granules):
+    pages = [ogg_page(0x02, 0, serial, 0, b'OpusHead'), ogg_page(0, 0, serial, 1, b'OpusTags')]
+    for i, granule in enumerate(granules):
+        flags = 0x04 if i == len(granules) - 1 else 0
+        pages.append(ogg_page(flags, granule, serial, i + 2, b'audio'))
+    return b''.join(pages)
+
+
+def read_pages(data):
+    pages, offset = [], 0
+    while offset < len(data):
+        assert data[offset:offset + 4] == b'OggS'
+        flags, granule, serial, sequence, crc = struct.unpack('<BqIII', data[offset + 5:offset + 26])
+        end = offset + 27 + data[offset + 26]
+        end += sum(data[offset + 27:end])
+        page = bytearray(data[offset:end])
+        page[22:26] = b'\x00' * 4
+        assert _ogg_crc(page) == crc
+        pages.append((flags, granule, serial, sequence))
+        offset = end
+    return pages
+
+
+def test_ogg_joiner_makes_one_logical_stream():
+    joiner = _OggJoiner()
+
+    data = joiner.feed(ogg_file(7, [960, 1920]), last=False) + joiner.feed(ogg_file(9, [480]), last=True)
+    pages = read_pages(data)
+
+    # the headers of the second file are dropped.
+    assert len(pages) == 5
+    assert [serial for _, _, serial, _ in pages] == [7] * 5
+    assert [sequence for _, _, _, sequence in pages] == list(range(5))
+    assert [granule for _, granule, _, _ in pages] == [0, 0, 960, 1920, 2400]
+    assert [flags for flags, _, _, _ in pages] == [0x02, 0, 0, 0, 0x04]